@@ -1,6 +1,7 @@
 """Agent factory and configuration module."""
 
 from .factory import (
+    clear_instance_cache,
     create_knowledge_base,
     create_rag_agent,
     create_reasoning_agent,
@@ -9,6 +10,7 @@ from .factory import (
 )
 
 __all__ = [
+    "clear_instance_cache",
     "create_knowledge_base",
     "create_rag_agent", 
     "create_reasoning_agent",
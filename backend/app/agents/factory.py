@@ -51,18 +51,57 @@ except ImportError:
 
 from agno.knowledge.text import AgentKnowledge
 from pathlib import Path
+from typing import Any, Callable, Dict, Hashable
+import threading
 
 from ..core import config
+from ..core.llm_clients import llm_clients
 from ..core.memory_manager import session_memory_manager
 
+# Models, embedders and memory databases built so far, keyed by the settings they
+# were built from; every agent, team and Memory shares them
+_instances: Dict[Hashable, Any] = {}
+_instances_lock = threading.Lock()
+
+def _cached(key: Hashable, build: Callable[[], Any]) -> Any:
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = build()
+        return _instances[key]
+
+def clear_instance_cache():
+    """Forget cached models, embedders and memory databases (after a config change)"""
+    with _instances_lock:
+        _instances.clear()
+
+def _model_settings(provider: str) -> tuple:
+    """The config values a provider's model is built from"""
+    if provider == "openai":
+        return (config.OPENAI_MODEL_NAME, config.OPENAI_API_KEY)
+    if provider == "anthropic":
+        return (config.ANTHROPIC_MODEL_NAME, config.ANTHROPIC_API_KEY)
+    if provider == "google":
+        return (config.GOOGLE_MODEL_NAME, config.GOOGLE_API_KEY)
+    if provider == "ollama":
+        return (config.OLLAMA_MODEL_NAME, config.OLLAMA_BASE_URL)
+    if provider == "lm-studio":
+        return (config.CUSTOM_MODEL_NAME, config.LM_STUDIO_BASE_URL)
+    return (config.CUSTOM_MODEL_NAME, config.CUSTOM_API_BASE_URL, config.CUSTOM_API_KEY)
+
 def get_model() -> Model:
-    """Creates and returns a chat model instance based on the provider specified in config."""
+    """Returns the shared chat model for the provider specified in config."""
     provider = config.MODEL_PROVIDER
-    
+    return _cached(("model", provider, _model_settings(provider)), lambda: _create_model(provider))
+
+def _create_model(provider: str) -> Model:
     if provider == "openai":
         if not config.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY environment variable not set for provider 'openai'")
-        return OpenAIChat(id=config.OPENAI_MODEL_NAME, api_key=config.OPENAI_API_KEY)
+        return OpenAIChat(
+            id=config.OPENAI_MODEL_NAME,
+            api_key=config.OPENAI_API_KEY,
+            http_client=llm_clients.async_http_client(),
+        )
     
     if provider == "anthropic":
         if not AnthropicChat:
@@ -88,6 +127,7 @@ def get_model() -> Model:
             id=config.CUSTOM_MODEL_NAME,
             api_key="not-needed",
             base_url=config.LM_STUDIO_BASE_URL,
+            http_client=llm_clients.async_http_client(config.LM_STUDIO_BASE_URL),
         )
 
     if provider in ["vllm", "custom"]:
@@ -97,14 +137,18 @@ def get_model() -> Model:
             id=config.CUSTOM_MODEL_NAME,
             api_key=config.CUSTOM_API_KEY,
             base_url=config.CUSTOM_API_BASE_URL,
+            http_client=llm_clients.async_http_client(config.CUSTOM_API_BASE_URL),
         )
         
     raise ValueError(f"Unsupported model provider specified: {provider}")
 
 def get_embedder():
-    """Creates and returns an embedder instance based on the provider specified in config."""
+    """Returns the shared embedder for the provider specified in config."""
     provider = config.MODEL_PROVIDER
-    
+    key = ("embedder", provider == "openai", config.LM_STUDIO_BASE_URL, config.OPENAI_API_KEY)
+    return _cached(key, lambda: _create_embedder(provider))
+
+def _create_embedder(provider: str):
     if provider == "lm-studio":
         # Use LM Studio's embedding model
         return OpenAIEmbedder(
@@ -137,13 +181,13 @@ def get_embedder():
             else:
                 raise ValueError("No embedder available. Please set up LM Studio or OpenAI API key.")
 
-def create_knowledge_base():
+def create_knowledge_base(table_name: str = "enterprise_documents"):
     """Initialize the vector database and knowledge base"""
     return AgentKnowledge(
         sources=[],
         vector_db=LanceDb(
             uri=str(config.VECTOR_DB_PATH),
-            table_name="enterprise_documents",
+            table_name=table_name,
             search_type=SearchType.hybrid,
             embedder=get_embedder(),
         ),
@@ -156,9 +200,10 @@ def create_memory_db():
     
     try:
         memory_db_path = Path(config.DB_FILE).parent / "agent_memories.db"
-        return SqliteMemoryDb(
-            table_name="agent_memories",
-            db_file=str(memory_db_path)
+        # One handle (and SQLAlchemy engine) per file, shared by every agent's Memory
+        return _cached(
+            ("memory_db", str(memory_db_path)),
+            lambda: SqliteMemoryDb(table_name="agent_memories", db_file=str(memory_db_path))
         )
     except Exception as e:
         print(f"Failed to create memory database: {e}")
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Body
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Body, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import List, Dict, Any, AsyncGenerator
+from typing import List, Dict, Any, AsyncGenerator, Optional
 import logging
 import requests
 from bs4 import BeautifulSoup
@@ -9,6 +9,7 @@ import re
 import json
 import asyncio
 import io
+import time
 import os
 from pathlib import Path
 
@@ -16,11 +17,28 @@ from pathlib import Path
 from docx import Document
 import pypdf
 
-from ..schemas.query import QueryRequest, QueryResponse
+from ..schemas.query import BatchQueryRequest, QueryRequest, QueryResponse
 from ..schemas.document import DocumentUploadResponse
 from ..schemas.session import SessionInfo, SessionMemoryRequest, UserMemory
-from ..core.dependencies import get_rag_agent, get_research_team, get_knowledge_base, SimpleAgent, SimpleKnowledgeBase
+from ..core.dependencies import (
+    get_rag_agent, get_research_team, get_knowledge_base, get_tenant_id,
+    tenant_registry, SimpleAgent, SimpleKnowledgeBase, ROUTED_PROVIDERS, document_filter,
+    KnowledgeBaseClosedError
+)
+from ..core import config
 from ..core.memory_manager import session_memory_manager
+from ..core.model_router import get_model_router
+from ..core.document_index import FilterExpressionError
+from ..core.snapshot import SnapshotError, export_snapshot, import_snapshot, snapshot_path
+from ..core.storage import upload_storage
+from ..core.streaming import stream_agent_response, ThinkStreamParser
+from ..core.completion_cache import cache_sampled_completions
+from ..core.llm_scheduler import is_rate_limit_error, rate_limit_retry_after
+from ..core.coalescing import query_flights, query_key, knowledge_base_version
+from ..core.query_pipeline import gather_query_context, supports_prefetch
+from ..core.query_router import RESEARCH, query_router
+from ..core.session_history import session_history
+from ..core.metrics import QueryTimer, agent_model_name, count_prompt_tokens, count_tokens
 
 router = APIRouter()
 
@@ -196,170 +214,339 @@ def extract_web_content(url: str) -> Dict[str, Any]:
             'status': 'error'
         }
 
+def route_query(request: QueryRequest, context: Any, tenant_id: Optional[str]) -> tuple:
+    """Pick the RAG agent or the research team for a request, from the context gathered for RAG"""
+    rag_agent = get_rag_agent(tenant_id=tenant_id)
+    decision = query_router.decide(
+        request.question,
+        requested=request.route,
+        hint=bool(request.use_advanced_reasoning),
+        search_results=context.search_results,
+        prompt_tokens=count_prompt_tokens(context.prompt_parts(request.question), agent_model_name(rag_agent))
+    )
+    agent = get_research_team(tenant_id=tenant_id) if decision.route == RESEARCH else rag_agent
+    return decision, agent
+
+
+async def answer_query(
+    request: QueryRequest,
+    tenant_id: Optional[str],
+    retrieval_cache: Optional[Dict[Any, asyncio.Future]] = None
+) -> QueryResponse:
+    """Answer one query without session memory; shared by /query/ and /query/batch/"""
+    timer = QueryTimer()
+    logger.info(f"Received query request for session: {request.session_id}")
+    session_id = request.session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    tenant_id = request.tenant_id or tenant_id
+    
+    rag_agent = get_rag_agent(tenant_id=tenant_id)
+    knowledge_base = get_knowledge_base(tenant_id=tenant_id)
+    context = await gather_query_context(
+        rag_agent,
+        knowledge_base,
+        request.question,
+        user_id=None,
+        session_id=None,
+        use_memory=False,
+        filters=request.filters,
+        retrieval_cache=retrieval_cache
+    )
+    context.record_timings(timer)
+    
+    with timer.stage("routing"):
+        decision, agent = route_query(request, context, tenant_id)
+    logger.info(f"Using agent: {agent.name if hasattr(agent, 'name') else 'SimpleAgent'} ({decision.route}, {decision.reason})")
+    
+    with timer.stage("prompt_build"):
+        prefetched = {}
+        if supports_prefetch(agent):
+            prefetched = {"search_results": context.search_results}
+        model_used = agent_model_name(agent)
+        prompt_tokens = count_prompt_tokens(context.prompt_parts(request.question), model_used)
+    
+    # Identical concurrent questions against the same knowledge base share one run
+    key = query_key(
+        request.question,
+        decision.route,
+        tenant_id,
+        knowledge_base_version(knowledge_base),
+        request.filters
+    )
+    
+    logger.info(f"Executing agent with question: '{request.question}'")
+    generation_started = time.perf_counter()
+    with timer.stage("generation"):
+        response = await query_flights.do(
+            key, lambda: agent.arun(request.question, knowledge_filters=request.filters, **prefetched)
+        )
+    query_router.record(decision.route, time.perf_counter() - generation_started)
+    logger.info("Agent execution finished, creating response.")
+    
+    # Simple response handling
+    sources = []
+    reasoning_steps = None
+    completion_tokens = count_tokens(response, model_used)
+    
+    return QueryResponse(
+        answer=response,
+        session_id=session_id,
+        user_id=request.user_id,
+        sources=sources,
+        processing_time=round(timer.elapsed, 3),
+        memory_updated=False,
+        memory_count=0,
+        tokens_used=prompt_tokens + completion_tokens,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        compression_tokens_saved=context.tokens_saved,
+        model_used=model_used,
+        route=decision.route,
+        timings=timer.to_dict()
+    )
+
+
 @router.post("/query/", response_model=QueryResponse)
 async def query_knowledge(
-    request: QueryRequest
+    request: QueryRequest,
+    tenant_id: Optional[str] = Depends(get_tenant_id)
 ):
     """Process a query using the RAG system."""
     try:
-        logger.info(f"Received query request for session: {request.session_id}")
-        session_id = request.session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        logger.info(f"Getting agent for query (advanced_reasoning={request.use_advanced_reasoning})...")
-        rag_agent = get_rag_agent()
-        research_team = get_research_team()
-        agent = research_team if request.use_advanced_reasoning else rag_agent
-        logger.info(f"Using agent: {agent.name if hasattr(agent, 'name') else 'SimpleAgent'}")
-        
-        logger.info(f"Executing agent with question: '{request.question}'")
-        response = await agent.arun(request.question)
-        logger.info("Agent execution finished, creating response.")
-        
-        # Simple response handling
-        sources = []
-        reasoning_steps = None
-        
-        return QueryResponse(
-            answer=response,
-            session_id=session_id,
-            user_id=request.user_id,
-            sources=sources,
-            processing_time=None,
-            memory_updated=False,
-            memory_count=0,
-            tokens_used=None,
-            model_used=None
-        )
+        return await answer_query(request, tenant_id)
+    except FilterExpressionError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter expression: {str(e)}")
     except Exception as e:
+        if is_rate_limit_error(e):
+            raise HTTPException(
+                status_code=429,
+                detail=f"Model provider rate limit exceeded: {str(e)}",
+                headers={"Retry-After": rate_limit_retry_after(e)}
+            )
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
+@router.post("/query/batch/")
+async def query_knowledge_batch(
+    request: BatchQueryRequest,
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Answer many queries, streaming one NDJSON line per query in completion order.
+
+    Identical questions (same agent, tenant and filters) are answered once and
+    the result is reported for each of them; searches are shared across the
+    batch and at most ``max_concurrency`` queries run at a time.
+    """
+    if len(request.queries) > config.BATCH_QUERY_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.queries)} queries (max {config.BATCH_QUERY_MAX_ITEMS})"
+        )
+    
+    groups: Dict[Any, List[int]] = {}
+    for index, item in enumerate(request.queries):
+        key = query_key(
+            item.question,
+            item.route or ("auto+hint" if item.use_advanced_reasoning else "auto"),
+            item.tenant_id or tenant_id,
+            None,
+            item.filters
+        )
+        groups.setdefault(key, []).append(index)
+    
+    concurrency = min(request.max_concurrency or config.BATCH_QUERY_CONCURRENCY, config.BATCH_QUERY_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    retrieval_cache: Dict[Any, asyncio.Future] = {}
+    logger.info(f"Batch of {len(request.queries)} queries ({len(groups)} unique, concurrency {concurrency})")
+    
+    async def run(indices: List[int]) -> tuple:
+        async with semaphore:
+            try:
+                response = await answer_query(request.queries[indices[0]], tenant_id, retrieval_cache)
+                return indices, {"status": "ok", "response": response.model_dump()}
+            except FilterExpressionError as e:
+                return indices, {"status": "error", "status_code": 400, "error": f"Invalid filter expression: {str(e)}"}
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    return indices, {"status": "error", "status_code": 429, "error": f"Model provider rate limit exceeded: {str(e)}"}
+                logger.error(f"Error processing batch query: {str(e)}", exc_info=True)
+                return indices, {"status": "error", "status_code": 500, "error": f"Error processing query: {str(e)}"}
+    
+    async def generate_lines() -> AsyncGenerator[str, None]:
+        tasks = [asyncio.ensure_future(run(indices)) for indices in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, result = await next_done
+                for position, index in enumerate(indices):
+                    line = {"index": index, "deduplicated": position > 0, **result}
+                    if position > 0 and "response" in result:
+                        # Shared answer, but each query keeps its own identifiers
+                        item = request.queries[index]
+                        line["response"] = {
+                            **result["response"],
+                            "session_id": item.session_id or result["response"]["session_id"],
+                            "user_id": item.user_id
+                        }
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            # The client went away: stop queries that have not finished yet
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
 @router.post("/query/stream/")
 async def query_knowledge_stream(
-    request: QueryRequest
+    request: QueryRequest,
+    tenant_id: Optional[str] = Depends(get_tenant_id)
 ):
     """Process a query using the RAG system with streaming response and memory support."""
     try:
+        timer = QueryTimer()
         logger.info(f"Received streaming query request for session: {request.session_id}")
         session_id = request.session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         user_id = request.user_id or session_id  # Use session_id as fallback user_id
+        tenant_id = request.tenant_id or tenant_id
         
-        logger.info(f"Getting agent for streaming query (advanced_reasoning={request.use_advanced_reasoning})...")
-        rag_agent = get_rag_agent()
-        research_team = get_research_team()
-        agent = research_team if request.use_advanced_reasoning else rag_agent
-        logger.info(f"Using agent: {agent.name if hasattr(agent, 'name') else 'SimpleAgent'}")
-        
-        # Get relevant memories for context if memory is enabled
-        relevant_memories = []
-        if request.use_memory and user_id:
-            try:
-                relevant_memories = session_memory_manager.get_relevant_memories_for_query(
-                    user_id=user_id, 
-                    query=request.question,
-                    limit=3
-                )
-                logger.info(f"Found {len(relevant_memories)} relevant memories for user {user_id}")
-            except Exception as e:
-                logger.warning(f"Failed to get relevant memories: {e}")
+        rag_agent = get_rag_agent(tenant_id=tenant_id)
+        knowledge_base = get_knowledge_base(tenant_id=tenant_id)
         
         async def generate_response():
             try:
-                logger.info(f"Executing agent with question: '{request.question}'")
-                
-                # Prepare context with relevant memories
-                context_info = ""
-                if relevant_memories:
-                    memory_context = "\n".join([
-                        f"- {mem.memory} (관련 토픽: {', '.join(mem.topics)})" 
-                        for mem in relevant_memories
-                    ])
-                    context_info = f"\n\n이전 대화 내용:\n{memory_context}\n"
-                
-                # Add context to question if memories exist
-                enhanced_question = request.question
-                if context_info:
-                    enhanced_question = f"{request.question}{context_info}"
-                
-                response = await agent.arun(enhanced_question, user_id=user_id, session_id=session_id)
-                logger.info("Agent execution finished, starting streaming response.")
-                
-                # Parse response to handle <think> tags
-                think_content = ""
-                main_response = response
-                
-                # Extract <think> content if present
-                if "<think>" in response and "</think>" in response:
-                    think_start = response.find("<think>")
-                    think_end = response.find("</think>") + 8
-                    think_content = response[think_start:think_end]
-                    main_response = response[think_end:].strip()
-                
-                # Create response data
+                # Send initial response metadata before any context is gathered
                 response_data = {
                     "query": request.question,
                     "session_id": session_id,
                     "timestamp": datetime.now().isoformat(),
                     "status": "streaming"
                 }
-                
-                # Send initial response metadata
                 yield f"data: {json.dumps(response_data)}\n\n"
                 
-                # Stream the response word by word
-                words = main_response.split()
-                total_words = len(words)
+                # Memory search, retrieval and history load run concurrently
+                context = await gather_query_context(
+                    rag_agent,
+                    knowledge_base,
+                    request.question,
+                    user_id=user_id,
+                    session_id=session_id,
+                    use_memory=request.use_memory,
+                    filters=request.filters,
+                    history_limit=request.max_history_messages
+                )
+                context.record_timings(timer)
                 
-                for i, word in enumerate(words):
-                    # Add thinking section for first word if present
-                    if i == 0 and think_content:
-                        word_data = {
-                            "word": word,
-                            "index": i,
-                            "total": total_words,
-                            "progress": round((i + 1) / total_words * 100, 1),
-                            "think": think_content,
-                            "is_complete": False
-                        }
-                    else:
-                        word_data = {
-                            "word": word,
-                            "index": i,
-                            "total": total_words,
-                            "progress": round((i + 1) / total_words * 100, 1),
-                            "is_complete": False
-                        }
+                with timer.stage("routing"):
+                    decision, agent = route_query(request, context, tenant_id)
+                logger.info(f"Using agent: {agent.name if hasattr(agent, 'name') else 'SimpleAgent'} ({decision.route}, {decision.reason})")
+                relevant_memories = context.memories
+                logger.info(f"Found {len(relevant_memories)} relevant memories for user {user_id}")
+                
+                logger.info(f"Executing agent with question: '{request.question}'")
+                
+                with timer.stage("prompt_build"):
+                    # Prepare context with relevant memories
+                    context_info = ""
+                    if relevant_memories:
+                        memory_context = "\n".join([
+                            f"- {mem.memory} (관련 토픽: {', '.join(mem.topics)})" 
+                            for mem in relevant_memories
+                        ])
+                        context_info = f"\n\n이전 대화 내용:\n{memory_context}\n"
                     
-                    yield f"data: {json.dumps(word_data)}\n\n"
+                    # Add context to question if memories exist
+                    enhanced_question = request.question
+                    if context_info:
+                        enhanced_question = f"{request.question}{context_info}"
                     
-                    # Add delay for streaming effect
-                    if word.endswith(('.', '!', '?', ':')):
-                        await asyncio.sleep(0.3)  # Longer pause for sentence endings
-                    elif word.endswith(','):
-                        await asyncio.sleep(0.15)  # Medium pause for commas
-                    else:
-                        await asyncio.sleep(0.05)  # Short pause for regular words
+                    prefetched = {}
+                    if supports_prefetch(agent):
+                        prefetched = {"search_results": context.search_results, "history": context.history}
+                    model_used = agent_model_name(agent)
+                    prompt_tokens = count_prompt_tokens(context.prompt_parts(enhanced_question), model_used)
+                
+                # Forward tokens as the provider produces them, splitting out <think> blocks
+                parser = ThinkStreamParser()
+                index = 0
+                
+                async def forward(segments):
+                    nonlocal index
+                    for kind, text in segments:
+                        key = "think" if kind == "think" else "token"
+                        yield f"data: {json.dumps({key: text, 'index': index, 'is_complete': False})}\n\n"
+                        index += 1
+                
+                def agent_stream():
+                    return stream_agent_response(
+                        agent,
+                        enhanced_question,
+                        user_id=user_id,
+                        session_id=session_id,
+                        knowledge_filters=request.filters,
+                        **prefetched
+                    )
+                
+                # Only coalesce when the prompt carries nothing personal: no memory
+                # context, no session history, and no history or user memories the
+                # agent adds itself (agno puts the run's user memories in the system prompt)
+                coalesce = (
+                    not context_info
+                    and not context.history
+                    and getattr(agent, "add_history_to_messages", None) is not True
+                    and getattr(agent, "enable_user_memories", None) is not True
+                    and getattr(agent, "add_memory_references", None) is not True
+                )
+                if coalesce:
+                    key = query_key(
+                        request.question,
+                        decision.route,
+                        tenant_id,
+                        knowledge_base_version(knowledge_base),
+                        request.filters
+                    )
+                    deltas = query_flights.stream(key, agent_stream)
+                else:
+                    deltas = agent_stream()
+                
+                generation_started = time.perf_counter()
+                async for delta in deltas:
+                    timer.mark_first_token()
+                    async for event in forward(parser.feed(delta)):
+                        yield event
+                async for event in forward(parser.flush()):
+                    yield event
+                timer.record("generation", time.perf_counter() - generation_started)
+                query_router.record(decision.route, time.perf_counter() - generation_started)
+                logger.info("Agent streaming finished.")
+                
+                main_response = parser.answer.strip()
+                think_content = parser.think_block
+                total_words = len(main_response.split())
+                completion_tokens = count_tokens(parser.think + parser.answer, model_used)
+                
+                session_history.append(session_id, "user", request.question)
+                session_history.append(session_id, "assistant", main_response)
                 
                 # Create memory from conversation if enabled
                 memory_updated = False
                 memory_count = 0
                 if request.use_memory and user_id:
-                    try:
-                        # Create memories from this conversation
-                        conversation_messages = [
-                            {"role": "user", "content": request.question},
-                            {"role": "assistant", "content": main_response}
-                        ]
-                        session_memory_manager.create_memories_from_conversation(
-                            user_id=user_id,
-                            messages=conversation_messages
-                        )
-                        memory_updated = True
-                        memory_count = session_memory_manager.get_memory_count(user_id)
-                        logger.info(f"Updated memories for user {user_id}, total count: {memory_count}")
-                    except Exception as e:
-                        logger.warning(f"Failed to create memories: {e}")
+                    with timer.stage("memory_write"):
+                        try:
+                            # Create memories from this conversation
+                            conversation_messages = [
+                                {"role": "user", "content": request.question},
+                                {"role": "assistant", "content": main_response}
+                            ]
+                            await session_memory_manager.acreate_memories_from_conversation(
+                                user_id=user_id,
+                                messages=conversation_messages
+                            )
+                            memory_updated = True
+                            memory_count = await session_memory_manager.aget_memory_count(user_id)
+                            logger.info(f"Updated memories for user {user_id}, total count: {memory_count}")
+                        except Exception as e:
+                            logger.warning(f"Failed to create memories: {e}")
                 
                 # Send completion signal
                 completion_data = {
@@ -372,6 +559,15 @@ async def query_knowledge_stream(
                     "memory_updated": memory_updated,
                     "memory_count": memory_count,
                     "relevant_memories_count": len(relevant_memories),
+                    "coalesced": coalesce,
+                    "processing_time": round(timer.elapsed, 3),
+                    "tokens_used": prompt_tokens + completion_tokens,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "compression_tokens_saved": context.tokens_saved,
+                    "model_used": model_used,
+                    "route": decision.route,
+                    "timings": timer.to_dict(),
                     "timestamp": datetime.now().isoformat(),
                     "status": "completed"
                 }
@@ -384,6 +580,9 @@ async def query_knowledge_stream(
                     "is_complete": True,
                     "status": "error"
                 }
+                if is_rate_limit_error(e):
+                    # Headers are already sent, so the status travels in the event
+                    error_data.update(status_code=429, retry_after=rate_limit_retry_after(e))
                 yield f"data: {json.dumps(error_data)}\n\n"
         
         return StreamingResponse(
@@ -404,71 +603,163 @@ async def query_knowledge_stream(
         raise HTTPException(status_code=500, detail=f"Error setting up streaming query: {str(e)}")
 
 
+async def _read_uploaded_document(file: UploadFile) -> Dict[str, Any]:
+    """Validate an uploaded file and extract its text and metadata."""
+    # Validate file type
+    allowed_extensions = ['.pdf', '.docx', '.txt', '.md']
+    file_extension = '.' + file.filename.lower().split('.')[-1] if '.' in file.filename else ''
+    
+    if file_extension not in allowed_extensions:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported file type: {file_extension}. Allowed types: {', '.join(allowed_extensions)}"
+        )
+    
+    # Validate file size (10MB limit)
+    max_size = 10 * 1024 * 1024  # 10MB
+    file_content = await file.read()
+    if len(file_content) > max_size:
+        raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
+    
+    # Process document
+    document_data = process_document(file_content, file.filename, file_extension)
+    
+    if document_data['status'] == 'error':
+        raise HTTPException(status_code=400, detail=document_data['error'])
+    
+    document_data['metadata'] = {
+        "filename": file.filename,
+        "type": file_extension,
+        "word_count": document_data['word_count'],
+        "char_count": document_data['char_count'],
+        "line_count": document_data['line_count'],
+        "extracted_at": datetime.now().isoformat()
+    }
+    return document_data
+
+
 @router.post("/upload-document/", response_model=DocumentUploadResponse)
 async def upload_document(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
 ):
     """Upload and process a document into the knowledge base."""
     try:
-        # Validate file type
-        allowed_extensions = ['.pdf', '.docx', '.txt', '.md']
-        file_extension = '.' + file.filename.lower().split('.')[-1] if '.' in file.filename else ''
-        
-        if file_extension not in allowed_extensions:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file type: {file_extension}. Allowed types: {', '.join(allowed_extensions)}"
-            )
-        
-        # Validate file size (10MB limit)
-        max_size = 10 * 1024 * 1024  # 10MB
-        file_content = await file.read()
-        if len(file_content) > max_size:
-            raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
-        
-        # Process document
-        document_data = process_document(file_content, file.filename, file_extension)
-        
-        if document_data['status'] == 'error':
-            raise HTTPException(status_code=400, detail=document_data['error'])
+        document_data = await _read_uploaded_document(file)
         
         # Add to knowledge base
-        knowledge_base = get_knowledge_base()
-        metadata = {
-            "filename": file.filename,
-            "type": file_extension,
-            "word_count": document_data['word_count'],
-            "char_count": document_data['char_count'],
-            "line_count": document_data['line_count'],
-            "extracted_at": datetime.now().isoformat()
-        }
-        
-        knowledge_base.add_document(document_data['text'], metadata)
+        knowledge_base = get_knowledge_base(tenant_id)
+        document_id = knowledge_base.add_document(document_data['text'], document_data['metadata'])
         
         logger.info(f"Successfully processed and added document: {file.filename}")
         
         return DocumentUploadResponse(
             message=f"문서 '{file.filename}'이 성공적으로 업로드되고 분석되었습니다.",
-            document_id=f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(knowledge_base.documents)}",
+            document_id=document_id,
             filename=file.filename,
             status="success",
             metadata={
                 "word_count": document_data['word_count'],
                 "char_count": document_data['char_count'],
                 "line_count": document_data['line_count'],
-                "file_type": file_extension
+                "file_type": document_data['file_type']
             }
         )
     except HTTPException:
         raise
+    except KnowledgeBaseClosedError as e:
+        # The tenant was unloaded mid-request; a retry reloads it
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "0"})
     except Exception as e:
         logger.error(f"Error processing document {file.filename}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"문서 처리 중 오류가 발생했습니다: {str(e)}")
 
 
+@router.get("/documents/{document_id}")
+async def get_document(
+    document_id: str,
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Get a document from the knowledge base by ID."""
+    document = get_knowledge_base(tenant_id).get_document(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return document
+
+
+@router.put("/documents/{document_id}", response_model=DocumentUploadResponse)
+async def replace_document(
+    document_id: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Replace a document with a new version while keeping its ID."""
+    try:
+        knowledge_base = get_knowledge_base(tenant_id)
+        if knowledge_base.get_document(document_id) is None:
+            raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+        
+        document_data = await _read_uploaded_document(file)
+        knowledge_base.replace_document(document_id, document_data['text'], document_data['metadata'])
+        
+        if knowledge_base.needs_compaction():
+            background_tasks.add_task(knowledge_base.compact)
+        
+        logger.info(f"Replaced document {document_id} with {file.filename}")
+        
+        return DocumentUploadResponse(
+            message=f"문서 '{file.filename}'(으)로 교체되었습니다.",
+            document_id=document_id,
+            filename=file.filename,
+            status="success",
+            metadata={
+                "word_count": document_data['word_count'],
+                "char_count": document_data['char_count'],
+                "line_count": document_data['line_count'],
+                "file_type": document_data['file_type']
+            }
+        )
+    except HTTPException:
+        raise
+    except KnowledgeBaseClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "0"})
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    except Exception as e:
+        logger.error(f"Error replacing document {document_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"문서 교체 중 오류가 발생했습니다: {str(e)}")
+
+
+@router.delete("/documents/{document_id}")
+async def delete_document(
+    document_id: str,
+    background_tasks: BackgroundTasks,
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Delete a document from the knowledge base."""
+    knowledge_base = get_knowledge_base(tenant_id)
+    try:
+        deleted = knowledge_base.delete_document(document_id)
+    except KnowledgeBaseClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "0"})
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    
+    if knowledge_base.needs_compaction():
+        background_tasks.add_task(knowledge_base.compact)
+    
+    return {
+        "message": f"Document {document_id} deleted successfully",
+        "document_id": document_id,
+        "status": "success"
+    }
+
+
 @router.post("/add-url/")
 async def add_url_endpoint(
-    url: str = Body(..., embed=True)
+    url: str = Body(..., embed=True),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
 ):
     """Add URL content to the knowledge base."""
     try:
@@ -498,7 +789,7 @@ Content:
         """.strip()
         
         # Add to knowledge base
-        knowledge_base = get_knowledge_base()
+        knowledge_base = get_knowledge_base(tenant_id)
         metadata = {
             "url": url,
             "title": content_data['title'],
@@ -507,12 +798,13 @@ Content:
             "extracted_at": datetime.now().isoformat()
         }
         
-        knowledge_base.add_document(formatted_content, metadata)
+        document_id = knowledge_base.add_document(formatted_content, metadata)
         
         logger.info(f"Successfully added URL content to knowledge base: {url}")
         
         return {
             "url": url,
+            "document_id": document_id,
             "title": content_data['title'],
             "word_count": content_data['word_count'],
             "status": "success",
@@ -521,6 +813,8 @@ Content:
         
     except HTTPException:
         raise
+    except KnowledgeBaseClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "0"})
     except Exception as e:
         logger.error(f"Error processing URL {url}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing URL: {str(e)}")
@@ -529,26 +823,30 @@ Content:
 @router.post("/analyze-url/")
 async def analyze_url_endpoint(
     url: str = Body(..., embed=True),
-    question: str = Body(default="Analyze this web content and provide a comprehensive summary.", embed=True)
+    question: str = Body(default="Analyze this web content and provide a comprehensive summary.", embed=True),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
 ):
     """Extract content from URL and immediately analyze it."""
     try:
         logger.info(f"Analyzing URL: {url}")
         
         # First, add the URL to knowledge base
-        url_result = await add_url_endpoint(url)
+        url_result = await add_url_endpoint(url, tenant_id=tenant_id)
         
         if url_result['status'] != 'success':
             raise HTTPException(status_code=400, detail="Failed to extract URL content")
         
         # Now analyze the content
-        rag_agent = get_rag_agent()
+        rag_agent = get_rag_agent(tenant_id=tenant_id)
         
         # Create analysis question that references the URL
         analysis_question = f"Based on the content from {url} (titled '{url_result['title']}'), {question}"
         
         logger.info(f"Analyzing with question: {analysis_question}")
-        response = await rag_agent.arun(analysis_question)
+        knowledge_filters = document_filter(get_knowledge_base(tenant_id), url_result['document_id'])
+        if knowledge_filters is None:
+            logger.warning("Knowledge base cannot filter by document; analyzing URL content against the whole corpus")
+        response = await rag_agent.arun(analysis_question, knowledge_filters=knowledge_filters)
         
         return {
             "url": url,
@@ -556,6 +854,7 @@ async def analyze_url_endpoint(
             "word_count": url_result['word_count'],
             "question": question,
             "analysis": response,
+            "scoped_to_document": knowledge_filters is not None,
             "status": "success",
             "timestamp": datetime.now().isoformat()
         }
@@ -590,6 +889,7 @@ async def delete_session(
 ):
     """Delete a specific session."""
     try:
+        session_history.clear(session_id)
         return {
             "message": f"Session {session_id} deleted successfully",
             "session_id": session_id,
@@ -607,7 +907,7 @@ async def get_session(
     try:
         # Use session_id as user_id for memory lookup
         user_id = session_id
-        memory_count = session_memory_manager.get_memory_count(user_id)
+        memory_count = await session_memory_manager.aget_memory_count(user_id)
         
         return SessionInfo(
             session_id=session_id,
@@ -632,20 +932,13 @@ async def manage_session_memory(
         user_id = request.user_id or session_id
         
         if request.action == "get":
-            memories = session_memory_manager.get_user_memories(user_id, limit=20)
-            return {
-                "session_id": session_id,
-                "user_id": user_id,
-                "memories": memories,
-                "total_count": len(memories),
-                "status": "success"
-            }
+            return await _memory_page_response(session_id, user_id, request.limit, request.cursor)
         
         elif request.action == "add":
             if not request.memory_content:
                 raise HTTPException(status_code=400, detail="Memory content is required for add action")
             
-            memory_id = session_memory_manager.add_user_memory(
+            memory_id = await session_memory_manager.aadd_user_memory(
                 user_id=user_id,
                 memory_content=request.memory_content,
                 topics=request.topics or []
@@ -663,7 +956,7 @@ async def manage_session_memory(
             if not request.memory_id:
                 raise HTTPException(status_code=400, detail="Memory ID is required for delete action")
             
-            success = session_memory_manager.delete_user_memory(user_id, request.memory_id)
+            success = await session_memory_manager.adelete_user_memory(user_id, request.memory_id)
             
             if success:
                 return {
@@ -676,7 +969,7 @@ async def manage_session_memory(
                 raise HTTPException(status_code=404, detail="Memory not found or could not be deleted")
         
         elif request.action == "clear":
-            success = session_memory_manager.clear_user_memories(user_id)
+            success = await session_memory_manager.aclear_user_memories(user_id)
             
             if success:
                 return {
@@ -698,23 +991,34 @@ async def manage_session_memory(
         raise HTTPException(status_code=500, detail=f"Error managing session memory: {str(e)}")
 
 
+async def _memory_page_response(session_id: str, user_id: str, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """One page of memories plus the cursor of the next page"""
+    try:
+        memories, next_cursor = await session_memory_manager.aget_memory_page(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "session_id": session_id,
+        "user_id": user_id,
+        "memories": memories,
+        "total_count": await session_memory_manager.aget_memory_count(user_id),
+        "next_cursor": next_cursor,
+        "status": "success"
+    }
+
+
 @router.get("/sessions/{session_id}/memories")
 async def get_session_memories(
     session_id: str,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
 ):
-    """Get memories for a session"""
+    """Get memories for a session, one page at a time"""
     try:
         user_id = session_id  # Use session_id as user_id
-        memories = session_memory_manager.get_user_memories(user_id, limit=limit)
-        
-        return {
-            "session_id": session_id,
-            "user_id": user_id,
-            "memories": memories,
-            "total_count": len(memories),
-            "status": "success"
-        }
+        return await _memory_page_response(session_id, user_id, limit, cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting session memories: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting session memories: {str(e)}")
@@ -729,7 +1033,7 @@ async def search_session_memories(
     """Search memories for a session based on query"""
     try:
         user_id = session_id  # Use session_id as user_id
-        memories = session_memory_manager.search_user_memories(user_id, query, limit)
+        memories = await session_memory_manager.asearch_user_memories(user_id, query, limit)
         
         return {
             "session_id": session_id,
@@ -745,10 +1049,12 @@ async def search_session_memories(
 
 
 @router.get("/knowledge-base/stats")
-async def get_knowledge_base_stats():
+async def get_knowledge_base_stats(
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
     """Get statistics about the knowledge base."""
     try:
-        knowledge_base = get_knowledge_base()
+        knowledge_base = get_knowledge_base(tenant_id)
         
         # Count different types of documents
         total_docs = len(knowledge_base.documents)
@@ -761,35 +1067,168 @@ async def get_knowledge_base_stats():
             "file_documents": file_docs,
             "status": "active"
         }
+        if isinstance(knowledge_base, SimpleKnowledgeBase):
+            stats["index"] = knowledge_base.index.stats()
+            stats["version"] = knowledge_base.version
         
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting knowledge base stats: {str(e)}")
 
 
+@router.get("/models/router/stats")
+async def get_model_router_stats():
+    """Rolling latency and error statistics of the routed model providers."""
+    if config.MODEL_PROVIDER not in ROUTED_PROVIDERS:
+        raise HTTPException(status_code=404, detail=f"Model router is not used with MODEL_PROVIDER='{config.MODEL_PROVIDER}'")
+    try:
+        return get_model_router().stats()
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=f"Model router unavailable: {str(e)}")
+
+
+@router.get("/query/router/stats")
+async def get_query_router_stats():
+    """How queries were split between the RAG agent and the research team, and their latencies."""
+    return query_router.stats()
+
+
+@router.post("/knowledge-base/search")
+async def search_knowledge_base(
+    query: str = Body(..., embed=True),
+    filters: Optional[Dict[str, Any]] = Body(None, embed=True),
+    limit: int = Body(5, embed=True),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Search the knowledge base, optionally restricted by a metadata filter."""
+    try:
+        knowledge_base = get_knowledge_base(tenant_id)
+        results = knowledge_base.search(query, limit=limit, filters=filters)
+        
+        return {
+            "query": query,
+            "filters": filters,
+            "results": results,
+            "found_count": len(results),
+            "status": "success"
+        }
+    except FilterExpressionError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter expression: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error searching knowledge base: {e}")
+        raise HTTPException(status_code=500, detail=f"Error searching knowledge base: {str(e)}")
+
+
+@router.post("/knowledge-base/compact")
+async def compact_knowledge_base(
+    background_tasks: BackgroundTasks,
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Schedule compaction of deleted documents in the knowledge base."""
+    knowledge_base = get_knowledge_base(tenant_id)
+    if not isinstance(knowledge_base, SimpleKnowledgeBase):
+        raise HTTPException(status_code=400, detail="Compaction is not supported by this knowledge base")
+    
+    background_tasks.add_task(knowledge_base.compact)
+    return {
+        "message": "Compaction scheduled",
+        "index": knowledge_base.index.stats(),
+        "status": "success"
+    }
+
+
+@router.post("/admin/snapshot/export")
+async def export_knowledge_base_snapshot(
+    name: str = Body(..., embed=True),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Export the knowledge base to a columnar snapshot."""
+    try:
+        knowledge_base = get_knowledge_base(tenant_id)
+        manifest = await asyncio.to_thread(export_snapshot, knowledge_base, snapshot_path(name))
+        return {
+            "name": name,
+            "snapshot": manifest,
+            "status": "success"
+        }
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error exporting snapshot {name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error exporting snapshot: {str(e)}")
+
+
+@router.post("/admin/snapshot/import")
+async def import_knowledge_base_snapshot(
+    name: str = Body(..., embed=True),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
+):
+    """Replace the knowledge base with a previously exported snapshot."""
+    try:
+        knowledge_base = get_knowledge_base(tenant_id)
+        result = await asyncio.to_thread(import_snapshot, knowledge_base, snapshot_path(name))
+        return {
+            "name": name,
+            "snapshot": result,
+            "status": "success"
+        }
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing snapshot {name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error importing snapshot: {str(e)}")
+
+
+@router.get("/storage/usage")
+async def get_storage_usage():
+    """Get upload storage usage and eviction metrics."""
+    return {
+        "uploads": upload_storage.usage(),
+        "status": "success"
+    }
+
+
+@router.get("/tenants/")
+async def list_tenants():
+    """List per-tenant knowledge base statistics."""
+    tenants = tenant_registry.stats()
+    return {
+        "tenants": tenants,
+        "loaded_count": sum(1 for tenant in tenants if tenant["loaded"]),
+        "max_loaded": tenant_registry.max_loaded,
+        "status": "success"
+    }
+
+
 @router.post("/analyze-document/")
 async def analyze_document(
     file: UploadFile = File(...),
-    question: str = Body(default="이 문서의 내용을 분석하고 주요 내용을 요약해주세요.", embed=True)
+    question: str = Body(default="이 문서의 내용을 분석하고 주요 내용을 요약해주세요.", embed=True),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
 ):
     """Upload and immediately analyze a document."""
     try:
         logger.info(f"Analyzing document: {file.filename}")
         
         # First upload the document
-        upload_result = await upload_document(file)
+        upload_result = await upload_document(file, tenant_id=tenant_id)
         
         if upload_result.status != "success":
             raise HTTPException(status_code=400, detail="문서 업로드에 실패했습니다.")
         
         # Now analyze the document
-        rag_agent = get_rag_agent()
+        rag_agent = get_rag_agent(tenant_id=tenant_id)
         
         # Create analysis question that references the document
         analysis_question = f"방금 업로드된 문서 '{upload_result.filename}'에 대해: {question}"
         
         logger.info(f"Analyzing document with question: {analysis_question}")
-        response = await rag_agent.arun(analysis_question)
+        knowledge_filters = document_filter(get_knowledge_base(tenant_id), upload_result.document_id)
+        if knowledge_filters is None:
+            logger.warning("Knowledge base cannot filter by document; analyzing the upload against the whole corpus")
+        # Re-analysing the same document and question may reuse the earlier answer
+        with cache_sampled_completions():
+            response = await rag_agent.arun(analysis_question, knowledge_filters=knowledge_filters)
         
         return {
             "filename": upload_result.filename,
@@ -797,6 +1236,7 @@ async def analyze_document(
             "metadata": upload_result.metadata,
             "question": question,
             "analysis": response,
+            "scoped_to_document": knowledge_filters is not None,
             "status": "success",
             "timestamp": datetime.now().isoformat()
         }
@@ -810,7 +1250,8 @@ async def analyze_document(
 
 @router.post("/upload-multiple-documents/")
 async def upload_multiple_documents(
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    tenant_id: Optional[str] = Depends(get_tenant_id)
 ):
     """Upload multiple documents at once."""
     try:
@@ -866,7 +1307,7 @@ async def upload_multiple_documents(
                     continue
                 
                 # Add to knowledge base
-                knowledge_base = get_knowledge_base()
+                knowledge_base = get_knowledge_base(tenant_id)
                 metadata = {
                     "filename": file.filename,
                     "type": file_extension,
@@ -876,12 +1317,12 @@ async def upload_multiple_documents(
                     "extracted_at": datetime.now().isoformat()
                 }
                 
-                knowledge_base.add_document(document_data['text'], metadata)
+                document_id = knowledge_base.add_document(document_data['text'], metadata)
                 
                 results.append({
                     "filename": file.filename,
                     "status": "success",
-                    "document_id": f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(knowledge_base.documents)}",
+                    "document_id": document_id,
                     "metadata": {
                         "word_count": document_data['word_count'],
                         "char_count": document_data['char_count'],
@@ -9,6 +9,7 @@ from typing import Optional
 
 from .core.dependencies import get_knowledge_base, get_rag_agent, get_reasoning_agent, get_research_team
 from .knowledge.manager import process_url, get_knowledge_base_info, cleanup_old_files
+from .core.snapshot import export_snapshot, import_snapshot, snapshot_path
 
 
 class RAGCLI:
@@ -33,6 +34,8 @@ class RAGCLI:
         print("  /reasoning     - Toggle advanced reasoning mode")
         print("  /session       - Show current session info")
         print("  /cleanup       - Clean up old uploaded files")
+        print("  /export <name> - Export knowledge base snapshot")
+        print("  /import <name> - Import knowledge base snapshot")
         print("  /quit or /exit - Exit the CLI")
         print("=" * 60)
         print()
@@ -63,6 +66,24 @@ class RAGCLI:
         result = cleanup_old_files()
         print(f"✅ {result['message']}")
     
+    def export_knowledge_base(self, name: str):
+        """Export the knowledge base to a snapshot"""
+        try:
+            print(f"📦 Exporting snapshot: {name}")
+            result = export_snapshot(self.knowledge_base, snapshot_path(name))
+            print(f"✅ Exported {result['documents']} documents ({result['bytes']} bytes) in {result['elapsed_seconds']}s")
+        except Exception as e:
+            print(f"❌ Error exporting snapshot: {str(e)}")
+    
+    def import_knowledge_base(self, name: str):
+        """Import the knowledge base from a snapshot"""
+        try:
+            print(f"📦 Importing snapshot: {name}")
+            result = import_snapshot(self.knowledge_base, snapshot_path(name))
+            print(f"✅ Imported {result['documents']} documents in {result['elapsed_seconds']}s")
+        except Exception as e:
+            print(f"❌ Error importing snapshot: {str(e)}")
+    
     def show_session_info(self):
         """Show current session information"""
         print(f"\n🔧 Session Information:")
@@ -155,6 +176,16 @@ class RAGCLI:
                         self.show_session_info()
                     elif command in ['cleanup', 'c']:
                         self.cleanup_files()
+                    elif command == 'export':
+                        if args:
+                            self.export_knowledge_base(args)
+                        else:
+                            print("❌ Please provide a snapshot name. Usage: /export <name>")
+                    elif command == 'import':
+                        if args:
+                            self.import_knowledge_base(args)
+                        else:
+                            print("❌ Please provide a snapshot name. Usage: /import <name>")
                     elif command in ['quit', 'exit', 'q']:
                         print("👋 Goodbye!")
                         break
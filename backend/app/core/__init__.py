@@ -6,6 +6,8 @@ from .dependencies import (
     get_rag_agent,
     get_reasoning_agent,
     get_research_team,
+    get_tenant_id,
+    tenant_registry,
 )
 
 __all__ = [
@@ -14,4 +16,6 @@ __all__ = [
     "get_rag_agent",
     "get_reasoning_agent", 
     "get_research_team",
+    "get_tenant_id",
+    "tenant_registry",
 ] 
\ No newline at end of file
@@ -0,0 +1,117 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one model provider.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    are refused immediately. With a ``probe`` coroutine, a background task
+    then checks the provider every ``reset_timeout`` seconds (half-open) and
+    closes the circuit on the first success, so no user request pays for the
+    check. Without one, a single trial call is let through after the timeout;
+    if it has not reported back (e.g. it was cancelled) within the longer of
+    ``reset_timeout`` and ``probe_timeout``, another one is let through.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        probe: Optional[Callable[[], Awaitable[Any]]] = None,
+        probe_timeout: float = 10.0,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_opened_at = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+        self.metrics = {"opened": 0, "short_circuited": 0, "probes": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go through now"""
+        if self.state == CLOSED:
+            return True
+        probing = self._probe_task is not None and not self._probe_task.done()
+        now = time.monotonic()
+        if not probing and (
+            (self.state == OPEN and now - self.opened_at >= self.reset_timeout)
+            # The last trial call never recorded its outcome
+            or (self.state == HALF_OPEN and now - self.half_opened_at >= max(self.reset_timeout, self.probe_timeout))
+        ):
+            self.state = HALF_OPEN
+            self.half_opened_at = now
+            return True
+        self.metrics["short_circuited"] += 1
+        return False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit for '{self.name}' closed")
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self._open()
+
+    def _open(self):
+        if self.state != OPEN:
+            self.metrics["opened"] += 1
+            logger.warning(f"Circuit for '{self.name}' opened after {self.failures} consecutive failures")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        if self.probe is None or (self._probe_task is not None and not self._probe_task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to probe from: fall back to a trial call after the timeout
+            return
+        # A fresh context, so the probe does not inherit the request's priority
+        # or cache opt-ins from whichever call happened to open the circuit
+        self._probe_task = loop.create_task(self._probe_loop(), context=contextvars.Context())
+
+    async def _probe_loop(self):
+        while self.state != CLOSED:
+            await asyncio.sleep(self.reset_timeout)
+            if self.state == CLOSED:
+                return
+            self.state = HALF_OPEN
+            self.metrics["probes"] += 1
+            try:
+                await asyncio.wait_for(self.probe(), self.probe_timeout)
+            except Exception as e:
+                logger.info(f"Probe of '{self.name}' failed, circuit stays open: {e}")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                continue
+            self.record_success()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "open_for": round(time.monotonic() - self.opened_at, 1) if self.state != CLOSED else None,
+            **self.metrics,
+        }
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold and collapse whitespace so trivially different questions coalesce"""
+    return " ".join(question.casefold().split())
+
+
+def knowledge_base_version(knowledge_base: Any) -> Optional[int]:
+    version = getattr(knowledge_base, "version", None)
+    return version if isinstance(version, int) else None
+
+
+def query_key(
+    question: str,
+    agent_kind: str,
+    tenant_id: Optional[str],
+    kb_version: Optional[int],
+    filters: Optional[Dict[str, Any]] = None,
+) -> Hashable:
+    """Key identifying queries that are guaranteed to produce the same answer"""
+    filters_key = json.dumps(filters, sort_keys=True, default=str) if filters else None
+    return (normalize_question(question), agent_kind, tenant_id, kb_version, filters_key)
+
+
+class _StreamFlight:
+    """An in-flight token stream shared by every subscriber with the same key"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent requests onto one computation.
+
+    ``do`` shares the result of a coroutine; ``stream`` shares a token stream,
+    replaying already produced chunks to late subscribers and then fanning out
+    new chunks as they arrive. Entries are dropped as soon as the computation
+    finishes, so nothing is cached beyond the in-flight window.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, _StreamFlight] = {}
+        self.metrics = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.metrics["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish_call(key, done))
+        else:
+            self.metrics["followers"] += 1
+            logger.info("Coalesced query onto an in-flight request")
+        # Shield so one caller disconnecting does not cancel the others
+        return await asyncio.shield(task)
+
+    def _finish_call(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        flight = self._streams.get(key)
+        if flight is None:
+            self.metrics["leaders"] += 1
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._produce(key, flight, factory))
+        else:
+            self.metrics["followers"] += 1
+            logger.info("Coalesced streaming query onto an in-flight request")
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(flight.chunks):
+                    yield flight.chunks[position]
+                    position += 1
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more; new callers must not join the dying flight
+                self._forget_stream(key, flight)
+                flight.task.cancel()
+
+    async def _produce(self, key: Hashable, flight: _StreamFlight, factory: Callable[[], AsyncIterator[str]]):
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            flight.error = RuntimeError("Coalesced stream was cancelled")
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget_stream(key, flight)
+            flight.notify()
+
+    def _forget_stream(self, key: Hashable, flight: _StreamFlight):
+        if self._streams.get(key) is flight:
+            del self._streams[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            **self.metrics,
+        }
+
+
+query_flights = SingleFlight()
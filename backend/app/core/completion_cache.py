@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Request fields that do not change what the model generates
+_IGNORED_FIELDS = {"model", "messages", "stream", "stream_options", "user", "metadata", "store"}
+
+# Per-context opt-in to caching sampled (temperature > 0) completions
+_cache_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar("cache_sampled", default=False)
+
+# Per-context opt-out, for calls that must reach the provider (e.g. health probes)
+_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("completion_cache_bypass", default=False)
+
+
+@contextmanager
+def cache_sampled_completions():
+    """Let the enclosed calls reuse cached completions even when they sample"""
+    token = _cache_sampled.set(True)
+    try:
+        yield
+    finally:
+        _cache_sampled.reset(token)
+
+
+@contextmanager
+def bypass_completion_cache():
+    """Send the enclosed calls to the provider even when a cached completion exists"""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def completion_cache_key(payload: Dict[str, Any]) -> str:
+    """Key of a chat completion request: model id, message list hash and sampling parameters"""
+    messages_hash = hashlib.sha256(_canonical(payload.get("messages")).encode("utf-8")).hexdigest()
+    params = {key: value for key, value in payload.items() if key not in _IGNORED_FIELDS}
+    return hashlib.sha256(_canonical([payload.get("model"), messages_hash, params]).encode("utf-8")).hexdigest()
+
+
+def is_cacheable(payload: Dict[str, Any]) -> bool:
+    """Non-streaming, single-choice requests; sampled ones only when opted in"""
+    if _bypass.get() or payload.get("stream") or (payload.get("n") or 1) != 1:
+        return False
+    # Providers default to temperature 1 when none is sent
+    temperature = payload.get("temperature", 1.0)
+    return temperature == 0 or config.COMPLETION_CACHE_SAMPLED or _cache_sampled.get()
+
+
+class CompletionCache:
+    """SQLite store of completion response bodies with LRU eviction by total size"""
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, model TEXT, body BLOB, size INTEGER, "
+            "created_at REAL, accessed_at REAL, hits INTEGER DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions (accessed_at)")
+        self._conn.commit()
+        self.metrics = {"hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.metrics["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE completions SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self.metrics["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, model: Optional[str], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, body, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, body, len(body), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Free down to 90% of the budget so every insert does not evict again
+        target = self.max_bytes * 0.9
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY accessed_at").fetchall():
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+            self.metrics["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        return {**self.metrics, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _cache_lookup(cache: CompletionCache, request: httpx.Request) -> tuple:
+    """(key, model) for a cacheable chat completion request, else (None, None)"""
+    if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+        return None, None
+    try:
+        payload = json.loads(request.content)
+    except (httpx.RequestNotRead, ValueError):
+        return None, None
+    if not is_cacheable(payload):
+        cache.metrics["bypassed"] += 1
+        return None, None
+    return completion_cache_key(payload), payload.get("model")
+
+
+def _decoded_headers(response: httpx.Response) -> Dict[str, str]:
+    # The body is stored decoded, so transfer and content encodings no longer apply
+    return {
+        name: value for name, value in response.headers.items()
+        if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+    }
+
+
+def _cached_response(request: httpx.Request, body: bytes) -> httpx.Response:
+    return httpx.Response(
+        200, headers={"content-type": "application/json", "x-completion-cache": "hit"}, content=body, request=request
+    )
+
+
+class CachedAsyncTransport(httpx.AsyncBaseTransport):
+    """Serves repeated chat completions from a CompletionCache before they reach the provider"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cache: CompletionCache):
+        self._transport = transport
+        self.cache = cache
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key, model = _cache_lookup(self.cache, request)
+        if key is None:
+            return await self._transport.handle_async_request(request)
+
+        body = await asyncio.to_thread(self.cache.get, key)
+        if body is not None:
+            return _cached_response(request, body)
+
+        response = await self._transport.handle_async_request(request)
+        if response.status_code != 200:
+            return response
+        body = await response.aread()
+        await asyncio.to_thread(self.cache.put, key, model, body)
+        return httpx.Response(200, headers=_decoded_headers(response), content=body, request=request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class CachedTransport(httpx.BaseTransport):
+    """Synchronous counterpart of CachedAsyncTransport"""
+
+    def __init__(self, transport: httpx.BaseTransport, cache: CompletionCache):
+        self._transport = transport
+        self.cache = cache
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key, model = _cache_lookup(self.cache, request)
+        if key is None:
+            return self._transport.handle_request(request)
+
+        body = self.cache.get(key)
+        if body is not None:
+            return _cached_response(request, body)
+
+        response = self._transport.handle_request(request)
+        if response.status_code != 200:
+            return response
+        body = response.read()
+        self.cache.put(key, model, body)
+        return httpx.Response(200, headers=_decoded_headers(response), content=body, request=request)
+
+    def close(self):
+        self._transport.close()
@@ -1,4 +1,5 @@
 from pathlib import Path
+import json
 import os
 
 # --- Directories ---
@@ -7,14 +8,18 @@ TMP_DIR = BASE_DIR.parent / "tmp"
 UPLOAD_DIR = TMP_DIR / "uploads"
 VECTOR_DB_PATH = TMP_DIR / "lancedb"
 DB_FILE = TMP_DIR / "enterprise_rag.db"
+TENANT_DATA_DIR = TMP_DIR / "tenants"
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", str(TMP_DIR / "snapshots")))
 
 # --- Create directories if they don't exist ---
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 VECTOR_DB_PATH.mkdir(parents=True, exist_ok=True)
 DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+TENANT_DATA_DIR.mkdir(parents=True, exist_ok=True)
+SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
 
 # --- Dynamic Model Provider Configuration ---
-# Set the provider using an environment variable: "openai", "anthropic", "google", "ollama", "vllm", "lm-studio"
+# Set the provider using an environment variable: "openai", "anthropic", "google", "ollama", "vllm", "lm-studio", "router"
 MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "openai").lower()
 
 # --- OpenAI Configuration ---
@@ -42,6 +47,137 @@ CUSTOM_API_BASE_URL = os.getenv("CUSTOM_API_BASE_URL")  # e.g., http://localhost
 CUSTOM_API_KEY = os.getenv("CUSTOM_API_KEY", "not-needed")
 CUSTOM_MODEL_NAME = os.getenv("CUSTOM_MODEL_NAME")
 
+# --- Model Router Configuration ---
+# Comma-separated providers to route between (openai, lm-studio, vllm, custom, ollama, fake);
+# used by MODEL_PROVIDER=router, defaults to MODEL_PROVIDER alone
+MODEL_ROUTER_PROVIDERS = os.getenv("MODEL_ROUTER_PROVIDERS", "")
+# Rolling window of latency/error samples per provider, by count and by age
+MODEL_ROUTER_WINDOW = int(os.getenv("MODEL_ROUTER_WINDOW", "100"))
+MODEL_ROUTER_WINDOW_SECONDS = float(os.getenv("MODEL_ROUTER_WINDOW_SECONDS", "300"))
+# Providers with fewer samples are treated as unexplored and tried first
+MODEL_ROUTER_MIN_SAMPLES = int(os.getenv("MODEL_ROUTER_MIN_SAMPLES", "20"))
+MODEL_ROUTER_MAX_ERROR_RATE = float(os.getenv("MODEL_ROUTER_MAX_ERROR_RATE", "0.5"))
+# Send a second request to the runner-up once the primary exceeds its p95 latency
+MODEL_ROUTER_HEDGE = os.getenv("MODEL_ROUTER_HEDGE", "false").lower() == "true"
+# Consecutive failures that open a provider's circuit, and how often an open circuit is probed
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+
+# --- LLM Connection Pool Configuration ---
+# One pool per provider base URL, shared by every agent and the memory model
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+LLM_POOL_KEEPALIVE_SECONDS = float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+# HTTP/2 is used for HTTPS endpoints when the h2 package is installed
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+
+# --- LLM Rate Limit Configuration ---
+# Client-side admission per provider base URL; 0 disables a limit
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+# Per-provider overrides as JSON, e.g. {"https://api.openai.com/v1": {"requests_per_minute": 500, "tokens_per_minute": 30000}}
+LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+# Calls waiting for capacity beyond these are answered with a rate-limit error
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "100"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+# Retries of provider 429s, with full-jitter exponential backoff
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+
+# --- Completion Cache Configuration ---
+# Exact-match cache of non-streaming chat completions, keyed by model, messages and sampling params
+COMPLETION_CACHE_ENABLED = os.getenv("COMPLETION_CACHE_ENABLED", "true").lower() == "true"
+COMPLETION_CACHE_PATH = Path(os.getenv("COMPLETION_CACHE_PATH", str(TMP_DIR / "completion_cache.db")))
+COMPLETION_CACHE_MAX_BYTES = int(os.getenv("COMPLETION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Only temperature 0 requests are cached unless this is set
+COMPLETION_CACHE_SAMPLED = os.getenv("COMPLETION_CACHE_SAMPLED", "false").lower() == "true"
+
+# --- Fake LLM Server Configuration ---
+# Local OpenAI-compatible stand-in for load tests (python run_backend.py --fake-llm)
+FAKE_LLM_PORT = int(os.getenv("FAKE_LLM_PORT", "1234"))
+# Time to first byte: seconds, or uniform:LOW,HIGH / normal:MEAN,STDDEV / lognormal:MEDIAN,SIGMA / exponential:MEAN
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "0")
+# Generation speed after the first token; 0 returns completions instantly
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+# Completion length in tokens (capped by max_tokens); 0 answers with a short echo of the question
+FAKE_LLM_COMPLETION_TOKENS = int(os.getenv("FAKE_LLM_COMPLETION_TOKENS", "0"))
+# Fraction of requests answered with a 500 / with a 429
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+FAKE_LLM_EMBEDDING_DIMENSIONS = int(os.getenv("FAKE_LLM_EMBEDDING_DIMENSIONS", "768"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED")) if os.getenv("FAKE_LLM_SEED") else None
+
+# --- Knowledge Base Configuration ---
+# Fraction of tombstoned documents that triggers background compaction
+KB_COMPACTION_RATIO = float(os.getenv("KB_COMPACTION_RATIO", "0.3"))
+
+# --- Upload Storage Configuration ---
+# Byte quota for UPLOAD_DIR; least recently used uploads are evicted above it
+UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+# Eviction frees space down to this fraction of the quota
+UPLOAD_QUOTA_LOW_WATERMARK = float(os.getenv("UPLOAD_QUOTA_LOW_WATERMARK", "0.9"))
+UPLOAD_MAX_AGE_DAYS = float(os.getenv("UPLOAD_MAX_AGE_DAYS", "7"))
+UPLOAD_SWEEP_INTERVAL_SECONDS = int(os.getenv("UPLOAD_SWEEP_INTERVAL_SECONDS", "3600"))
+
+# --- Multi-Tenant Configuration ---
+# Requests without a tenant (or with this ID) use the shared default knowledge base
+DEFAULT_TENANT_ID = os.getenv("DEFAULT_TENANT_ID", "default")
+# Maximum number of tenant knowledge bases kept in memory before idle ones are unloaded
+MAX_LOADED_TENANTS = int(os.getenv("MAX_LOADED_TENANTS", "8"))
+
+# --- Query Pipeline Configuration ---
+# Deadlines for the context stages that run concurrently before prompt assembly;
+# a stage that misses its deadline contributes nothing to the prompt
+MEMORY_STAGE_TIMEOUT_SECONDS = float(os.getenv("MEMORY_STAGE_TIMEOUT_SECONDS", "2.0"))
+RETRIEVAL_STAGE_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_STAGE_TIMEOUT_SECONDS", "3.0"))
+HISTORY_STAGE_TIMEOUT_SECONDS = float(os.getenv("HISTORY_STAGE_TIMEOUT_SECONDS", "0.5"))
+# Number of sessions whose recent turns are kept in memory
+MAX_HISTORY_SESSIONS = int(os.getenv("MAX_HISTORY_SESSIONS", "1000"))
+# /query/batch/: questions answered at once per batch, and the largest batch accepted
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "8"))
+BATCH_QUERY_MAX_ITEMS = int(os.getenv("BATCH_QUERY_MAX_ITEMS", "5000"))
+
+# --- Query Router Configuration ---
+# Pick the RAG agent or the research team per query from its estimated complexity;
+# when off, use_advanced_reasoning alone decides
+QUERY_ROUTER_ENABLED = os.getenv("QUERY_ROUTER_ENABLED", "true").lower() == "true"
+# Complexity score (0-1) from which a query goes to the research team
+QUERY_ROUTER_THRESHOLD = float(os.getenv("QUERY_ROUTER_THRESHOLD", "0.5"))
+# Model calls the research team makes per answer, relative to one for the RAG agent
+QUERY_ROUTER_RESEARCH_COST = float(os.getenv("QUERY_ROUTER_RESEARCH_COST", "4"))
+# Budgets a research answer must fit in; 0 disables a budget
+QUERY_ROUTER_MAX_TOKENS = int(os.getenv("QUERY_ROUTER_MAX_TOKENS", "0"))
+QUERY_ROUTER_LATENCY_BUDGET_SECONDS = float(os.getenv("QUERY_ROUTER_LATENCY_BUDGET_SECONDS", "0"))
+
+# --- Context Assembly Configuration ---
+# Token budget for retrieved passages in the prompt, filled by maximal marginal relevance
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_PASSAGE_TOKENS = int(os.getenv("CONTEXT_PASSAGE_TOKENS", "200"))
+# 1.0 ranks purely by relevance, lower values favour passages unlike those already chosen
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+
+# --- Reranking Configuration ---
+# "heuristic" (lexical CPU scorer), "none", or "cross-encoder:<model>" (needs sentence-transformers)
+RERANKER = os.getenv("RERANKER", "heuristic").lower()
+# Candidates fetched from the knowledge base and passed on after reranking
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "5"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+# Above this the first-stage order is used as is
+RERANK_LATENCY_MS = float(os.getenv("RERANK_LATENCY_MS", "50"))
+
+# --- Prompt Compression Configuration ---
+# Keep only the sentences of each packed passage that best match the query
+# (lexical overlap of words and character trigrams; no embedding calls)
+PROMPT_COMPRESSION_ENABLED = os.getenv("PROMPT_COMPRESSION_ENABLED", "false").lower() == "true"
+# Fraction of each passage's tokens to keep, and sentences kept around each selected one
+PROMPT_COMPRESSION_RATIO = float(os.getenv("PROMPT_COMPRESSION_RATIO", "0.5"))
+PROMPT_COMPRESSION_NEIGHBOURS = int(os.getenv("PROMPT_COMPRESSION_NEIGHBOURS", "1"))
+
 # --- Agent IDs ---
 RAG_AGENT_ID = "enterprise-rag-agent"
 REASONING_AGENT_ID = "reasoning-specialist"
@@ -53,6 +189,16 @@ MEMORY_DB_PATH = Path(os.getenv("MEMORY_DB_PATH", str(TMP_DIR / "session_memorie
 USE_MEMORY_DEFAULT = os.getenv("USE_MEMORY_DEFAULT", "true").lower() == "true"
 MAX_MEMORY_CONTEXT = int(os.getenv("MAX_MEMORY_CONTEXT", "3"))
 MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", "5"))
+# Concurrent aiosqlite connections used for memory reads
+MEMORY_DB_POOL_SIZE = int(os.getenv("MEMORY_DB_POOL_SIZE", "4"))
+# Largest page of memories one listing request may ask for
+MEMORY_PAGE_MAX_SIZE = int(os.getenv("MEMORY_PAGE_MAX_SIZE", "100"))
+# Memory search: "local" answers from an in-process BM25 index per user (lexical
+# only); "agentic" asks the memory model to pick memories (one LLM call)
+MEMORY_SEARCH_METHOD = os.getenv("MEMORY_SEARCH_METHOD", "local").lower()
+# Share of a question's content words a memory must contain to be returned
+MEMORY_INDEX_MIN_SCORE = float(os.getenv("MEMORY_INDEX_MIN_SCORE", "0.2"))
+MEMORY_INDEX_MAX_USERS = int(os.getenv("MEMORY_INDEX_MAX_USERS", "1000"))
 
 # Memory model configuration (uses same provider as main model by default)
 MEMORY_MODEL_PROVIDER = os.getenv("MEMORY_MODEL_PROVIDER", MODEL_PROVIDER).lower()
@@ -0,0 +1,149 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from . import config
+from .document_index import tokenize
+from .metrics import count_tokens
+
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?。])\s+|\n")
+
+# Passages whose term sets overlap at least this much are treated as duplicates
+DUPLICATE_JACCARD = 0.8
+
+
+def split_passages(text: str, max_tokens: int, model: Optional[str] = None) -> List[str]:
+    """Split a document into passages of at most ``max_tokens`` tokens.
+
+    Paragraphs are merged greedily; paragraphs that are too long are split at
+    sentence boundaries, and sentences that are still too long are cut.
+    """
+    units: List[str] = []
+    for paragraph in _PARAGRAPH_PATTERN.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph, model) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in _SENTENCE_PATTERN.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            # Cut at one character per token, which is conservative for every script
+            step = max_tokens
+            units.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for unit in units:
+        unit_tokens = count_tokens(unit, model)
+        if current and current_tokens + unit_tokens > max_tokens:
+            passages.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        passages.append("\n\n".join(current))
+    return passages
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    if not dot:
+        return 0.0
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def _jaccard(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    intersection = len(a.keys() & b.keys())
+    return intersection / (len(a) + len(b) - intersection)
+
+
+def pack_context(
+    query: str,
+    results: List[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    passage_tokens: Optional[int] = None,
+    mmr_lambda: Optional[float] = None,
+    model: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Select passages from search results by maximal marginal relevance.
+
+    Documents are split into passages, exact and near-duplicate passages are
+    dropped, and passages are picked greedily by
+    ``lambda * relevance - (1 - lambda) * max similarity to those already
+    picked`` until ``token_budget`` is filled. Relevance blends the search
+    score of the source document with the passage's term overlap with the
+    query, so vector hits without shared terms still rank by their score.
+    """
+    token_budget = config.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    passage_tokens = config.CONTEXT_PASSAGE_TOKENS if passage_tokens is None else passage_tokens
+    mmr_lambda = config.CONTEXT_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    if not results or token_budget <= 0:
+        return []
+
+    scores = [result.get("score") for result in results]
+    max_score = max((score for score in scores if isinstance(score, (int, float))), default=0) or 1.0
+    query_terms = Counter(tokenize(query))
+
+    candidates = []
+    seen_hashes = set()
+    for rank, result in enumerate(results):
+        score = result.get("score")
+        # Without a score, fall back to the search rank
+        doc_relevance = score / max_score if isinstance(score, (int, float)) else 1.0 / (rank + 1)
+        for passage in split_passages(result.get("content") or "", passage_tokens, model):
+            digest = hashlib.sha1(" ".join(passage.split()).lower().encode("utf-8")).hexdigest()
+            if digest in seen_hashes:
+                continue
+            seen_hashes.add(digest)
+            terms = Counter(tokenize(passage))
+            candidates.append({
+                "result": result,
+                "content": passage,
+                "terms": terms,
+                "tokens": count_tokens(passage, model),
+                "relevance": 0.5 * doc_relevance + 0.5 * _cosine(query_terms, terms),
+            })
+
+    selected = []
+    used_tokens = 0
+    while candidates:
+        best_index = None
+        best_score = -math.inf
+        for index, candidate in enumerate(candidates):
+            if used_tokens + candidate["tokens"] > token_budget:
+                continue
+            redundancy = max((_cosine(candidate["terms"], chosen["terms"]) for chosen in selected), default=0.0)
+            score = mmr_lambda * candidate["relevance"] - (1 - mmr_lambda) * redundancy
+            if score > best_score:
+                best_index, best_score = index, score
+        if best_index is None:
+            break
+        candidate = candidates.pop(best_index)
+        if any(_jaccard(candidate["terms"], chosen["terms"]) >= DUPLICATE_JACCARD for chosen in selected):
+            continue
+        selected.append(candidate)
+        used_tokens += candidate["tokens"]
+
+    return [
+        {
+            "id": candidate["result"].get("id"),
+            "content": candidate["content"],
+            "metadata": candidate["result"].get("metadata", {}),
+            "score": round(candidate["relevance"], 4),
+            "tokens": candidate["tokens"],
+        }
+        for candidate in selected
+    ]
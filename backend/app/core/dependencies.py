@@ -1,11 +1,20 @@
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException
 import os
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, List, Dict, NamedTuple, TYPE_CHECKING
 import logging
 import asyncio
-from openai import AsyncOpenAI
+import threading
+import uuid
+import json
+from pathlib import Path
 from unittest.mock import MagicMock
 
+from .document_index import DocumentIndex, MetadataIndex
+from .llm_scheduler import is_rate_limit_error
+from .model_router import NoProviderAvailableError, get_model_router
+from .query_pipeline import retrieve_passages
+from .tenants import TenantRegistry, InvalidTenantError, validate_tenant_id
+
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -15,48 +24,241 @@ class MockKnowledgeBase(MagicMock):
     def __init__(self):
         super().__init__()
         self.documents = []
+        self.version = 0
         
-    def add_document(self, content: str, metadata: Optional[dict] = None):
-        return "mock_doc_id"
+    def add_document(self, content: str, metadata: Optional[dict] = None, document_id: Optional[str] = None):
+        return document_id or "mock_doc_id"
+    
+    def get_document(self, document_id: str):
+        return None
+    
+    def delete_document(self, document_id: str):
+        return False
     
-    def search(self, query: str, limit: int = 5):
+    def search(self, query: str, limit: int = 5, filters: Optional[dict] = None):
         return []
 
+class _KnowledgeView(NamedTuple):
+    """Slots and the indexes numbered against them, swapped in as one unit"""
+    slots: List[Optional[dict]]
+    id_index: Dict[str, int]
+    index: DocumentIndex
+    metadata_index: MetadataIndex
+
 # Simple knowledge base implementation
+class KnowledgeBaseClosedError(RuntimeError):
+    """Raised when writing to a knowledge base that was unloaded and saved"""
+
+
 class SimpleKnowledgeBase:
+    # Every document's metadata carries its id, so searches can be scoped to one
+    supports_document_filter = True
+
     def __init__(self):
-        self.documents = []
-        
-    def add_document(self, content: str, metadata: Optional[dict] = None):
-        self.documents.append({
-            "content": content,
-            "metadata": metadata or {}
-        })
-    
-    def search(self, query: str, limit: int = 5):
-        # Simple text-based search
+        from ..core import config
+        # Readers take no lock: they read self._view once. Adds and deletes
+        # update it in place under self._lock; compact and restore build a
+        # new view and replace it with a single assignment.
+        self._view = _KnowledgeView([], {}, DocumentIndex(), MetadataIndex())
+        self.compaction_ratio = config.KB_COMPACTION_RATIO
+        self._lock = threading.RLock()
+        self._closed = False
+        # Bumped on every content change; used to key coalesced queries
+        self.version = 0
+
+    def _check_open(self):
+        # Callers hold self._lock, so no write can land after close() returns
+        if self._closed:
+            raise KnowledgeBaseClosedError("Knowledge base was unloaded; retry the request")
+
+    def close(self):
+        """Refuse further writes, e.g. before the contents are saved on unload"""
+        with self._lock:
+            self._closed = True
+
+    @property
+    def _slots(self) -> List[Optional[dict]]:
+        return self._view.slots
+
+    @property
+    def _id_index(self) -> Dict[str, int]:
+        return self._view.id_index
+
+    @property
+    def index(self) -> DocumentIndex:
+        return self._view.index
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        return self._view.metadata_index
+
+    @property
+    def documents(self) -> List[dict]:
+        """Live (non-deleted) documents in insertion order"""
+        return [doc for doc in self._slots if doc is not None]
+
+    def add_document(self, content: str, metadata: Optional[dict] = None, document_id: Optional[str] = None) -> str:
+        with self._lock:
+            self._check_open()
+            document_id = document_id or f"doc_{uuid.uuid4().hex[:16]}"
+            if document_id in self._id_index:
+                raise ValueError(f"Document {document_id} already exists")
+            slot = len(self._slots)
+            self._slots.append({
+                "id": document_id,
+                "content": content,
+                "metadata": metadata or {}
+            })
+            self._id_index[document_id] = slot
+            self.version += 1
+            self.index.add(slot, content)
+            self.metadata_index.add(slot, self._filterable_metadata(self._slots[slot]))
+            return document_id
+
+    def get_document(self, document_id: str) -> Optional[dict]:
+        view = self._view
+        slot = view.id_index.get(document_id)
+        return view.slots[slot] if slot is not None else None
+
+    def delete_document(self, document_id: str) -> bool:
+        """Tombstone a document; its slot is reclaimed by ``compact``"""
+        with self._lock:
+            self._check_open()
+            slot = self._id_index.pop(document_id, None)
+            if slot is None:
+                return False
+            self.metadata_index.remove(slot, self._filterable_metadata(self._slots[slot]))
+            self._slots[slot] = None
+            self.index.remove(slot)
+            self.version += 1
+            return True
+
+    def replace_document(self, document_id: str, content: str, metadata: Optional[dict] = None) -> str:
+        """Replace a document's content while keeping its ID"""
+        with self._lock:
+            if not self.delete_document(document_id):
+                raise KeyError(document_id)
+            return self.add_document(content, metadata, document_id=document_id)
+
+    def needs_compaction(self) -> bool:
+        return self.index.tombstone_ratio >= self.compaction_ratio
+
+    def compact(self) -> Dict[str, int]:
+        """Reclaim tombstoned slots and renumber the retrieval index"""
+        with self._lock:
+            self._check_open()
+            slot_map = {}
+            slots = []
+            for old_slot, doc in enumerate(self._slots):
+                if doc is not None:
+                    slot_map[old_slot] = len(slots)
+                    slots.append(doc)
+            reclaimed = len(self._slots) - len(slots)
+            self._view = self._build_view(slots, self.index.compacted(slot_map))
+        logger.info(f"Knowledge base compaction reclaimed {reclaimed} slots")
+        return {"reclaimed_slots": reclaimed, "live_documents": len(slots)}
+
+    @staticmethod
+    def _filterable_metadata(doc: dict) -> dict:
+        return {**doc["metadata"], "document_id": doc["id"]}
+
+    def _build_view(self, slots: List[dict], index: DocumentIndex) -> _KnowledgeView:
+        metadata_index = MetadataIndex()
+        metadata_index.rebuild((slot, self._filterable_metadata(doc)) for slot, doc in enumerate(slots))
+        id_index = {doc["id"]: slot for slot, doc in enumerate(slots)}
+        return _KnowledgeView(slots, id_index, index, metadata_index)
+
+    def export_state(self):
+        """Return live documents, postings and lengths renumbered to dense slots"""
+        with self._lock:
+            slot_map = {}
+            documents = []
+            for old_slot, doc in enumerate(self._slots):
+                if doc is not None:
+                    slot_map[old_slot] = len(documents)
+                    documents.append(doc)
+            postings = [
+                (term, slot_map[slot], tf)
+                for term, entries in self.index.postings.items()
+                for slot, tf in entries.items()
+                if slot in slot_map
+            ]
+            doc_lengths = [self.index.doc_lengths[old_slot] for old_slot in slot_map]
+        return documents, postings, doc_lengths
+
+    def restore(self, documents: List[dict], postings: Dict[str, Dict[int, int]], doc_lengths: Dict[int, int]):
+        """Replace the contents with a snapshot whose slots are ``range(len(documents))``"""
+        index = DocumentIndex()
+        index.load_state(postings, doc_lengths)
+        view = self._build_view(list(documents), index)
+        with self._lock:
+            self._check_open()
+            self._view = view
+            self.version += 1
+
+    def save(self, path: Path):
+        """Write live documents to a JSON lines file"""
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc in self.documents:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        tmp_path.replace(path)
+
+    def load(self, path: Path):
+        """Add documents from a JSON lines file written by ``save``"""
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    doc = json.loads(line)
+                    self.add_document(doc["content"], doc.get("metadata"), document_id=doc["id"])
+
+    def search(self, query: str, limit: int = 5, filters: Optional[dict] = None):
+        """Rank documents for a query, restricted to those matching ``filters``"""
+        view = self._view
+        candidates = view.metadata_index.evaluate(filters) if filters else None
         results = []
-        for i, doc in enumerate(self.documents):
-            if query.lower() in doc["content"].lower():
-                results.append({
-                    "content": doc["content"],
-                    "metadata": doc["metadata"],
-                    "score": 0.8  # dummy score
-                })
-        return results[:limit]
+        for slot, score in view.index.search(query, limit, candidates=candidates):
+            doc = view.slots[slot]
+            if doc is None:
+                continue
+            results.append({
+                "id": doc["id"],
+                "content": doc["content"],
+                "metadata": doc["metadata"],
+                "score": score
+            })
+        return results
 
 # Mock agent for testing
+def document_filter(knowledge_base, document_id: str) -> Optional[dict]:
+    """Knowledge filter scoping a search to one document, or None if the knowledge base cannot apply it"""
+    if getattr(knowledge_base, "supports_document_filter", False) is True:
+        return {"document_id": document_id}
+    return None
+
+
 class MockAgent(MagicMock):
+    supports_prefetch = True
+    
     def __init__(self, name: str, knowledge_base=None):
         super().__init__()
         self.name = name
         self.knowledge_base = knowledge_base
         self.content = "Mock response"
         self.sources = []
+        self.add_history_to_messages = False
+        self.enable_user_memories = False
+        self.add_memory_references = False
+        self.model_id = "mock-model"
         
-    async def arun(self, query: str, user_id: str = None, session_id: str = None):
+    async def arun(self, query: str, user_id: str = None, session_id: str = None, knowledge_filters: dict = None,
+                   search_results: list = None, history: list = None):
         return "Mock response from agent"
     
+    async def astream(self, query: str, user_id: str = None, session_id: str = None, knowledge_filters: dict = None,
+                      search_results: list = None, history: list = None):
+        yield "Mock response from agent"
+    
     def run(self, query: str):
         mock_response = MagicMock()
         mock_response.content = "Mock response from agent"
@@ -65,64 +267,89 @@ class MockAgent(MagicMock):
 
 # Simple agent implementation
 class SimpleAgent:
+    # Accepts search results and history gathered by the caller
+    supports_prefetch = True
+    
     def __init__(self, name: str, knowledge_base: SimpleKnowledgeBase):
         self.name = name
         self.knowledge_base = knowledge_base
         
-    async def arun(self, query: str, user_id: str = None, session_id: str = None):
+    async def arun(self, query: str, user_id: str = None, session_id: str = None, knowledge_filters: dict = None,
+                   search_results: list = None, history: list = None):
         # Simple implementation that searches knowledge base
-        results = self.knowledge_base.search(query)
+        results = search_results
+        if results is None:
+            results = retrieve_passages(self.knowledge_base, query, knowledge_filters)
         if results:
             context = "\n".join([r["content"] for r in results])
             return f"사용 가능한 문서를 바탕으로 답변드립니다:\n\n{context}\n\n질문: {query}\n\n위 문서 내용을 참고하여 답변드립니다. ({self.name}에서 제공)"
         else:
             return f"죄송합니다. 질문 '{query}'에 대한 관련 정보를 찾을 수 없습니다. 더 구체적인 질문을 해주시거나 관련 문서를 업로드해 주세요."
+    
+    async def astream(self, query: str, user_id: str = None, session_id: str = None, knowledge_filters: dict = None,
+                      search_results: list = None, history: list = None):
+        # No model behind this agent, so the whole answer is a single chunk
+        yield await self.arun(query, user_id=user_id, session_id=session_id, knowledge_filters=knowledge_filters,
+                              search_results=search_results, history=history)
 
 # LM Studio compatible agent
 class LMStudioAgent:
+    supports_prefetch = True
+    
     def __init__(self, name: str, knowledge_base: SimpleKnowledgeBase):
         self.name = name
         self.knowledge_base = knowledge_base
-        from ..core import config
-        self.client = AsyncOpenAI(
-            api_key="not-needed",
-            base_url=config.LM_STUDIO_BASE_URL
-        )
-        self.model_id = config.CUSTOM_MODEL_NAME
-        
-    async def arun(self, query: str, user_id: str = None, session_id: str = None):
-        try:
-            # Search knowledge base first
-            results = self.knowledge_base.search(query)
-            
-            # Prepare context with Korean language instruction
-            base_system_prompt = """당신은 한국어로 답변하는 기업용 RAG(검색 증강 생성) 어시스턴트입니다. 
+        # Shared by all agents: routes between the configured OpenAI-compatible providers
+        self.router = get_model_router()
+        self.model_id = self.router.primary.model_id
+    
+    def _build_messages(self, query: str, results: list, history: list = None) -> list:
+        # Prepare context with Korean language instruction
+        base_system_prompt = """당신은 한국어로 답변하는 기업용 RAG(검색 증강 생성) 어시스턴트입니다. 
 반드시 한국어로만 답변해주세요. 영어나 다른 언어로 답변하지 마세요.
 
 사용자의 질문에 대해 정확하고 도움이 되는 답변을 제공하세요. 
 답변은 친근하고 전문적인 톤으로 작성해주세요."""
 
-            if results:
-                context = "\n".join([f"문서 {i+1}: {r['content'][:500]}..." for i, r in enumerate(results)])
-                system_message = f"""{base_system_prompt}
+        if results:
+            context = "\n\n".join([f"문서 {i+1}: {r['content']}" for i, r in enumerate(results)])
+            system_message = f"""{base_system_prompt}
 
 다음 문서들을 참고하여 사용자의 질문에 답변해주세요:
 
 {context}
 
 위 문서 내용을 바탕으로 사용자의 질문에 한국어로 답변해주세요."""
-            else:
-                system_message = f"""{base_system_prompt}
+        else:
+            system_message = f"""{base_system_prompt}
 
 사용자의 질문에 대해 당신의 지식을 바탕으로 한국어로 답변해주세요."""
-            
+        
+        return [
+            {"role": "system", "content": system_message},
+            *(history or []),
+            {"role": "user", "content": query}
+        ]
+    
+    @staticmethod
+    def _fallback_response(query: str, results: list) -> str:
+        # Fallback to simple response in Korean
+        if results:
+            context = "\n".join([r["content"] for r in results])
+            return f"사용 가능한 문서를 바탕으로 답변드립니다:\n{context}\n\n질문에 대한 답변: {query}\n\n(참고: LM Studio 연결 실패로 기본 응답을 사용했습니다)"
+        return f"죄송합니다. 질문 '{query}'에 대한 관련 정보를 찾을 수 없습니다.\n\n(참고: LM Studio 연결 실패)"
+        
+    async def arun(self, query: str, user_id: str = None, session_id: str = None, knowledge_filters: dict = None,
+                   search_results: list = None, history: list = None):
+        # Search knowledge base first unless the caller already did; the
+        # fallback answer reuses these results if the model is unavailable
+        results = search_results
+        if results is None:
+            results = retrieve_passages(self.knowledge_base, query, knowledge_filters, model=self.model_id)
+        try:
             # Call LM Studio with simple message format
-            response = await self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": query}
-                ],
+            response = await self.router.complete(
+                self._build_messages(query, results, history),
                 temperature=0.7,
                 max_tokens=1000
             )
@@ -130,14 +357,41 @@ class LMStudioAgent:
             return response.choices[0].message.content
             
         except Exception as e:
-            logger.error(f"LM Studio agent error: {e}")
-            # Fallback to simple response in Korean
-            results = self.knowledge_base.search(query)
-            if results:
-                context = "\n".join([r["content"] for r in results])
-                return f"사용 가능한 문서를 바탕으로 답변드립니다:\n{context}\n\n질문에 대한 답변: {query}\n\n(참고: LM Studio 연결 실패로 기본 응답을 사용했습니다)"
+            if is_rate_limit_error(e):
+                # The API answers 429 with Retry-After instead of a degraded answer
+                raise
+            if isinstance(e, NoProviderAvailableError):
+                # Circuits are open: answer from the documents without waiting on the model
+                logger.warning(f"LM Studio agent using retrieval-only fallback: {e}")
             else:
-                return f"죄송합니다. 질문 '{query}'에 대한 관련 정보를 찾을 수 없습니다.\n\n(참고: LM Studio 연결 실패)"
+                logger.error(f"LM Studio agent error: {e}")
+        return self._fallback_response(query, results)
+    
+    async def astream(self, query: str, user_id: str = None, session_id: str = None, knowledge_filters: dict = None,
+                      search_results: list = None, history: list = None):
+        """Yield answer tokens from LM Studio as they are generated"""
+        results = search_results
+        if results is None:
+            results = retrieve_passages(self.knowledge_base, query, knowledge_filters, model=self.model_id)
+        started = False
+        try:
+            stream = self.router.stream(
+                self._build_messages(query, results, history),
+                temperature=0.7,
+                max_tokens=1000
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    started = True
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            if started or is_rate_limit_error(e):
+                raise
+            if isinstance(e, NoProviderAvailableError):
+                logger.warning(f"LM Studio agent using retrieval-only fallback: {e}")
+            else:
+                logger.error(f"LM Studio streaming error: {e}")
+            yield self._fallback_response(query, results)
 
 # Try to import advanced agent factory; fall back to SimpleAgent if unavailable.
 try:
@@ -153,6 +407,10 @@ except Exception:
     _ADVANCED_FACTORY_AVAILABLE = False
 
 
+# Providers served by LMStudioAgent through the model router rather than agno
+ROUTED_PROVIDERS = {"lm-studio", "router"}
+
+
 # Helper to decide whether we should use the advanced stack
 def _use_advanced_stack() -> bool:
     """Return True if the advanced agent stack should be used."""
@@ -167,8 +425,8 @@ def _use_advanced_stack() -> bool:
 
     # For LM Studio, use our custom LMStudioAgent instead of agno
     from ..core import config
-    if config.MODEL_PROVIDER == "lm-studio":
-        logger.info("MODEL_PROVIDER='lm-studio'. Using LMStudioAgent instead of agno.")
+    if config.MODEL_PROVIDER in ROUTED_PROVIDERS:
+        logger.info(f"MODEL_PROVIDER='{config.MODEL_PROVIDER}'. Using LMStudioAgent instead of agno.")
         return False  # Use our custom LM Studio agent
     
     use_advanced = config.MODEL_PROVIDER not in {"simple", "mock", "test"}
@@ -182,8 +440,104 @@ _reasoning_agent: SimpleAgent = None
 _research_team: SimpleAgent = None
 
 
-def get_knowledge_base() -> SimpleKnowledgeBase:
+def _is_tenant(tenant_id: Optional[str]) -> bool:
+    from ..core import config
+    return bool(tenant_id) and tenant_id != config.DEFAULT_TENANT_ID
+
+
+def _tenant_data_file(tenant_id: str) -> Path:
+    from ..core import config
+    return config.TENANT_DATA_DIR / f"{tenant_id}.jsonl"
+
+
+def _load_tenant_knowledge_base(tenant_id: str):
+    """Build the knowledge base partition for a tenant"""
+    if os.getenv("PYTEST_CURRENT_TEST") or "pytest" in os.getenv("PYTHONPATH", ""):
+        return MockKnowledgeBase()
+    if _use_advanced_stack():
+        # Each tenant gets its own vector table
+        return create_knowledge_base(table_name=f"enterprise_documents_{tenant_id}")
+
+    knowledge_base = SimpleKnowledgeBase()
+    data_file = _tenant_data_file(tenant_id)
+    if data_file.exists():
+        knowledge_base.load(data_file)
+        logger.info(f"Loaded {len(knowledge_base.documents)} documents for tenant {tenant_id}")
+    return knowledge_base
+
+
+def _unload_tenant_knowledge_base(tenant_id: str, knowledge_base):
+    """Persist an in-memory tenant knowledge base before it is dropped"""
+    if isinstance(knowledge_base, SimpleKnowledgeBase):
+        # Requests still holding this instance get an error instead of a write
+        # that the saved file would not contain
+        knowledge_base.close()
+        knowledge_base.save(_tenant_data_file(tenant_id))
+
+
+def _create_tenant_registry() -> TenantRegistry:
+    from ..core import config
+    return TenantRegistry(
+        loader=_load_tenant_knowledge_base,
+        unloader=_unload_tenant_knowledge_base,
+        max_loaded=config.MAX_LOADED_TENANTS,
+    )
+
+
+tenant_registry = _create_tenant_registry()
+
+
+def get_tenant_id(x_tenant_id: Optional[str] = Header(None)) -> Optional[str]:
+    """Read the tenant from the X-Tenant-ID request header"""
+    if x_tenant_id is None:
+        return None
+    try:
+        return validate_tenant_id(x_tenant_id)
+    except InvalidTenantError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _get_tenant_agent(tenant_id: str, kind: str, enable_memory: bool = True):
+    """Return an agent of the given kind bound to a tenant's knowledge base"""
+    partition = tenant_registry.get(tenant_id)
+    agent = partition.agents.get(kind)
+    if agent is not None:
+        return agent
+
+    names = {
+        "rag": "Enterprise RAG Assistant",
+        "reasoning": "Reasoning Specialist",
+        "research": "Enterprise Research Team",
+    }
+    kb = partition.knowledge_base
+    if os.getenv("PYTEST_CURRENT_TEST") or "pytest" in os.getenv("PYTHONPATH", ""):
+        agent = MockAgent(names[kind], kb)
+    elif _use_advanced_stack():
+        if kind == "rag":
+            agent = create_rag_agent(kb, enable_memory=enable_memory)
+        elif kind == "reasoning":
+            agent = create_reasoning_agent(kb, enable_memory=enable_memory)
+        else:
+            agent = create_research_team(
+                _get_tenant_agent(tenant_id, "rag", enable_memory),
+                _get_tenant_agent(tenant_id, "reasoning", enable_memory),
+                enable_memory=enable_memory
+            )
+    else:
+        from ..core import config
+        if config.MODEL_PROVIDER in ROUTED_PROVIDERS:
+            agent = LMStudioAgent(names[kind], kb)
+        else:
+            agent = SimpleAgent(names[kind], kb)
+
+    partition.agents[kind] = agent
+    return agent
+
+
+def get_knowledge_base(tenant_id: Optional[str] = None) -> SimpleKnowledgeBase:
     global _knowledge_base
+    if _is_tenant(tenant_id):
+        return tenant_registry.get(tenant_id).knowledge_base
     if _knowledge_base is None:
         # Check if we're in test mode first
         if os.getenv("PYTEST_CURRENT_TEST") or "pytest" in os.getenv("PYTHONPATH", ""):
@@ -196,8 +550,10 @@ def get_knowledge_base() -> SimpleKnowledgeBase:
     return _knowledge_base
 
 
-def get_rag_agent(enable_memory: bool = True) -> SimpleAgent:
+def get_rag_agent(enable_memory: bool = True, tenant_id: Optional[str] = None) -> SimpleAgent:
     global _rag_agent
+    if _is_tenant(tenant_id):
+        return _get_tenant_agent(tenant_id, "rag", enable_memory)
     if _rag_agent is None:
         kb = get_knowledge_base()
         # Check if we're in test mode first
@@ -208,15 +564,17 @@ def get_rag_agent(enable_memory: bool = True) -> SimpleAgent:
         else:
             # Check if we should use LM Studio agent
             from ..core import config
-            if config.MODEL_PROVIDER == "lm-studio":
+            if config.MODEL_PROVIDER in ROUTED_PROVIDERS:
                 _rag_agent = LMStudioAgent("Enterprise RAG Assistant", kb)
             else:
                 _rag_agent = SimpleAgent("Enterprise RAG Assistant", kb)
     return _rag_agent
 
 
-def get_reasoning_agent(enable_memory: bool = True) -> SimpleAgent:
+def get_reasoning_agent(enable_memory: bool = True, tenant_id: Optional[str] = None) -> SimpleAgent:
     global _reasoning_agent
+    if _is_tenant(tenant_id):
+        return _get_tenant_agent(tenant_id, "reasoning", enable_memory)
     if _reasoning_agent is None:
         kb = get_knowledge_base()
         # Check if we're in test mode first
@@ -227,15 +585,17 @@ def get_reasoning_agent(enable_memory: bool = True) -> SimpleAgent:
         else:
             # Check if we should use LM Studio agent
             from ..core import config
-            if config.MODEL_PROVIDER == "lm-studio":
+            if config.MODEL_PROVIDER in ROUTED_PROVIDERS:
                 _reasoning_agent = LMStudioAgent("Reasoning Specialist", kb)
             else:
                 _reasoning_agent = SimpleAgent("Reasoning Specialist", kb)
     return _reasoning_agent
 
 
-def get_research_team(enable_memory: bool = True) -> SimpleAgent:
+def get_research_team(enable_memory: bool = True, tenant_id: Optional[str] = None) -> SimpleAgent:
     global _research_team
+    if _is_tenant(tenant_id):
+        return _get_tenant_agent(tenant_id, "research", enable_memory)
     if _research_team is None:
         # Check if we're in test mode first
         if os.getenv("PYTEST_CURRENT_TEST") or "pytest" in os.getenv("PYTHONPATH", ""):
@@ -249,7 +609,7 @@ def get_research_team(enable_memory: bool = True) -> SimpleAgent:
         else:
             # Check if we should use LM Studio agent
             from ..core import config
-            if config.MODEL_PROVIDER == "lm-studio":
+            if config.MODEL_PROVIDER in ROUTED_PROVIDERS:
                 kb = get_knowledge_base()
                 _research_team = LMStudioAgent("Enterprise Research Team", kb)
             else:
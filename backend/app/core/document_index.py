@@ -0,0 +1,336 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_HANGUL_PATTERN = re.compile(r"[\uac00-\ud7a3]")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens.
+
+    Korean words also emit character bigrams so that "연차" matches "연차는".
+    """
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(word)
+        if len(word) > 2 and _HANGUL_PATTERN.search(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def hash_embedding(text: str, dimensions: int = 768) -> List[float]:
+    """Deterministic unit vector from hashed word tokens.
+
+    Texts sharing words get similar vectors, which is enough for fake
+    embeddings and for small local indexes that must not call a model.
+    """
+    vector = [0.0] * dimensions
+    for token in tokenize(text) or [text]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class FilterExpressionError(ValueError):
+    """Raised when a metadata filter expression is malformed"""
+
+
+def iter_bits(bitmap: int) -> Iterator[int]:
+    """Yield the positions of the set bits in an int bitmap, in ascending order"""
+    if bitmap <= 0:
+        return
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield byte_index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+class DocumentIndex:
+    """Inverted BM25 index over document slots with tombstone deletes.
+
+    Deleting a slot only marks it as a tombstone so searches skip it right away;
+    the postings are physically removed later by ``compacted``.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.tombstones: set = set()
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    @property
+    def live_count(self) -> int:
+        return len(self.doc_lengths) - len(self.tombstones)
+
+    @property
+    def tombstone_ratio(self) -> float:
+        if not self.doc_lengths:
+            return 0.0
+        return len(self.tombstones) / len(self.doc_lengths)
+
+    def add(self, slot: int, text: str):
+        """Index the text stored in a slot"""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[slot] = tf
+            length = sum(terms.values())
+            self.doc_lengths[slot] = length
+            self._total_length += length
+
+    def remove(self, slot: int) -> bool:
+        """Mark a slot as deleted without touching the postings"""
+        with self._lock:
+            if slot not in self.doc_lengths or slot in self.tombstones:
+                return False
+            self.tombstones.add(slot)
+            self._total_length -= self.doc_lengths[slot]
+            return True
+
+    def search(self, query: str, limit: int = 5, candidates: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return (slot, score) pairs for the best matching live slots.
+
+        ``candidates`` is an optional bitmap of slots allowed by a metadata
+        filter. It is applied before scoring: when it is smaller than the
+        posting lists only the candidate slots are looked up.
+        """
+        terms = set(tokenize(query))
+        if not terms or candidates == 0:
+            return []
+
+        with self._lock:
+            live = self.live_count
+            if live <= 0:
+                return []
+            avg_length = self._total_length / live if self._total_length else 1.0
+            term_postings = [
+                (self.postings[term], self._idf(len(self.postings[term]), live))
+                for term in terms if term in self.postings
+            ]
+
+            def score(slot: int, tf: int, idf: float) -> float:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[slot] / avg_length)
+                return idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            scores: Dict[int, float] = {}
+            if candidates is None:
+                for postings, idf in term_postings:
+                    for slot, tf in postings.items():
+                        if slot not in self.tombstones:
+                            scores[slot] = scores.get(slot, 0.0) + score(slot, tf, idf)
+            else:
+                allowed = [slot for slot in iter_bits(candidates) if slot not in self.tombstones]
+                if len(allowed) < sum(len(postings) for postings, _ in term_postings):
+                    # Selective filter: probe the postings for each candidate
+                    for slot in allowed:
+                        for postings, idf in term_postings:
+                            tf = postings.get(slot)
+                            if tf:
+                                scores[slot] = scores.get(slot, 0.0) + score(slot, tf, idf)
+                else:
+                    allowed_set = set(allowed)
+                    for postings, idf in term_postings:
+                        for slot, tf in postings.items():
+                            if slot in allowed_set:
+                                scores[slot] = scores.get(slot, 0.0) + score(slot, tf, idf)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    @staticmethod
+    def _idf(document_frequency: int, live: int) -> float:
+        return math.log(1 + (live - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def compacted(self, slot_map: Dict[int, int]) -> "DocumentIndex":
+        """New index without tombstoned postings, live slots renumbered by ``slot_map``.
+
+        This index is left untouched, so searches running against it while
+        the new one is built keep seeing consistent slot numbers.
+        """
+        with self._lock:
+            postings: Dict[str, Dict[int, int]] = {}
+            for term, entries in self.postings.items():
+                remapped = {slot_map[slot]: tf for slot, tf in entries.items() if slot in slot_map}
+                if remapped:
+                    postings[term] = remapped
+            doc_lengths = {
+                slot_map[slot]: length
+                for slot, length in self.doc_lengths.items()
+                if slot in slot_map
+            }
+        index = DocumentIndex()
+        index.load_state(postings, doc_lengths)
+        return index
+
+    def rebuild(self, texts: Iterable[Tuple[int, str]]):
+        """Rebuild the index from scratch"""
+        with self._lock:
+            self.postings = {}
+            self.doc_lengths = {}
+            self.tombstones = set()
+            self._total_length = 0
+            for slot, text in texts:
+                self.add(slot, text)
+
+    def load_state(self, postings: Dict[str, Dict[int, int]], doc_lengths: Dict[int, int]):
+        """Replace the index with previously exported postings and lengths"""
+        with self._lock:
+            self.postings = postings
+            self.doc_lengths = doc_lengths
+            self.tombstones = set()
+            self._total_length = sum(doc_lengths.values())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "indexed_slots": len(self.doc_lengths),
+            "live_documents": self.live_count,
+            "tombstones": len(self.tombstones),
+            "tombstone_ratio": round(self.tombstone_ratio, 3),
+            "terms": len(self.postings),
+        }
+
+
+_RANGE_OPERATORS = {
+    "$gt": lambda value, bound: value > bound,
+    "$gte": lambda value, bound: value >= bound,
+    "$lt": lambda value, bound: value < bound,
+    "$lte": lambda value, bound: value <= bound,
+}
+
+
+class MetadataIndex:
+    """Per-field bitmap indexes over document metadata.
+
+    Every scalar metadata value maps to an int bitmap of the slots holding it,
+    so filter expressions are answered with bitwise operations instead of a
+    scan over the documents. A filter is a dict of field clauses that are
+    ANDed together::
+
+        {"type": ".pdf"}                                   # equality
+        {"filename": ["a.md", "b.md"]}                      # IN
+        {"extracted_at": {"$gte": "2024-01-01"}}            # $eq $ne $in $nin $gt $gte $lt $lte
+        {"$or": [{"type": ".md"}, {"type": "web_content"}]} # $and $or $not
+    """
+
+    def __init__(self):
+        self.bitmaps: Dict[str, Dict[Any, int]] = {}
+        self.universe = 0
+        self._lock = threading.RLock()
+
+    def add(self, slot: int, metadata: Dict[str, Any]):
+        bit = 1 << slot
+        with self._lock:
+            for field, value in metadata.items():
+                if _is_indexable(value):
+                    values = self.bitmaps.setdefault(field, {})
+                    values[value] = values.get(value, 0) | bit
+            self.universe |= bit
+
+    def remove(self, slot: int, metadata: Dict[str, Any]):
+        mask = ~(1 << slot)
+        with self._lock:
+            for field, value in metadata.items():
+                values = self.bitmaps.get(field)
+                if values is None or not _is_indexable(value) or value not in values:
+                    continue
+                values[value] &= mask
+                if not values[value]:
+                    del values[value]
+            self.universe &= mask
+
+    def rebuild(self, items: Iterable[Tuple[int, Dict[str, Any]]]):
+        with self._lock:
+            self.bitmaps = {}
+            self.universe = 0
+            for slot, metadata in items:
+                self.add(slot, metadata)
+
+    def evaluate(self, filters: Dict[str, Any]) -> int:
+        """Evaluate a filter expression into a bitmap of matching slots"""
+        if not isinstance(filters, dict):
+            raise FilterExpressionError("Filter expression must be an object")
+        with self._lock:
+            result = self.universe
+            for key, clause in filters.items():
+                if not result:
+                    break
+                result &= self._evaluate_clause(key, clause)
+            return result
+
+    def _evaluate_clause(self, key: str, clause: Any) -> int:
+        if key == "$and":
+            return self._combine(clause, lambda a, b: a & b, self.universe)
+        if key == "$or":
+            return self._combine(clause, lambda a, b: a | b, 0)
+        if key == "$not":
+            return self.universe & ~self.evaluate(clause)
+        if key.startswith("$"):
+            raise FilterExpressionError(f"Unknown filter operator: {key}")
+
+        values = self.bitmaps.get(key, {})
+        if isinstance(clause, list):
+            return self._match_any(values, clause)
+        if not isinstance(clause, dict):
+            return values.get(clause, 0) if _is_indexable(clause) else 0
+
+        result = self.universe
+        for operator, operand in clause.items():
+            if operator == "$eq":
+                result &= values.get(operand, 0) if _is_indexable(operand) else 0
+            elif operator == "$ne":
+                result &= ~(values.get(operand, 0) if _is_indexable(operand) else 0)
+            elif operator == "$in":
+                result &= self._match_any(values, operand)
+            elif operator == "$nin":
+                result &= ~self._match_any(values, operand)
+            elif operator in _RANGE_OPERATORS:
+                compare = _RANGE_OPERATORS[operator]
+                matched = 0
+                for value, bitmap in values.items():
+                    try:
+                        if compare(value, operand):
+                            matched |= bitmap
+                    except TypeError:
+                        continue
+                result &= matched
+            else:
+                raise FilterExpressionError(f"Unknown filter operator: {operator}")
+        return result
+
+    def _combine(self, clauses: Any, op, initial: int) -> int:
+        if not isinstance(clauses, list):
+            raise FilterExpressionError("$and/$or expect a list of filter expressions")
+        result = initial
+        for clause in clauses:
+            result = op(result, self.evaluate(clause))
+        return result
+
+    @staticmethod
+    def _match_any(values: Dict[Any, int], operands: Any) -> int:
+        if not isinstance(operands, list):
+            raise FilterExpressionError("$in/$nin expect a list of values")
+        result = 0
+        for operand in operands:
+            if _is_indexable(operand):
+                result |= values.get(operand, 0)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {field: len(values) for field, values in self.bitmaps.items()}
+
+
+def _is_indexable(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool))
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import math
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+
+class FakeProviderError(Exception):
+    """Injected failure, shaped like an HTTP error from a provider"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fake_answer(messages: List[Dict[str, Any]]) -> str:
+    """Deterministic answer text derived from the last user message"""
+    question = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    digest = hashlib.sha1(question.encode("utf-8")).hexdigest()[:8]
+    return f"Fake answer {digest} to: {question[:200]}"
+
+
+def parse_latency(spec: str, rng: Optional[random.Random] = None) -> Callable[[], float]:
+    """Sampler for a latency spec: seconds, or uniform:LOW,HIGH, normal:MEAN,STDDEV,
+    lognormal:MEDIAN,SIGMA or exponential:MEAN"""
+    rng = rng or random.Random()
+    kind, _, args = spec.strip().partition(":")
+    try:
+        if not args:
+            value = float(kind)
+            return lambda: value
+        params = [float(arg) for arg in args.split(",")]
+        if kind == "uniform":
+            low, high = params
+            return lambda: rng.uniform(low, high)
+        if kind == "normal":
+            mean, stddev = params
+            return lambda: max(0.0, rng.gauss(mean, stddev))
+        if kind == "lognormal":
+            median, sigma = params
+            return lambda: rng.lognormvariate(math.log(median), sigma)
+        if kind == "exponential":
+            (mean,) = params
+            return lambda: rng.expovariate(1.0 / mean)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+class _FakeCompletions:
+    def __init__(self, provider: "FakeChatClient"):
+        self._provider = provider
+
+    async def create(self, model: str, messages: List[Dict[str, Any]], stream: bool = False, **params):
+        return await self._provider._create(model, messages, stream)
+
+
+class FakeChatClient:
+    """Offline stand-in for an ``AsyncOpenAI`` client.
+
+    Implements ``chat.completions.create`` (including ``stream=True``) with
+    configurable latency, per-token delay and failure rate, so routing,
+    failover and hedging can be exercised without a model server. ``latency``
+    may be a number of seconds or a callable returning one.
+    """
+
+    def __init__(self, latency: Any = 0.0, token_delay: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    def _latency(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    async def _create(self, model: str, messages: List[Dict[str, Any]], stream: bool):
+        self.calls += 1
+        await asyncio.sleep(self._latency())
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise FakeProviderError("Injected provider failure")
+
+        answer = fake_answer(messages)
+        if stream:
+            return self._stream(model, answer)
+        return SimpleNamespace(
+            id=f"fake-{self.calls}",
+            model=model,
+            created=int(time.time()),
+            choices=[SimpleNamespace(index=0, message=SimpleNamespace(role="assistant", content=answer), finish_reason="stop")],
+            usage=SimpleNamespace(
+                prompt_tokens=sum(len((m.get("content") or "").split()) for m in messages),
+                completion_tokens=len(answer.split()),
+                total_tokens=0,
+            ),
+        )
+
+    async def _stream(self, model: str, answer: str) -> AsyncIterator[Any]:
+        words = answer.split(" ")
+        for index, word in enumerate(words):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            delta = word if index == 0 else " " + word
+            yield SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=delta), finish_reason=None)],
+            )
@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import json
+import logging
+import random
+import struct
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import Body, FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from . import config
+from .document_index import hash_embedding
+from .fake_llm import fake_answer, parse_latency
+
+logger = logging.getLogger(__name__)
+
+FAKE_MODEL_ID = "fake-model"
+
+
+def _error(status_code: int, message: str, error_type: str) -> JSONResponse:
+    headers = {"retry-after": "1"} if status_code == 429 else None
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "code": error_type}},
+        headers=headers,
+    )
+
+
+def _completion_words(messages: List[Dict[str, Any]], length: int, max_tokens: Optional[int]) -> tuple:
+    """Answer words (one word = one token) and the finish reason"""
+    words = fake_answer(messages).split(" ")
+    if length:
+        words = (words * (length // len(words) + 1))[:length]
+    if max_tokens and len(words) > max_tokens:
+        return words[:max_tokens], "length"
+    return words, "stop"
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content") or "").split()) for m in messages)
+
+
+def _encode_embedding(vector: List[float], encoding_format: Optional[str]) -> Any:
+    if encoding_format == "base64":
+        # The OpenAI SDK requests base64 little-endian float32 by default
+        return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+    return vector
+
+
+def create_fake_llm_app(
+    latency: Optional[str] = None,
+    tokens_per_second: Optional[float] = None,
+    completion_tokens: Optional[int] = None,
+    error_rate: Optional[float] = None,
+    rate_limit_rate: Optional[float] = None,
+    embedding_dimensions: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    """OpenAI-compatible stand-in for chat completions and embeddings.
+
+    Every request first waits a sample of the latency distribution (time to
+    first byte), then generates at ``tokens_per_second``. A share of requests
+    fails with a 500 or a 429. Arguments default to the FAKE_LLM_* settings.
+    """
+    rng = random.Random(config.FAKE_LLM_SEED if seed is None else seed)
+    sample_latency = parse_latency(config.FAKE_LLM_LATENCY if latency is None else latency, rng)
+    tokens_per_second = config.FAKE_LLM_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second
+    completion_tokens = config.FAKE_LLM_COMPLETION_TOKENS if completion_tokens is None else completion_tokens
+    error_rate = config.FAKE_LLM_ERROR_RATE if error_rate is None else error_rate
+    rate_limit_rate = config.FAKE_LLM_RATE_LIMIT_RATE if rate_limit_rate is None else rate_limit_rate
+    dimensions = config.FAKE_LLM_EMBEDDING_DIMENSIONS if embedding_dimensions is None else embedding_dimensions
+    token_delay = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+    stats = {"chat_completions": 0, "streams": 0, "embeddings": 0, "errors": 0, "rate_limited": 0, "tokens": 0}
+
+    app = FastAPI(title="Fake LLM Server")
+    logger.info(
+        f"Fake LLM server: latency={latency or config.FAKE_LLM_LATENCY}, tokens/s={tokens_per_second or 'unlimited'}, "
+        f"error_rate={error_rate}, rate_limit_rate={rate_limit_rate}"
+    )
+
+    def injected_failure() -> Optional[JSONResponse]:
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return _error(429, "Injected rate limit", "rate_limit_exceeded")
+        if roll < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            return _error(500, "Injected server error", "server_error")
+        return None
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "stats": stats}
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": FAKE_MODEL_ID, "object": "model", "owned_by": "fake"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(payload: Dict[str, Any] = Body(...)):
+        failure = injected_failure()
+        if failure is not None:
+            return failure
+
+        messages = payload.get("messages") or []
+        model = payload.get("model") or FAKE_MODEL_ID
+        max_tokens = payload.get("max_completion_tokens") or payload.get("max_tokens")
+        words, finish_reason = _completion_words(messages, completion_tokens, max_tokens)
+        prompt_tokens = _prompt_tokens(messages)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        stats["tokens"] += len(words)
+        await asyncio.sleep(sample_latency())
+
+        if not payload.get("stream"):
+            stats["chat_completions"] += 1
+            if token_delay:
+                await asyncio.sleep(token_delay * max(0, len(words) - 1))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            }
+
+        stats["streams"] += 1
+        include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+
+        header = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+
+        def event(body: Dict[str, Any]) -> str:
+            return f"data: {json.dumps({**header, **body}, ensure_ascii=False)}\n\n"
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+            return event({"choices": [{"index": 0, "delta": delta, "finish_reason": finish}]})
+
+        async def event_stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for index, word in enumerate(words):
+                if index and token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": word if index == 0 else " " + word})
+            yield chunk({}, finish_reason)
+            if include_usage:
+                yield event({"choices": [], "usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(payload: Dict[str, Any] = Body(...)):
+        failure = injected_failure()
+        if failure is not None:
+            return failure
+
+        inputs = payload.get("input")
+        if isinstance(inputs, str) or not isinstance(inputs, list):
+            inputs = [inputs]
+        size = payload.get("dimensions") or dimensions
+        prompt_tokens = sum(len(str(text).split()) for text in inputs)
+        stats["embeddings"] += len(inputs)
+        await asyncio.sleep(sample_latency())
+        return {
+            "object": "list",
+            "model": payload.get("model") or FAKE_MODEL_ID,
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": index,
+                    "embedding": _encode_embedding(hash_embedding(str(text), size), payload.get("encoding_format")),
+                }
+                for index, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    return app
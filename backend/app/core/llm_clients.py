@@ -0,0 +1,153 @@
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+from . import config
+from .completion_cache import CachedAsyncTransport, CachedTransport, CompletionCache
+from .llm_scheduler import ProviderScheduler, ScheduledAsyncTransport, ScheduledTransport, scheduler_limits
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx negotiates HTTP/2 only when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+
+def _normalize_base_url(base_url: Optional[str]) -> str:
+    return (base_url or OPENAI_BASE_URL).rstrip("/")
+
+
+class ProviderClientRegistry:
+    """One tuned HTTP connection pool per provider base URL.
+
+    Every agent, the agents' memories and the session memory manager take
+    their HTTP clients from here, so connections (and TLS sessions) are kept
+    alive and reused instead of each model instance opening its own pool.
+    Async clients serve the agents; sync clients serve agno calls that run
+    in worker threads. Both go through the same ProviderScheduler per base
+    URL, which enforces the rate limits and retries 429s, behind the shared
+    completion cache so that cache hits cost no quota.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._openai_clients: Dict[Tuple[str, str], Tuple[AsyncOpenAI, httpx.AsyncClient]] = {}
+        self._schedulers: Dict[str, ProviderScheduler] = {}
+        self._completion_cache: Optional[CompletionCache] = None
+
+    def _transport_options(self) -> Dict[str, Any]:
+        return {
+            "limits": httpx.Limits(
+                max_connections=config.LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=config.LLM_POOL_KEEPALIVE_SECONDS,
+            ),
+            "http2": config.LLM_HTTP2 and HTTP2_AVAILABLE,
+        }
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(config.LLM_REQUEST_TIMEOUT_SECONDS, connect=config.LLM_CONNECT_TIMEOUT_SECONDS)
+
+    def scheduler(self, base_url: Optional[str] = None) -> ProviderScheduler:
+        """The rate-limit scheduler shared by every client for ``base_url``"""
+        key = _normalize_base_url(base_url)
+        with self._lock:
+            scheduler = self._schedulers.get(key)
+            if scheduler is None:
+                scheduler = ProviderScheduler(
+                    key,
+                    max_queue=config.LLM_QUEUE_SIZE,
+                    queue_timeout=config.LLM_QUEUE_TIMEOUT_SECONDS,
+                    **scheduler_limits(key),
+                )
+                self._schedulers[key] = scheduler
+            return scheduler
+
+    def completion_cache(self) -> Optional[CompletionCache]:
+        """The on-disk completion cache, or None when COMPLETION_CACHE_ENABLED is off"""
+        if not config.COMPLETION_CACHE_ENABLED:
+            return None
+        with self._lock:
+            if self._completion_cache is None:
+                self._completion_cache = CompletionCache(config.COMPLETION_CACHE_PATH, config.COMPLETION_CACHE_MAX_BYTES)
+            return self._completion_cache
+
+    def _async_transport(self, key: str) -> httpx.AsyncBaseTransport:
+        transport = ScheduledAsyncTransport(httpx.AsyncHTTPTransport(**self._transport_options()), self.scheduler(key))
+        cache = self.completion_cache()
+        return CachedAsyncTransport(transport, cache) if cache is not None else transport
+
+    def _sync_transport(self, key: str) -> httpx.BaseTransport:
+        transport = ScheduledTransport(httpx.HTTPTransport(**self._transport_options()), self.scheduler(key))
+        cache = self.completion_cache()
+        return CachedTransport(transport, cache) if cache is not None else transport
+
+    def async_http_client(self, base_url: Optional[str] = None) -> httpx.AsyncClient:
+        key = _normalize_base_url(base_url)
+        with self._lock:
+            client = self._async_clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(transport=self._async_transport(key), timeout=self._timeout())
+                self._async_clients[key] = client
+                logger.info(f"Created async LLM connection pool for {key}")
+            return client
+
+    def http_client(self, base_url: Optional[str] = None) -> httpx.Client:
+        key = _normalize_base_url(base_url)
+        with self._lock:
+            client = self._sync_clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.Client(transport=self._sync_transport(key), timeout=self._timeout())
+                self._sync_clients[key] = client
+                logger.info(f"Created LLM connection pool for {key}")
+            return client
+
+    def openai_client(self, base_url: Optional[str] = None, api_key: str = "not-needed") -> AsyncOpenAI:
+        """Shared AsyncOpenAI client on top of the pool for ``base_url``"""
+        key = (_normalize_base_url(base_url), api_key)
+        http_client = self.async_http_client(base_url)
+        cached = self._openai_clients.get(key)
+        # Rebuild if the pool underneath was closed and replaced
+        if cached is None or cached[1] is not http_client:
+            # The SDK keeps retrying connection errors and 5xx; 429s come back from the
+            # scheduler marked x-should-retry: false, since it already retried them
+            cached = (AsyncOpenAI(api_key=api_key, base_url=key[0], http_client=http_client), http_client)
+            self._openai_clients[key] = cached
+        return cached[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "async_pools": sorted(self._async_clients),
+            "sync_pools": sorted(self._sync_clients),
+            "http2": config.LLM_HTTP2 and HTTP2_AVAILABLE,
+            "schedulers": {key: scheduler.stats() for key, scheduler in self._schedulers.items()},
+            "completion_cache": self._completion_cache.stats() if self._completion_cache is not None else None,
+        }
+
+    async def aclose(self):
+        with self._lock:
+            async_clients = list(self._async_clients.values())
+            sync_clients = list(self._sync_clients.values())
+            self._async_clients.clear()
+            self._sync_clients.clear()
+            self._openai_clients.clear()
+            cache, self._completion_cache = self._completion_cache, None
+        for client in async_clients:
+            await client.aclose()
+        for client in sync_clients:
+            client.close()
+        if cache is not None:
+            cache.close()
+
+
+# Global registry instance
+llm_clients = ProviderClientRegistry()
@@ -0,0 +1,475 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import httpx
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Priority of LLM calls made from the current context; propagates into to_thread workers
+llm_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+# Marks 429s produced by our own queue rather than by the provider
+LOCAL_RATE_LIMIT_HEADER = "x-local-rate-limit"
+
+
+@contextmanager
+def background_priority():
+    """Run the enclosed LLM calls behind interactive ones"""
+    token = llm_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        llm_priority.reset(token)
+
+
+class SchedulerBusyError(Exception):
+    """The wait queue is full or the wait exceeded its deadline"""
+
+
+def estimate_request_tokens(body: bytes) -> int:
+    """Tokens a request counts against a tokens/min quota: prompt estimate plus max_tokens"""
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return math.ceil(len(body) / 4)
+    messages = payload.get("messages") or payload.get("input") or ""
+    prompt = math.ceil(len(json.dumps(messages, ensure_ascii=False).encode("utf-8")) / 4)
+    completion = payload.get("max_tokens") or payload.get("max_completion_tokens") or 0
+    return prompt + int(completion)
+
+
+def _request_body(request: httpx.Request) -> bytes:
+    try:
+        return request.content
+    except httpx.RequestNotRead:
+        # Streamed uploads are not buffered; they count as a single token
+        return b""
+
+
+class _Waiter:
+    """Wakes one queued caller from any thread; async waiters are woken on their own loop"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = asyncio.Event() if loop is not None else threading.Event()
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # Loop already closed; its waiter is gone
+            pass
+
+
+class _Bucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        # Requests larger than the whole bucket wait for a full bucket
+        needed = min(amount, self.capacity) - self.level
+        return needed / self.rate if needed > 0 else 0.0
+
+
+class ProviderScheduler:
+    """Token-bucket admission for one provider, shared by sync and async callers.
+
+    Each call takes one request and its estimated tokens from the
+    requests/min and tokens/min buckets and a slot from the concurrency
+    limit. Waiters queue by priority (interactive before background) and
+    arrival; the queue is bounded and waits have a deadline. Only the head
+    of the queue is woken, when a slot frees up or the entry before it
+    leaves; it sleeps exactly as long as a bucket needs to refill. A 429 from the
+    provider pauses the whole bucket until its Retry-After, so callers
+    settle at the quota instead of bursting into it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 0,
+        max_queue: int = 100,
+        queue_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.requests = _Bucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = _Bucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self.metrics = {"admitted": 0, "rejected": 0, "rate_limited": 0, "retries": 0, "waited_seconds": 0.0}
+
+    def _wake_head(self):
+        if self._queue:
+            self._queue[0][2].wake()
+
+    def _try_admit(self, entry: tuple, tokens: int) -> float:
+        """Admit ``entry`` if it is at the head and capacity allows; else return how long to wait.
+
+        ``math.inf`` means: until woken by ``_wake_head``.
+        """
+        now = time.monotonic()
+        if self._queue[0] is not entry:
+            return math.inf
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            return math.inf
+
+        wait = 0.0
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_for(amount))
+        if wait > 0:
+            return wait
+
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.level -= amount
+        heapq.heappop(self._queue)
+        self.in_flight += 1
+        self.metrics["admitted"] += 1
+        # The next entry may fit too (e.g. a free slot and tokens to spare)
+        self._wake_head()
+        return 0.0
+
+    def _enqueue(self, priority: int, waiter: _Waiter) -> tuple:
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.metrics["rejected"] += 1
+                raise SchedulerBusyError(f"LLM request queue for {self.name} is full")
+            # The sequence number is unique, so waiters are never compared
+            entry = (priority, next(self._sequence), waiter)
+            heapq.heappush(self._queue, entry)
+            return entry
+
+    def _remove(self, entry: tuple):
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._wake_head()
+
+    def _step(self, entry: tuple, tokens: int, deadline: float) -> float:
+        """Try to admit ``entry``; return how long to wait, at most until ``deadline``"""
+        with self._lock:
+            wait = self._try_admit(entry, tokens)
+            if wait == 0:
+                return 0.0
+            now = time.monotonic()
+            # Fail fast when even the known wait (a bucket refill) overruns the deadline
+            if now >= deadline or (wait != math.inf and now + wait > deadline):
+                self._remove(entry)
+                self.metrics["rejected"] += 1
+                raise SchedulerBusyError(f"Timed out waiting for LLM capacity on {self.name}")
+            # Cleared under the lock, so a wake after this point is not missed
+            entry[2].event.clear()
+            return min(wait, deadline - now)
+
+    def acquire(self, tokens: int, priority: Optional[int] = None):
+        entry = self._enqueue(llm_priority.get() if priority is None else priority, _Waiter())
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        while True:
+            wait = self._step(entry, tokens, deadline)
+            if wait == 0:
+                self.metrics["waited_seconds"] += time.monotonic() - start
+                return
+            entry[2].event.wait(wait)
+
+    async def aacquire(self, tokens: int, priority: Optional[int] = None):
+        entry = self._enqueue(llm_priority.get() if priority is None else priority, _Waiter(asyncio.get_running_loop()))
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        try:
+            while True:
+                wait = self._step(entry, tokens, deadline)
+                if wait == 0:
+                    self.metrics["waited_seconds"] += time.monotonic() - start
+                    return
+                try:
+                    await asyncio.wait_for(entry[2].event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._lock:
+                self._remove(entry)
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._wake_head()
+
+    def rate_limited(self, retry_after: float):
+        """Pause admissions after the provider answered 429"""
+        with self._lock:
+            self.metrics["rate_limited"] += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            # The provider's window is spent; start refilling from empty
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.level = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "in_flight": self.in_flight,
+            "queued": len(self._queue),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+        }
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+    ceiling = min(config.LLM_BACKOFF_MAX_SECONDS, config.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    delay = random.uniform(0, ceiling)
+    return max(delay, retry_after or 0.0)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _busy_response(request: httpx.Request, error: SchedulerBusyError) -> httpx.Response:
+    # Surfaces in SDKs as their rate-limit error rather than a connection failure
+    return httpx.Response(
+        429,
+        headers={
+            "retry-after": "1",
+            "content-type": "application/json",
+            "x-should-retry": "false",
+            LOCAL_RATE_LIMIT_HEADER: "true",
+        },
+        json={"error": {"message": str(error), "type": "client_rate_limit", "code": "rate_limit_exceeded"}},
+        request=request,
+    )
+
+
+def _error_chain(error: Optional[BaseException]):
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _error_headers(error: BaseException) -> httpx.Headers:
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None) or httpx.Headers()
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an error, or one that caused it, is a 429 from a provider or our own queue.
+
+    Covers the OpenAI SDK's RateLimitError and agno's ModelProviderError,
+    which both carry ``status_code``, as well as SchedulerBusyError.
+    """
+    return any(
+        isinstance(cause, SchedulerBusyError) or getattr(cause, "status_code", None) == 429
+        for cause in _error_chain(error)
+    )
+
+
+def is_local_rate_limit(error: BaseException) -> bool:
+    """Whether an error is our own queue refusing work, which says nothing about the provider"""
+    return any(
+        isinstance(cause, SchedulerBusyError) or _error_headers(cause).get(LOCAL_RATE_LIMIT_HEADER) == "true"
+        for cause in _error_chain(error)
+    )
+
+
+def rate_limit_retry_after(error: BaseException) -> str:
+    """Retry-After to send to clients for a rate-limit error"""
+    for cause in _error_chain(error):
+        value = _error_headers(cause).get("retry-after")
+        if value:
+            return value
+    return "1"
+
+
+class _ReleasingAsyncStream(httpx.AsyncByteStream):
+    """Response body that frees the scheduler slot when the response is closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+def _once(fn):
+    done = threading.Event()
+
+    def wrapper():
+        if not done.is_set():
+            done.set()
+            fn()
+    return wrapper
+
+
+class ScheduledAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx transport that admits requests through a ProviderScheduler and retries 429s"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, scheduler: ProviderScheduler):
+        self._transport = transport
+        self.scheduler = scheduler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_request_tokens(_request_body(request))
+        attempt = 0
+        while True:
+            try:
+                await self.scheduler.aacquire(tokens)
+            except SchedulerBusyError as e:
+                return _busy_response(request, e)
+            release = _once(self.scheduler.release)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except BaseException:
+                release()
+                raise
+            if response.status_code != 429 or attempt >= config.LLM_RATE_LIMIT_RETRIES:
+                if response.status_code == 429:
+                    # Already retried here; SDKs should surface it rather than retry again
+                    response.headers["x-should-retry"] = "false"
+                if response.is_closed:
+                    # Body already in memory (e.g. mocked responses)
+                    release()
+                else:
+                    response.stream = _ReleasingAsyncStream(response.stream, release)
+                return response
+
+            retry_after = _retry_after(response)
+            await response.aclose()
+            release()
+            delay = backoff_delay(attempt, retry_after)
+            self.scheduler.rate_limited(delay)
+            self.scheduler.metrics["retries"] += 1
+            logger.warning(f"{self.scheduler.name} returned 429, retrying in {delay:.2f}s")
+            attempt += 1
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    """Synchronous counterpart of ScheduledAsyncTransport, for agno calls in worker threads"""
+
+    def __init__(self, transport: httpx.BaseTransport, scheduler: ProviderScheduler):
+        self._transport = transport
+        self.scheduler = scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_request_tokens(_request_body(request))
+        attempt = 0
+        while True:
+            try:
+                self.scheduler.acquire(tokens)
+            except SchedulerBusyError as e:
+                return _busy_response(request, e)
+            release = _once(self.scheduler.release)
+            try:
+                response = self._transport.handle_request(request)
+            except BaseException:
+                release()
+                raise
+            if response.status_code != 429 or attempt >= config.LLM_RATE_LIMIT_RETRIES:
+                if response.status_code == 429:
+                    # Already retried here; SDKs should surface it rather than retry again
+                    response.headers["x-should-retry"] = "false"
+                if response.is_closed:
+                    # Body already in memory (e.g. mocked responses)
+                    release()
+                else:
+                    response.stream = _ReleasingStream(response.stream, release)
+                return response
+
+            retry_after = _retry_after(response)
+            response.close()
+            release()
+            delay = backoff_delay(attempt, retry_after)
+            self.scheduler.rate_limited(delay)
+            self.scheduler.metrics["retries"] += 1
+            logger.warning(f"{self.scheduler.name} returned 429, retrying in {delay:.2f}s")
+            attempt += 1
+
+    def close(self):
+        self._transport.close()
+
+
+def scheduler_limits(base_url: str) -> Dict[str, float]:
+    """Limits for a provider: LLM_RATE_LIMITS entry for its base URL over the defaults"""
+    limits = {
+        "requests_per_minute": config.LLM_REQUESTS_PER_MINUTE,
+        "tokens_per_minute": config.LLM_TOKENS_PER_MINUTE,
+        "max_concurrency": config.LLM_MAX_CONCURRENCY,
+    }
+    overrides = config.LLM_RATE_LIMITS.get(base_url) or {}
+    limits.update({key: overrides[key] for key in limits if key in overrides})
+    return limits
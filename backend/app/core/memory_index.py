@@ -0,0 +1,137 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from .document_index import DocumentIndex, tokenize
+from ..schemas.session import UserMemory
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Words that say nothing about which memory a question is about
+_STOPWORDS = frozenset("""
+a about all am an and any are as at be been but by can could did do does for from had has have how i if in
+into is it its just me my no not of on or our please should so than that the their them then there these
+they this to was we were what when where which who why will with would you your
+""".split())
+
+
+def _memory_text(memory: UserMemory) -> str:
+    return " ".join([memory.memory, *memory.topics])
+
+
+def _query_words(query: str) -> List[Set[str]]:
+    """Index terms of each content word of a query, without stopwords and one-letter words"""
+    return [
+        set(tokenize(word)) for word in _WORD_PATTERN.findall(query.lower())
+        if len(word) > 1 and word not in _STOPWORDS
+    ]
+
+
+class _UserMemories:
+    """BM25 postings and per-memory term sets over one user's memories"""
+
+    def __init__(self, memories: Iterable[UserMemory]):
+        self.rebuild(memories)
+
+    def append(self, memory: UserMemory):
+        text = _memory_text(memory)
+        self.lexical.add(len(self.memories), text)
+        self.memories.append(memory)
+        self.terms.append(set(tokenize(text)))
+
+    def rebuild(self, memories: Iterable[UserMemory]):
+        self.lexical = DocumentIndex()
+        self.memories: List[UserMemory] = []
+        self.terms: List[Set[str]] = []
+        for memory in memories:
+            self.append(memory)
+
+
+class MemoryIndex:
+    """Per-user in-process index that answers memory searches without a model call.
+
+    A user's memories are loaded once, on their first search, and then kept
+    current by the memory manager's writes. Matching is lexical: a memory
+    qualifies when it covers at least ``min_score`` of the query's content
+    words (stopwords and one-letter words are ignored), and qualifying
+    memories are ranked by BM25. The least recently searched users are
+    evicted beyond ``max_users``.
+    """
+
+    def __init__(self, min_score: float = 0.2, max_users: int = 1000):
+        self.min_score = min_score
+        self.max_users = max_users
+        self._users: "OrderedDict[str, _UserMemories]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.metrics = {"searches": 0, "loads": 0, "evictions": 0}
+
+    def has(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._users
+
+    def load(self, user_id: str, memories: Iterable[UserMemory]):
+        """Replace a user's entry with the memories read from the database"""
+        entry = _UserMemories(memories)
+        with self._lock:
+            self._users[user_id] = entry
+            self._users.move_to_end(user_id)
+            self.metrics["loads"] += 1
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def add(self, user_id: str, memory: UserMemory):
+        """Index a new or updated memory; users not loaded yet pick it up on load"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            if any(existing.memory_id == memory.memory_id for existing in entry.memories):
+                entry.rebuild([memory if m.memory_id == memory.memory_id else m for m in entry.memories])
+            else:
+                entry.append(memory)
+
+    def remove(self, user_id: str, memory_id: str):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry.rebuild([m for m in entry.memories if m.memory_id != memory_id])
+
+    def drop(self, user_id: str):
+        """Forget a user, e.g. after their memories were cleared or rewritten"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def search(self, user_id: str, query: str, limit: int = 5) -> Optional[List[UserMemory]]:
+        """Best matching memories, or None when the user is not loaded"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            self._users.move_to_end(user_id)
+            self.metrics["searches"] += 1
+            if not entry.memories:
+                return []
+
+            words = _query_words(query)
+            if not words:
+                return []
+            # Coverage, unlike BM25 normalised to the best hit, does not let the
+            # best of several unrelated memories through
+            scores = {}
+            for slot, score in entry.lexical.search(" ".join(set().union(*words)), limit=len(entry.memories)):
+                covered = sum(1 for word_terms in words if word_terms & entry.terms[slot])
+                if covered / len(words) >= self.min_score:
+                    scores[slot] = score
+            ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+            return [entry.memories[slot] for slot in ranked]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self.metrics,
+                "users": len(self._users),
+                "memories": sum(len(entry.memories) for entry in self._users.values()),
+            }
+
@@ -21,26 +21,66 @@ except ImportError:
         def __init__(self, *args, **kwargs):
             pass
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from datetime import datetime
+import ast
+import asyncio
+import base64
+import json
 import logging
+import sqlite3
+import threading
 from pathlib import Path
 
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError as SQLAlchemyOperationalError
+
 from .config import (
     MODEL_PROVIDER, OPENAI_API_KEY, OPENAI_MODEL_NAME,
     ANTHROPIC_API_KEY, ANTHROPIC_MODEL_NAME,
     GOOGLE_API_KEY, GOOGLE_MODEL_NAME,
-    DB_FILE, ENABLE_MEMORY_SYSTEM
+    DB_FILE, ENABLE_MEMORY_SYSTEM, MEMORY_DB_POOL_SIZE, MEMORY_PAGE_MAX_SIZE,
+    MEMORY_SEARCH_METHOD, MEMORY_INDEX_MIN_SCORE, MEMORY_INDEX_MAX_USERS
 )
+from .llm_clients import llm_clients
+from .llm_scheduler import background_priority
+from .memory_index import MemoryIndex
+from .sqlite_pool import AsyncSQLitePool
 from ..schemas.session import UserMemory
 
 logger = logging.getLogger(__name__)
 
+
+def encode_memory_cursor(updated_at: Any, memory_id: str) -> str:
+    """Opaque cursor pointing just past a memory in newest-first order"""
+    raw = json.dumps([str(updated_at), memory_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_memory_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        updated_at, memory_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError("Invalid memory cursor") from e
+    return str(updated_at), str(memory_id)
+
+
 class SessionMemoryManager:
     """Session-based memory manager using Agno's memory system"""
     
     def __init__(self):
         self.agno_available = AGNO_AVAILABLE and ENABLE_MEMORY_SYSTEM
+        self.memory_table = "session_memories"
+        self.pool: Optional[AsyncSQLitePool] = None
+        self._page_index_ready = False
+        self.index = MemoryIndex(
+            min_score=MEMORY_INDEX_MIN_SCORE,
+            max_users=MEMORY_INDEX_MAX_USERS
+        )
+        # agno's Memory is not thread-safe, so offloaded calls run one at a time
+        self._agno_lock = threading.Lock()
+        # Index reloads running after extraction; held so they are not garbage collected
+        self._index_tasks: Set[asyncio.Task] = set()
         
         if not self.agno_available:
             logger.warning("Agno library not available or memory system disabled. Memory features will be limited.")
@@ -51,9 +91,10 @@ class SessionMemoryManager:
         try:
             self.memory_db_path = Path(DB_FILE).parent / "session_memories.db"
             self.memory_db = SqliteMemoryDb(
-                table_name="session_memories",
+                table_name=self.memory_table,
                 db_file=str(self.memory_db_path)
             )
+            self.pool = AsyncSQLitePool(self.memory_db_path, size=MEMORY_DB_POOL_SIZE)
             
             self.memory = Memory(
                 model=self._get_memory_model(),
@@ -71,8 +112,9 @@ class SessionMemoryManager:
             return None
             
         try:
+            # agno's Memory is called from worker threads, so it gets the sync pool
             if MODEL_PROVIDER == "openai" and OPENAI_API_KEY:
-                return OpenAIChat(id=OPENAI_MODEL_NAME, api_key=OPENAI_API_KEY)
+                return OpenAIChat(id=OPENAI_MODEL_NAME, api_key=OPENAI_API_KEY, http_client=llm_clients.http_client())
             elif MODEL_PROVIDER == "anthropic" and ANTHROPIC_API_KEY:
                 return AnthropicChat(id=ANTHROPIC_MODEL_NAME, api_key=ANTHROPIC_API_KEY)
             elif MODEL_PROVIDER == "google" and GOOGLE_API_KEY:
@@ -80,7 +122,7 @@ class SessionMemoryManager:
             else:
                 # Fallback to a simple OpenAI model
                 if OPENAI_API_KEY:
-                    return OpenAIChat(id="gpt-3.5-turbo", api_key=OPENAI_API_KEY)
+                    return OpenAIChat(id="gpt-3.5-turbo", api_key=OPENAI_API_KEY, http_client=llm_clients.http_client())
                 return None
         except Exception as e:
             logger.warning(f"Failed to initialize memory model: {e}")
@@ -106,6 +148,16 @@ class SessionMemoryManager:
                 user_id=user_id
             )
             
+            now = datetime.now().isoformat()
+            self.index.add(user_id, UserMemory(
+                memory_id=memory_id,
+                memory=memory_content,
+                topics=topics,
+                created_at=now,
+                last_updated=now,
+                user_id=user_id
+            ))
+            
             logger.info(f"Added memory {memory_id} for user {user_id}")
             return memory_id
             
@@ -114,33 +166,35 @@ class SessionMemoryManager:
             return f"fallback_memory_{datetime.now().timestamp()}"
     
     def get_user_memories(self, user_id: str, limit: int = 10) -> List[UserMemory]:
-        """Get memories for a user"""
-        if not self.agno_available or not self.memory:
+        """Get the latest memories for a user"""
+        if not self.agno_available or not self.memory_db:
             logger.warning("Memory system not available")
             return []
             
         try:
-            agno_memories = self.memory.get_user_memories(user_id=user_id)
-            
-            # Convert Agno memories to our schema
-            memories = []
-            for agno_mem in agno_memories[-limit:]:  # Get latest memories
-                memory = UserMemory(
-                    memory_id=agno_mem.id,
-                    memory=agno_mem.memory,
-                    topics=agno_mem.topics or [],
-                    created_at=agno_mem.created_at.isoformat() if hasattr(agno_mem, 'created_at') else datetime.now().isoformat(),
-                    last_updated=agno_mem.last_updated.isoformat() if hasattr(agno_mem, 'last_updated') else datetime.now().isoformat(),
-                    user_id=user_id
-                )
-                memories.append(memory)
-            
-            return memories
-            
+            return self._select_memories(user_id, limit)
         except Exception as e:
             logger.error(f"Failed to get memories for user {user_id}: {e}")
             return []
     
+    def _select_memories(self, user_id: str, limit: Optional[int] = None) -> List[UserMemory]:
+        # Only the requested rows are read, instead of agno loading every memory
+        table = self.memory_db.table
+        stmt = (
+            select(table)
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.updated_at.desc(), table.c.id.desc())
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        try:
+            with self.memory_db.Session() as session:
+                rows = session.execute(stmt).all()
+        except SQLAlchemyOperationalError as e:
+            logger.debug(f"Memory table not readable yet: {e}")
+            return []
+        return [memory for memory in (self._row_to_memory(row._mapping) for row in rows) if memory is not None]
+    
     def search_user_memories(self, user_id: str, query: str, limit: int = 5) -> List[UserMemory]:
         """Search user memories based on query"""
         if not self.agno_available or not self.memory:
@@ -148,9 +202,10 @@ class SessionMemoryManager:
             return []
             
         try:
-            if not self.memory.model:
-                # Fallback to simple get if no model available
-                return self.get_user_memories(user_id, limit)
+            if MEMORY_SEARCH_METHOD != "agentic" or not self.memory.model:
+                if not self.index.has(user_id):
+                    self.index.load(user_id, self._select_memories(user_id))
+                return self.index.search(user_id, query, limit) or []
                 
             agno_memories = self.memory.search_user_memories(
                 user_id=user_id,
@@ -203,6 +258,8 @@ class SessionMemoryManager:
                 messages=agno_messages,
                 user_id=user_id
             )
+            # agno may have added, rewritten or deleted any of the user's memories
+            self.index.drop(user_id)
             
             # Get the newly created memories
             memories = self.get_user_memories(user_id, limit=5)
@@ -220,6 +277,7 @@ class SessionMemoryManager:
             
         try:
             self.memory.delete_user_memory(user_id=user_id, memory_id=memory_id)
+            self.index.remove(user_id, memory_id)
             logger.info(f"Deleted memory {memory_id} for user {user_id}")
             return True
             
@@ -248,9 +306,17 @@ class SessionMemoryManager:
     
     def get_memory_count(self, user_id: str) -> int:
         """Get the count of memories for a user"""
+        if not self.agno_available or not self.memory_db:
+            return 0
         try:
-            memories = self.get_user_memories(user_id)
-            return len(memories)
+            table = self.memory_db.table
+            with self.memory_db.Session() as session:
+                stmt = select(func.count()).select_from(table).where(table.c.user_id == user_id)
+                return session.execute(stmt).scalar() or 0
+        except SQLAlchemyOperationalError as e:
+            # agno creates the table on its first write
+            logger.debug(f"Memory table not readable yet: {e}")
+            return 0
         except Exception as e:
             logger.error(f"Failed to get memory count for user {user_id}: {e}")
             return 0
@@ -263,5 +329,227 @@ class SessionMemoryManager:
             logger.error(f"Failed to get relevant memories for user {user_id}: {e}")
             return []
 
+    # --- Async API ---
+    # Reads and deletes go straight to the memory table through the aiosqlite
+    # pool; agno calls (LLM and SQLAlchemy I/O) run in a worker thread.
+    
+    async def _run_agno(self, fn, *args, **kwargs):
+        def locked():
+            with self._agno_lock:
+                return fn(*args, **kwargs)
+        return await asyncio.to_thread(locked)
+    
+    @staticmethod
+    def _timestamp(value) -> str:
+        return str(value).replace(" ", "T", 1) if value else datetime.now().isoformat()
+    
+    def _row_to_memory(self, row) -> Optional[UserMemory]:
+        try:
+            # agno stores the memory dict as its Python repr
+            data = ast.literal_eval(row["memory"])
+        except (ValueError, SyntaxError) as e:
+            logger.warning(f"Skipping unreadable memory {row['id']}: {e}")
+            return None
+        return UserMemory(
+            memory_id=row["id"],
+            memory=data.get("memory", ""),
+            topics=data.get("topics") or [],
+            created_at=self._timestamp(row["created_at"]),
+            last_updated=data.get("last_updated") or self._timestamp(row["updated_at"] or row["created_at"]),
+            user_id=row["user_id"]
+        )
+    
+    async def _ensure_page_index(self, conn):
+        # Serves newest-first pages straight from the index; the table only
+        # exists after agno's first write, so this is retried until then
+        if self._page_index_ready:
+            return
+        await conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.memory_table}_user_updated "
+            f"ON {self.memory_table} (user_id, updated_at, id)"
+        )
+        await conn.commit()
+        self._page_index_ready = True
+    
+    async def _read_page(
+        self, user_id: str, limit: int, cursor: Optional[Tuple[str, str]] = None
+    ) -> Tuple[List[UserMemory], Optional[str]]:
+        sql = f"SELECT id, user_id, memory, created_at, updated_at FROM {self.memory_table} WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if cursor is not None:
+            sql += " AND (updated_at, id) < (?, ?)"
+            params.extend(cursor)
+        # One extra row tells whether another page follows
+        sql += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        try:
+            async with self.pool.connection() as conn:
+                await self._ensure_page_index(conn)
+                async with conn.execute(sql, params) as db_cursor:
+                    rows = await db_cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            # agno creates the table on its first write
+            logger.debug(f"Memory table not readable yet: {e}")
+            return [], None
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_memory_cursor(rows[-1]["updated_at"], rows[-1]["id"])
+        memories = [memory for memory in (self._row_to_memory(row) for row in rows) if memory is not None]
+        return memories, next_cursor
+    
+    async def _load_index(self, user_id: str):
+        """Read all of a user's memories into the local search index"""
+        sql = f"SELECT id, user_id, memory, created_at, updated_at FROM {self.memory_table} WHERE user_id = ?"
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.execute(sql, [user_id]) as cursor:
+                    rows = await cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Memory table not readable yet: {e}")
+            rows = []
+        self.index.load(user_id, [memory for memory in (self._row_to_memory(row) for row in rows) if memory is not None])
+    
+    async def _reload_index(self, user_id: str):
+        try:
+            await self._load_index(user_id)
+        except Exception as e:
+            # The next search loads the user itself
+            logger.warning(f"Failed to reload memory index for user {user_id}: {e}")
+    
+    async def _count_memories(self, user_id: str) -> int:
+        # Answered from agno's user_id index without reading any memory rows
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.execute(f"SELECT COUNT(*) FROM {self.memory_table} WHERE user_id = ?", [user_id]) as cursor:
+                    row = await cursor.fetchone()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Memory table not readable yet: {e}")
+            return 0
+        return row[0] if row else 0
+    
+    async def _delete_where(self, clause: str, params: List[Any]) -> int:
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute(f"DELETE FROM {self.memory_table} WHERE {clause}", params)
+                await conn.commit()
+                return cursor.rowcount
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Memory table not writable yet: {e}")
+            return 0
+    
+    async def aadd_user_memory(self, user_id: str, memory_content: str, topics: List[str] = None) -> str:
+        """Add a new memory for a user without blocking the event loop"""
+        return await self._run_agno(self.add_user_memory, user_id, memory_content, topics)
+    
+    async def aget_user_memories(self, user_id: str, limit: int = 10) -> List[UserMemory]:
+        """Get the latest memories for a user"""
+        memories, _ = await self.aget_memory_page(user_id, limit)
+        return memories
+    
+    async def aget_memory_page(
+        self, user_id: str, limit: int = 10, cursor: Optional[str] = None
+    ) -> Tuple[List[UserMemory], Optional[str]]:
+        """Get one page of a user's memories, most recently updated first.
+
+        Returns the page and the cursor of the next one (None on the last
+        page). Raises ValueError for a malformed cursor.
+        """
+        position = decode_memory_cursor(cursor) if cursor else None
+        limit = max(1, min(limit, MEMORY_PAGE_MAX_SIZE))
+        if not self.agno_available or self.pool is None:
+            logger.warning("Memory system not available")
+            return [], None
+        try:
+            return await self._read_page(user_id, limit, position)
+        except Exception as e:
+            logger.error(f"Failed to get memories for user {user_id}: {e}")
+            return [], None
+    
+    async def asearch_user_memories(self, user_id: str, query: str, limit: int = 5) -> List[UserMemory]:
+        """Search user memories in the local index; agentic search runs in a worker thread"""
+        if not self.agno_available or self.pool is None:
+            logger.warning("Memory system not available")
+            return []
+        if MEMORY_SEARCH_METHOD == "agentic" and self.memory and self.memory.model:
+            return await self._run_agno(self.search_user_memories, user_id, query, limit)
+        try:
+            if not self.index.has(user_id):
+                await self._load_index(user_id)
+            return self.index.search(user_id, query, limit) or []
+        except Exception as e:
+            logger.error(f"Failed to search memories for user {user_id}: {e}")
+            return []
+    
+    async def acreate_memories_from_conversation(self, user_id: str, messages: List[Dict[str, str]]) -> List[str]:
+        """Create memories from conversation messages in a worker thread"""
+        # Extraction is background work: its model calls queue behind interactive queries
+        with background_priority():
+            memory_ids = await self._run_agno(self.create_memories_from_conversation, user_id, messages)
+        if self.agno_available and self.pool is not None:
+            # agno may have rewritten any memory, so searches until the reload lands
+            # read the database instead of the stale entry
+            self.index.drop(user_id)
+            # Re-read off the request path so neither this response nor the next
+            # query's memory search waits for it
+            task = asyncio.create_task(self._reload_index(user_id))
+            self._index_tasks.add(task)
+            task.add_done_callback(self._index_tasks.discard)
+        return memory_ids
+    
+    async def adelete_user_memory(self, user_id: str, memory_id: str) -> bool:
+        """Delete a specific memory"""
+        if not self.agno_available or self.pool is None:
+            logger.warning("Memory system not available")
+            return False
+        try:
+            deleted = await self._delete_where("id = ? AND user_id = ?", [memory_id, user_id])
+            self.index.remove(user_id, memory_id)
+            if deleted:
+                logger.info(f"Deleted memory {memory_id} for user {user_id}")
+            return deleted > 0
+        except Exception as e:
+            logger.error(f"Failed to delete memory {memory_id} for user {user_id}: {e}")
+            return False
+    
+    async def aclear_user_memories(self, user_id: str) -> bool:
+        """Clear all memories for a user"""
+        if not self.agno_available or self.pool is None:
+            logger.warning("Memory system not available")
+            return False
+        try:
+            deleted = await self._delete_where("user_id = ?", [user_id])
+            self.index.drop(user_id)
+            logger.info(f"Cleared {deleted} memories for user {user_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to clear memories for user {user_id}: {e}")
+            return False
+    
+    async def aget_memory_count(self, user_id: str) -> int:
+        """Get the count of memories for a user"""
+        if not self.agno_available or self.pool is None:
+            return 0
+        try:
+            return await self._count_memories(user_id)
+        except Exception as e:
+            logger.error(f"Failed to get memory count for user {user_id}: {e}")
+            return 0
+    
+    async def aget_relevant_memories_for_query(self, user_id: str, query: str, limit: int = 3) -> List[UserMemory]:
+        """Get memories relevant to a specific query"""
+        try:
+            return await self.asearch_user_memories(user_id, query, limit)
+        except Exception as e:
+            logger.error(f"Failed to get relevant memories for user {user_id}: {e}")
+            return []
+    
+    async def aclose(self):
+        for task in list(self._index_tasks):
+            task.cancel()
+        await asyncio.gather(*self._index_tasks, return_exceptions=True)
+        if self.pool is not None:
+            await self.pool.close()
+
 # Global instance
 session_memory_manager = SessionMemoryManager() 
\ No newline at end of file
@@ -0,0 +1,99 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: Optional[str]):
+    """Return the tiktoken encoding for a model, or None if it cannot be loaded"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use, which fails offline
+        logger.warning(f"Token encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        # Roughly four UTF-8 bytes per BPE token across scripts
+        return math.ceil(len(text.encode("utf-8")) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_prompt_tokens(parts: Iterable[Optional[str]], model: Optional[str] = None) -> int:
+    """Count tokens of all prompt parts, with the per-message overhead of chat formats"""
+    return sum(count_tokens(part, model) + 4 for part in parts if part)
+
+
+def agent_model_name(agent: Any) -> Optional[str]:
+    """Best-effort model ID of an agent: LMStudioAgent.model_id or agno's agent.model.id"""
+    model_id = getattr(agent, "model_id", None)
+    if isinstance(model_id, str):
+        return model_id
+    model_id = getattr(getattr(agent, "model", None), "id", None)
+    return model_id if isinstance(model_id, str) else None
+
+
+class QueryTimer:
+    """Per-request timing context.
+
+    ``stage(name)`` times a block; ``record`` adds a duration measured
+    elsewhere; ``mark_first_token`` records time to first token relative to
+    the start of the request.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.first_token: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def mark_first_token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, plus time to first token and total"""
+        timings = {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()}
+        if self.first_token is not None:
+            timings["time_to_first_token"] = round(self.first_token * 1000, 1)
+        timings["total"] = round(self.elapsed * 1000, 1)
+        return timings
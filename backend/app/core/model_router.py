@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from . import config
+from .circuit_breaker import CircuitBreaker
+from .completion_cache import bypass_completion_cache
+from .fake_llm import FakeChatClient
+from .llm_clients import llm_clients
+from .llm_scheduler import is_local_rate_limit
+
+logger = logging.getLogger(__name__)
+
+
+class NoProviderAvailableError(Exception):
+    """Raised when no configured provider could serve a request"""
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ProviderStats:
+    """Rolling latency and error window for one provider.
+
+    Samples older than ``max_age`` seconds are dropped, so a provider that
+    failed a while ago goes back to being unexplored and gets probed again.
+    """
+
+    def __init__(self, window: int, max_age: float):
+        self.samples: deque = deque(maxlen=window)
+        self.max_age = max_age
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self) -> List[tuple]:
+        cutoff = time.monotonic() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    @property
+    def count(self) -> int:
+        return len(self._recent())
+
+    @property
+    def error_rate(self) -> float:
+        samples = self._recent()
+        return sum(1 for _, _, ok in samples if not ok) / len(samples) if samples else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        return _percentile([latency for _, latency, ok in self._recent() if ok], q)
+
+    def to_dict(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "samples": self.count,
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class ChatProvider:
+    """An OpenAI-compatible chat endpoint with its own latency statistics"""
+
+    def __init__(self, name: str, client: Any, model_id: str):
+        self.name = name
+        self.client = client
+        self.model_id = model_id
+        self.stats = ProviderStats(config.MODEL_ROUTER_WINDOW, config.MODEL_ROUTER_WINDOW_SECONDS)
+        self.breaker = CircuitBreaker(
+            name, config.LLM_CIRCUIT_FAILURE_THRESHOLD, config.LLM_CIRCUIT_RESET_SECONDS, probe=self._probe
+        )
+
+    async def _probe(self):
+        # Smallest possible completion: proves the endpoint and the model are up.
+        # A cached answer would prove neither.
+        with bypass_completion_cache():
+            await self.client.chat.completions.create(
+                model=self.model_id, messages=[{"role": "user", "content": "ping"}], max_tokens=1
+            )
+
+    def record(self, latency: float, ok: bool, error: Optional[BaseException] = None):
+        if error is not None and is_local_rate_limit(error):
+            # Our own queue refused the call: back-pressure, not a sick provider
+            return
+        self.stats.record(latency, ok)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    async def complete(self, messages: List[Dict[str, Any]], **params) -> Any:
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(model=self.model_id, messages=messages, **params)
+        except asyncio.CancelledError:
+            # A losing hedge says nothing about the provider's health
+            raise
+        except Exception as e:
+            self.record(time.perf_counter() - start, ok=False, error=e)
+            raise
+        self.record(time.perf_counter() - start, ok=True)
+        return response
+
+
+def build_provider(name: str) -> Optional[ChatProvider]:
+    """Provider for a MODEL_PROVIDER-style name, or None if it is not configured"""
+    if name == "openai":
+        if not config.OPENAI_API_KEY:
+            return None
+        return ChatProvider(name, llm_clients.openai_client(None, config.OPENAI_API_KEY), config.OPENAI_MODEL_NAME)
+    if name == "lm-studio":
+        return ChatProvider(name, llm_clients.openai_client(config.LM_STUDIO_BASE_URL), config.CUSTOM_MODEL_NAME)
+    if name in ("vllm", "custom"):
+        if not config.CUSTOM_API_BASE_URL:
+            return None
+        return ChatProvider(
+            name, llm_clients.openai_client(config.CUSTOM_API_BASE_URL, config.CUSTOM_API_KEY), config.CUSTOM_MODEL_NAME
+        )
+    if name == "ollama":
+        # Ollama serves an OpenAI-compatible API under /v1
+        base_url = config.OLLAMA_BASE_URL.rstrip("/") + "/v1"
+        return ChatProvider(name, llm_clients.openai_client(base_url, "ollama"), config.OLLAMA_MODEL_NAME)
+    if name == "fake":
+        return ChatProvider(name, FakeChatClient(), "fake-model")
+    return None
+
+
+class ModelRouter:
+    """Routes chat completions to the healthiest of several providers.
+
+    Providers are ranked by error rate and rolling p95 latency; unexplored
+    providers are tried first so they collect samples. A failing provider is
+    skipped for the next one, and one whose circuit is open is not called at
+    all until a background probe sees it recover. With hedging enabled, a second request goes to
+    the runner-up once the primary exceeds its own p95, and whichever answers
+    first wins. Streams fail over only until their first chunk.
+    """
+
+    def __init__(self, providers: List[ChatProvider], hedge: bool = False, min_samples: int = 20, max_error_rate: float = 0.5):
+        if not providers:
+            raise ValueError("ModelRouter needs at least one provider")
+        self.providers = providers
+        self.hedge = hedge
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.metrics = {"requests": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0, "short_circuited": 0}
+
+    @property
+    def primary(self) -> ChatProvider:
+        return self.providers[0]
+
+    def _rank_key(self, provider: ChatProvider):
+        stats = provider.stats
+        if stats.count < self.min_samples:
+            return (0, 0.0)
+        unhealthy = stats.error_rate > self.max_error_rate
+        p95 = stats.percentile(0.95)
+        return (1 + int(unhealthy), (p95 if p95 is not None else float("inf")) * (1 + stats.error_rate))
+
+    def ranked(self) -> List[ChatProvider]:
+        # sorted() is stable, so configuration order breaks ties
+        return sorted(self.providers, key=self._rank_key)
+
+    def available(self) -> List[ChatProvider]:
+        """Ranked providers whose circuit lets calls through"""
+        candidates = [provider for provider in self.ranked() if provider.breaker.allow()]
+        if not candidates:
+            self.metrics["short_circuited"] += 1
+            raise NoProviderAvailableError("All provider circuits are open")
+        return candidates
+
+    def _hedge_delay(self, provider: ChatProvider) -> Optional[float]:
+        if not self.hedge or provider.stats.count < self.min_samples:
+            return None
+        return provider.stats.percentile(0.95)
+
+    async def _hedged(self, primary: ChatProvider, backup: ChatProvider, delay: float, messages, params) -> Any:
+        """Race ``backup`` against ``primary`` once the primary is slower than ``delay``"""
+        first = asyncio.ensure_future(primary.complete(messages, **params))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        error = None
+        hedged = not done
+        if done:
+            if first.exception() is None:
+                return first.result()
+            # The primary failed before the hedge was due: plain failover
+            error = first.exception()
+            self.metrics["failovers"] += 1
+            logger.warning(f"Provider '{primary.name}' failed, trying the next one: {error}")
+            pending = set()
+        else:
+            self.metrics["hedges"] += 1
+            pending = {first}
+
+        second = asyncio.ensure_future(backup.complete(messages, **params))
+        pending.add(second)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedged and task is second:
+                            self.metrics["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, messages: List[Dict[str, Any]], **params) -> Any:
+        """Chat completion from the best available provider"""
+        self.metrics["requests"] += 1
+        candidates = self.available()
+        last_error = None
+        index = 0
+        while index < len(candidates):
+            provider = candidates[index]
+            backup = candidates[index + 1] if index + 1 < len(candidates) else None
+            delay = self._hedge_delay(provider) if backup is not None else None
+            try:
+                if delay is not None:
+                    return await self._hedged(provider, backup, delay, messages, params)
+                return await provider.complete(messages, **params)
+            except Exception as e:
+                last_error = e
+                self.metrics["failovers"] += 1
+                logger.warning(f"Provider '{provider.name}' failed, trying the next one: {e}")
+                # A hedged attempt has already tried the backup as well
+                index += 2 if delay is not None else 1
+        raise NoProviderAvailableError(f"All providers failed: {last_error}") from last_error
+
+    async def stream(self, messages: List[Dict[str, Any]], **params) -> AsyncIterator[Any]:
+        """Stream chunks from the best available provider.
+
+        The latency sample is the time to the first chunk.
+        """
+        self.metrics["requests"] += 1
+        last_error = None
+        for provider in self.available():
+            start = time.perf_counter()
+            started = False
+            try:
+                response = await provider.client.chat.completions.create(
+                    model=provider.model_id, messages=messages, stream=True, **params
+                )
+                async for chunk in response:
+                    if not started:
+                        started = True
+                        provider.record(time.perf_counter() - start, ok=True)
+                    yield chunk
+                return
+            except Exception as e:
+                provider.record(time.perf_counter() - start, ok=False, error=e)
+                if started:
+                    raise
+                last_error = e
+                self.metrics["failovers"] += 1
+                logger.warning(f"Provider '{provider.name}' failed to stream, trying the next one: {e}")
+        raise NoProviderAvailableError(f"All providers failed: {last_error}") from last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "hedging": self.hedge,
+            "providers": {
+                provider.name: {"model": provider.model_id, **provider.stats.to_dict(), "circuit": provider.breaker.to_dict()}
+                for provider in self.providers
+            },
+        }
+
+
+@lru_cache(maxsize=1)
+def get_model_router() -> ModelRouter:
+    """Router over MODEL_ROUTER_PROVIDERS, or just MODEL_PROVIDER when that is unset"""
+    names = [name.strip().lower() for name in config.MODEL_ROUTER_PROVIDERS.split(",") if name.strip()]
+    if not names:
+        names = [config.MODEL_PROVIDER]
+
+    providers = []
+    for name in names:
+        provider = build_provider(name)
+        if provider is None:
+            logger.warning(f"Model provider '{name}' is not configured or not OpenAI-compatible, skipping it")
+            continue
+        providers.append(provider)
+    if not providers:
+        raise ValueError(f"No usable model providers in {names}")
+
+    logger.info(f"Model router providers: {[p.name for p in providers]} (hedging={config.MODEL_ROUTER_HEDGE})")
+    return ModelRouter(
+        providers,
+        hedge=config.MODEL_ROUTER_HEDGE,
+        min_samples=config.MODEL_ROUTER_MIN_SAMPLES,
+        max_error_rate=config.MODEL_ROUTER_MAX_ERROR_RATE,
+    )
@@ -0,0 +1,100 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import config
+from .context_packer import _cosine
+from .document_index import tokenize
+from .metrics import count_tokens
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+
+def _char_ngrams(text: str, n: int = 3) -> Counter:
+    """Character n-gram profile; lexical, but tolerant of inflections and partial word matches"""
+    normalized = " ".join(text.lower().split())
+    return Counter(normalized[i:i + n] for i in range(max(0, len(normalized) - n + 1)))
+
+
+def _sentence_scores(query: str, sentences: List[str]) -> List[float]:
+    """Blend IDF-weighted query-term overlap with character n-gram similarity.
+
+    Both signals are lexical: a paraphrase that shares no surface text with
+    the query scores zero and is only kept as a neighbour of a match.
+    """
+    query_terms = set(tokenize(query))
+    sentence_terms = [set(tokenize(sentence)) for sentence in sentences]
+    # Terms that appear in every sentence of the passage say little about relevance
+    document_frequency = Counter(term for terms in sentence_terms for term in terms & query_terms)
+    idf = {term: math.log(1 + len(sentences) / (1 + df)) for term, df in document_frequency.items()}
+    max_lexical = sum(idf.values()) or 1.0
+
+    query_profile = _char_ngrams(query)
+    scores = []
+    for sentence, terms in zip(sentences, sentence_terms):
+        lexical = sum(idf.get(term, 0.0) for term in terms & query_terms) / max_lexical
+        scores.append(0.6 * lexical + 0.4 * _cosine(query_profile, _char_ngrams(sentence)))
+    return scores
+
+
+def compress_passage(query: str, text: str, ratio: float, neighbours: int = 1, model: Optional[str] = None) -> str:
+    """Keep the sentences that best match the query, with their neighbours, up to ``ratio`` of the tokens"""
+    sentences = [sentence.strip() for sentence in _SENTENCE_PATTERN.split(text) if sentence.strip()]
+    if len(sentences) <= 1:
+        return text
+
+    tokens = [count_tokens(sentence, model) for sentence in sentences]
+    budget = max(1, int(sum(tokens) * ratio))
+    scores = _sentence_scores(query, sentences)
+
+    kept = set()
+    used = 0
+    for index in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        if scores[index] <= 0 and kept:
+            break
+        window = [i for i in range(index - neighbours, index + neighbours + 1) if 0 <= i < len(sentences) and i not in kept]
+        cost = sum(tokens[i] for i in window)
+        if used + cost > budget:
+            # Fall back to the sentence alone if its neighbours do not fit
+            window = [index] if index not in kept else []
+            cost = sum(tokens[i] for i in window)
+            if not window or (kept and used + cost > budget):
+                continue
+        kept.update(window)
+        used += cost
+        if used >= budget:
+            break
+
+    return " ".join(sentences[i] for i in sorted(kept))
+
+
+def compress_passages(
+    query: str,
+    passages: List[Dict[str, Any]],
+    ratio: Optional[float] = None,
+    neighbours: Optional[int] = None,
+    model: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Compress each packed passage and report the tokens saved"""
+    ratio = config.PROMPT_COMPRESSION_RATIO if ratio is None else ratio
+    neighbours = config.PROMPT_COMPRESSION_NEIGHBOURS if neighbours is None else neighbours
+
+    compressed = []
+    original_tokens = 0
+    compressed_tokens = 0
+    for passage in passages:
+        before = passage.get("tokens")
+        if before is None:
+            before = count_tokens(passage["content"], model)
+        content = compress_passage(query, passage["content"], ratio, neighbours, model)
+        after = count_tokens(content, model) if content != passage["content"] else before
+        compressed.append({**passage, "content": content, "tokens": after})
+        original_tokens += before
+        compressed_tokens += after
+
+    return compressed, {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "tokens_saved": max(0, original_tokens - compressed_tokens),
+    }
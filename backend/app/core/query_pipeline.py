@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from . import config
+from .coalescing import knowledge_base_version, query_key
+from .memory_manager import session_memory_manager
+from .context_packer import pack_context
+from .metrics import QueryTimer, agent_model_name
+from .prompt_compression import compress_passages
+from .reranker import get_reranker, rerank
+from .session_history import session_history
+
+logger = logging.getLogger(__name__)
+
+
+class StageResult:
+    """Outcome of one context stage: its value, status and wall time"""
+
+    def __init__(self, name: str, value: Any, status: str, elapsed: float):
+        self.name = name
+        self.value = value
+        self.status = status
+        self.elapsed = elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"status": self.status, "elapsed_ms": round(self.elapsed * 1000, 1)}
+
+
+async def run_stage(name: str, fn: Callable[[], Awaitable[Any]], timeout: float, default: Any) -> StageResult:
+    """Run a stage under its own deadline; a late stage yields ``default``.
+
+    Errors other than the deadline propagate so that, for example, an invalid
+    filter expression still reaches the client.
+    """
+    start = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(fn(), timeout)
+        status = "ok"
+    except asyncio.TimeoutError:
+        logger.warning(f"Query stage '{name}' missed its {timeout}s deadline")
+        value = default
+        status = "timeout"
+    return StageResult(name, value, status, time.perf_counter() - start)
+
+
+class QueryContext:
+    """Everything gathered before prompt assembly"""
+
+    def __init__(self, memories: List[Any], search_results: Optional[List[dict]], history: List[Dict[str, str]], stages: Dict[str, StageResult], tokens_saved: int = 0):
+        self.memories = memories
+        self.search_results = search_results
+        self.history = history
+        self.stages = stages
+        self.tokens_saved = tokens_saved
+
+    def prompt_parts(self, question: str) -> List[str]:
+        """The texts that end up in the model prompt, for token accounting"""
+        parts = [question]
+        parts.extend(result["content"] for result in self.search_results or [])
+        parts.extend(message["content"] for message in self.history)
+        return parts
+
+    def record_timings(self, timer: QueryTimer):
+        for name, stage in self.stages.items():
+            timer.record(name, stage.elapsed)
+
+
+def candidate_limit() -> int:
+    """How many hits to fetch: a wide net when a reranker narrows it down"""
+    return config.RERANK_CANDIDATES if get_reranker() is not None else config.RERANK_TOP_K
+
+
+def retrieve_passages(knowledge_base: Any, query: str, filters: Optional[Dict[str, Any]] = None, model: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Search, rerank and pack in one call, for agents that retrieve on their own"""
+    results, _ = rerank(query, knowledge_base.search(query, limit=candidate_limit(), filters=filters))
+    passages = pack_context(query, results, model=model)
+    if config.PROMPT_COMPRESSION_ENABLED:
+        passages, _ = compress_passages(query, passages, model=model)
+    return passages
+
+
+def supports_prefetch(agent: Any) -> bool:
+    """Whether the agent accepts packed ``search_results`` and ``history`` from the caller.
+
+    False for agno agents, which search and load history themselves.
+    """
+    return getattr(agent, "supports_prefetch", False) is True
+
+
+async def gather_query_context(
+    agent: Any,
+    knowledge_base: Any,
+    question: str,
+    user_id: Optional[str],
+    session_id: Optional[str],
+    use_memory: bool,
+    filters: Optional[Dict[str, Any]] = None,
+    history_limit: int = config.MAX_HISTORY_MESSAGES,
+    retrieval_cache: Optional[Dict[Any, asyncio.Future]] = None,
+) -> QueryContext:
+    """Run memory search, retrieval and history load concurrently.
+
+    Retrieval and history are only prefetched for agents that accept them
+    (``supports_prefetch``). For agno agents, the default advanced stack,
+    only the memory search runs here: they retrieve through KnowledgeTools
+    calls the model chooses during the run and read history from agno's own
+    session storage, so both still happen one after another inside ``arun``
+    and no retrieval or history stages are reported. Retrieved
+    documents are packed into passages within the context token budget and,
+    when PROMPT_COMPRESSION_ENABLED is set, cut down to their best sentences.
+    Callers answering many questions at once can pass a ``retrieval_cache``
+    dict so that the same search is only run once.
+    """
+    prefetch = supports_prefetch(agent)
+
+    async def memories():
+        return await session_memory_manager.aget_relevant_memories_for_query(
+            user_id=user_id,
+            query=question,
+            limit=config.MAX_MEMORY_CONTEXT
+        )
+
+    async def retrieval():
+        if retrieval_cache is None:
+            return await asyncio.to_thread(knowledge_base.search, question, limit=candidate_limit(), filters=filters)
+        key = (id(knowledge_base), query_key(question, "retrieval", None, knowledge_base_version(knowledge_base), filters))
+        if key not in retrieval_cache:
+            retrieval_cache[key] = asyncio.ensure_future(
+                asyncio.to_thread(knowledge_base.search, question, limit=candidate_limit(), filters=filters)
+            )
+        # Shielded so a caller's deadline does not cancel the search for others
+        return await asyncio.shield(retrieval_cache[key])
+
+    async def history():
+        return session_history.get(session_id, history_limit)
+
+    # Only stages that apply to this request are run (and timed)
+    pending = []
+    if use_memory and user_id:
+        pending.append(run_stage("memory_search", memories, config.MEMORY_STAGE_TIMEOUT_SECONDS, []))
+    if prefetch:
+        pending.append(run_stage("retrieval", retrieval, config.RETRIEVAL_STAGE_TIMEOUT_SECONDS, []))
+    if prefetch and session_id:
+        pending.append(run_stage("history_load", history, config.HISTORY_STAGE_TIMEOUT_SECONDS, []))
+
+    stages = {stage.name: stage for stage in await asyncio.gather(*pending)}
+    tokens_saved = 0
+
+    retrieval_stage = stages.get("retrieval")
+    if retrieval_stage is not None and retrieval_stage.value:
+        # Rerank the candidates (bounded by its own latency cap), then pack
+        # the best of them into the prompt's token budget
+        start = time.perf_counter()
+        results, info = await asyncio.to_thread(rerank, question, retrieval_stage.value)
+        stages["rerank"] = StageResult("rerank", results, info["status"], time.perf_counter() - start)
+
+        start = time.perf_counter()
+        passages = await asyncio.to_thread(pack_context, question, results, model=agent_model_name(agent))
+        stages["context_assembly"] = StageResult("context_assembly", passages, "ok", time.perf_counter() - start)
+
+        if config.PROMPT_COMPRESSION_ENABLED and passages:
+            start = time.perf_counter()
+            passages, info = await asyncio.to_thread(compress_passages, question, passages, model=agent_model_name(agent))
+            stages["prompt_compression"] = StageResult("prompt_compression", passages, "ok", time.perf_counter() - start)
+            tokens_saved = info["tokens_saved"]
+
+    if "prompt_compression" in stages:
+        search_results = stages["prompt_compression"].value
+    elif "context_assembly" in stages:
+        search_results = stages["context_assembly"].value
+    else:
+        search_results = stages["retrieval"].value if "retrieval" in stages else None
+    return QueryContext(
+        memories=stages["memory_search"].value if "memory_search" in stages else [],
+        search_results=search_results,
+        history=stages["history_load"].value if "history_load" in stages else [],
+        stages=stages,
+        tokens_saved=tokens_saved,
+    )
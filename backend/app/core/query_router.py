@@ -0,0 +1,177 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from . import config
+from .document_index import tokenize
+from .model_router import ProviderStats
+
+RAG = "rag"
+RESEARCH = "research"
+
+# Questions that ask for reasoning over several facts rather than one fact
+_ANALYTICAL_PATTERN = re.compile(
+    r"\b(why|how|compare|comparison|contrast|analy[sz]e|analysis|explain|evaluate|assess|implications?|"
+    r"trade-?offs?|pros and cons|differences?|impact|recommend|strategy|plan)\b"
+    r"|왜|어떻게|비교|분석|차이|장단점|평가|영향|설명|전략|추천|검토"
+)
+_FACTOID_PATTERN = re.compile(
+    r"^\s*(what is|what are|who|when|where|which|is there|does|do|can|how many|how much)\b"
+    r"|무엇|뭐|언제|어디|누구|몇|얼마"
+)
+_CONJUNCTION_PATTERN = re.compile(r"\b(and|also|as well as|versus|vs\.?)\b|그리고|또한|및")
+
+# Feature weights of the complexity score
+_WEIGHTS = {
+    "analytical": 0.35,
+    "factoid": -0.15,
+    "multi_part": 0.2,
+    "length": 0.25,
+    "low_confidence": 0.2,
+    "hint": 0.25,
+}
+
+
+def retrieval_confidence(question: str, search_results: Optional[List[Any]]) -> Optional[float]:
+    """Share of the question's terms covered by the best retrieved passage.
+
+    None when nothing was retrieved up front (agents that search on their own).
+    """
+    if search_results is None:
+        return None
+    terms = set(tokenize(question))
+    if not terms:
+        return None
+    best = 0.0
+    for result in search_results:
+        content = result.get("content", "") if isinstance(result, dict) else getattr(result, "content", "")
+        best = max(best, len(terms & set(tokenize(content or ""))) / len(terms))
+    return best
+
+
+def complexity_features(question: str, search_results: Optional[List[Any]] = None, hint: bool = False) -> Dict[str, float]:
+    """Cheap local signals of how much reasoning a question needs, each in [0, 1]"""
+    lowered = question.lower()
+    words = len(question.split())
+    confidence = retrieval_confidence(question, search_results)
+    return {
+        "analytical": float(bool(_ANALYTICAL_PATTERN.search(lowered))),
+        "factoid": float(bool(_FACTOID_PATTERN.search(lowered))),
+        "multi_part": float(question.count("?") > 1 or len(_CONJUNCTION_PATTERN.findall(lowered)) > 1),
+        "length": min(1.0, words / 40),
+        "low_confidence": 1.0 - confidence if confidence is not None else 0.0,
+        "hint": float(hint),
+    }
+
+
+def complexity_score(features: Dict[str, float]) -> float:
+    score = sum(_WEIGHTS[name] * value for name, value in features.items())
+    return min(1.0, max(0.0, score))
+
+
+class RouteDecision:
+    """Which agent answers a query, and why"""
+
+    def __init__(self, route: str, reason: str, score: Optional[float] = None, features: Optional[Dict[str, float]] = None):
+        self.route = route
+        self.reason = reason
+        self.score = score
+        self.features = features or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "route": self.route,
+            "reason": self.reason,
+            "score": round(self.score, 3) if self.score is not None else None,
+            "features": {name: round(value, 3) for name, value in self.features.items()},
+        }
+
+
+class QueryRouter:
+    """Sends each query to the RAG agent or the multi-agent research team.
+
+    Queries whose complexity score reaches ``threshold`` go to the research
+    team, unless its estimated token cost (prompt tokens times
+    ``research_cost`` model calls) or its observed p95 latency exceeds the
+    budget. An explicit route on the request always wins; when the router
+    is disabled, the use_advanced_reasoning hint decides on its own.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        threshold: float = 0.5,
+        research_cost: float = 4.0,
+        max_tokens: int = 0,
+        latency_budget: float = 0.0,
+        window: int = 100,
+        window_seconds: float = 300.0,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.research_cost = research_cost
+        self.max_tokens = max_tokens
+        self.latency_budget = latency_budget
+        self.latency = {route: ProviderStats(window, window_seconds) for route in (RAG, RESEARCH)}
+        self.metrics = {"forced": 0, "rag": 0, "research": 0, "over_token_budget": 0, "over_latency_budget": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, *names: str):
+        with self._lock:
+            for name in names:
+                self.metrics[name] += 1
+
+    def decide(
+        self,
+        question: str,
+        requested: Optional[str] = None,
+        hint: bool = False,
+        search_results: Optional[List[Any]] = None,
+        prompt_tokens: int = 0,
+    ) -> RouteDecision:
+        if requested in (RAG, RESEARCH):
+            self._count("forced", requested)
+            return RouteDecision(requested, "requested")
+        if not self.enabled:
+            route = RESEARCH if hint else RAG
+            self._count(route)
+            return RouteDecision(route, "router_disabled")
+
+        features = complexity_features(question, search_results, hint)
+        score = complexity_score(features)
+        if score < self.threshold:
+            self._count(RAG)
+            return RouteDecision(RAG, "simple", score, features)
+
+        if self.max_tokens and prompt_tokens * self.research_cost > self.max_tokens:
+            self._count(RAG, "over_token_budget")
+            return RouteDecision(RAG, "over_token_budget", score, features)
+        # Samples age out of the window, so the research team is tried again later
+        p95 = self.latency[RESEARCH].percentile(0.95)
+        if self.latency_budget and p95 is not None and p95 > self.latency_budget:
+            self._count(RAG, "over_latency_budget")
+            return RouteDecision(RAG, "over_latency_budget", score, features)
+
+        self._count(RESEARCH)
+        return RouteDecision(RESEARCH, "complex", score, features)
+
+    def record(self, route: str, latency: float, ok: bool = True):
+        """Feed back how long an answer on ``route`` took"""
+        self.latency[route].record(latency, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "latency": {route: stats.to_dict() for route, stats in self.latency.items()},
+        }
+
+
+query_router = QueryRouter(
+    enabled=config.QUERY_ROUTER_ENABLED,
+    threshold=config.QUERY_ROUTER_THRESHOLD,
+    research_cost=config.QUERY_ROUTER_RESEARCH_COST,
+    max_tokens=config.QUERY_ROUTER_MAX_TOKENS,
+    latency_budget=config.QUERY_ROUTER_LATENCY_BUDGET_SECONDS,
+)
@@ -0,0 +1,174 @@
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import config
+from .document_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+# Metadata fields whose matches with the query earn a boost
+BOOSTED_FIELDS = ("title", "filename", "url")
+
+
+def _min_span(positions: List[List[int]]) -> int:
+    """Length of the shortest token window containing one position of every list"""
+    events = sorted((position, term) for term, plist in enumerate(positions) for position in plist)
+    counts = [0] * len(positions)
+    covered = 0
+    best = None
+    left = 0
+    for position, term in events:
+        if counts[term] == 0:
+            covered += 1
+        counts[term] += 1
+        while covered == len(positions):
+            span = position - events[left][0] + 1
+            best = span if best is None else min(best, span)
+            left_term = events[left][1]
+            counts[left_term] -= 1
+            if counts[left_term] == 0:
+                covered -= 1
+            left += 1
+    return best or 0
+
+
+class HeuristicReranker:
+    """CPU-only scorer built from lexical features.
+
+    Per candidate it extracts query-term coverage, term proximity (shortest
+    window containing every matched term), exact phrase and bigram matches,
+    metadata field matches and the first-stage score; a batch is then scored
+    as one matrix-vector product with ``WEIGHTS``.
+    """
+
+    name = "heuristic"
+    # coverage, proximity, phrase, bigrams, fields, first stage
+    WEIGHTS = np.array([0.30, 0.20, 0.15, 0.10, 0.10, 0.15])
+
+    def _features(self, query: str, query_terms: List[str], candidate: Dict[str, Any], max_score: float) -> List[float]:
+        content = candidate.get("content") or ""
+        tokens = tokenize(content)
+        positions: Dict[str, List[int]] = {}
+        for index, token in enumerate(tokens):
+            positions.setdefault(token, []).append(index)
+
+        unique_terms = list(dict.fromkeys(query_terms))
+        matched = [term for term in unique_terms if term in positions]
+        coverage = len(matched) / len(unique_terms) if unique_terms else 0.0
+
+        proximity = 0.0
+        if len(matched) > 1:
+            span = _min_span([positions[term] for term in matched])
+            proximity = len(matched) / span if span else 0.0
+        elif matched:
+            proximity = 1.0
+
+        normalized_query = " ".join(query.lower().split())
+        phrase = 1.0 if len(query_terms) > 1 and normalized_query in " ".join(content.lower().split()) else 0.0
+
+        bigrams = list(zip(query_terms, query_terms[1:]))
+        if bigrams:
+            content_bigrams = set(zip(tokens, tokens[1:]))
+            bigram_hits = sum(1 for bigram in bigrams if bigram in content_bigrams) / len(bigrams)
+        else:
+            bigram_hits = 0.0
+
+        metadata = candidate.get("metadata") or {}
+        field_terms = set()
+        for field in BOOSTED_FIELDS:
+            if isinstance(metadata.get(field), str):
+                field_terms.update(tokenize(metadata[field]))
+        fields = sum(1 for term in unique_terms if term in field_terms) / len(unique_terms) if unique_terms else 0.0
+
+        score = candidate.get("score")
+        first_stage = score / max_score if isinstance(score, (int, float)) and max_score > 0 else 0.0
+        return [coverage, proximity, phrase, bigram_hits, fields, first_stage]
+
+    def score_batch(self, query: str, batch: List[Dict[str, Any]], max_score: float) -> np.ndarray:
+        query_terms = tokenize(query)
+        features = np.array([self._features(query, query_terms, candidate, max_score) for candidate in batch])
+        return features @ self.WEIGHTS
+
+
+class CrossEncoderReranker:
+    """Small local cross-encoder (sentence-transformers) run on the CPU"""
+
+    def __init__(self, model_name: str):
+        self.name = model_name
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score_batch(self, query: str, batch: List[Dict[str, Any]], max_score: float) -> np.ndarray:
+        pairs = [(query, candidate.get("content") or "") for candidate in batch]
+        return np.asarray(self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False))
+
+
+@lru_cache(maxsize=1)
+def get_reranker() -> Optional[Any]:
+    """Build the reranker named by RERANKER: "heuristic", "none" or "cross-encoder:<model>" """
+    choice = config.RERANKER
+    if choice == "none":
+        return None
+    if choice.startswith("cross-encoder:"):
+        if not CROSS_ENCODER_AVAILABLE:
+            logger.warning("sentence-transformers not installed, using the heuristic reranker")
+            return HeuristicReranker()
+        try:
+            return CrossEncoderReranker(choice.split(":", 1)[1])
+        except Exception as e:
+            logger.error(f"Failed to load cross-encoder, using the heuristic reranker: {e}")
+            return HeuristicReranker()
+    return HeuristicReranker()
+
+
+def rerank(
+    query: str,
+    results: List[Dict[str, Any]],
+    top_k: Optional[int] = None,
+    reranker: Optional[Any] = None,
+    latency_cap_ms: Optional[float] = None,
+    batch_size: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Rescore search results and keep the best ``top_k``.
+
+    Candidates are scored in batches; if the latency cap is exceeded the
+    first-stage order is returned instead. Returned results carry the
+    reranker's score normalized to [0, 1] as ``score`` and the original one as
+    ``retrieval_score``.
+    """
+    top_k = config.RERANK_TOP_K if top_k is None else top_k
+    latency_cap = (config.RERANK_LATENCY_MS if latency_cap_ms is None else latency_cap_ms) / 1000
+    batch_size = max(1, config.RERANK_BATCH_SIZE if batch_size is None else batch_size)
+    reranker = get_reranker() if reranker is None else reranker
+
+    start = time.perf_counter()
+    if reranker is None or len(results) <= 1:
+        return results[:top_k], {"status": "skipped", "candidates": len(results)}
+
+    max_score = max((r["score"] for r in results if isinstance(r.get("score"), (int, float))), default=0.0)
+    scores = []
+    for offset in range(0, len(results), batch_size):
+        scores.append(reranker.score_batch(query, results[offset:offset + batch_size], max_score))
+        if time.perf_counter() - start > latency_cap and offset + batch_size < len(results):
+            logger.warning(f"Reranking exceeded {latency_cap * 1000:.0f} ms, keeping first-stage order")
+            return results[:top_k], {"status": "timeout", "candidates": len(results), "reranker": reranker.name}
+
+    scores = np.concatenate(scores)
+    low, high = float(scores.min()), float(scores.max())
+    normalized = (scores - low) / (high - low) if high > low else np.ones_like(scores)
+    # Stable sort keeps first-stage order between ties
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    reranked = [
+        {**results[i], "score": round(float(normalized[i]), 4), "retrieval_score": results[i].get("score")}
+        for i in order
+    ]
+    return reranked, {"status": "ok", "candidates": len(results), "reranker": reranker.name}
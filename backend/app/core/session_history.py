@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List
+
+from . import config
+
+
+class SessionHistory:
+    """Recent conversation turns per session, kept in memory.
+
+    Only the last ``max_messages`` messages of each session are retained, and
+    the least recently active sessions are dropped above ``max_sessions``.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_messages: int = 10):
+        self.max_sessions = max(1, max_sessions)
+        self.max_messages = max(1, max_messages)
+        self._sessions: "OrderedDict[str, Deque[Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, role: str, content: str):
+        with self._lock:
+            messages = self._sessions.get(session_id)
+            if messages is None:
+                messages = deque(maxlen=self.max_messages)
+                self._sessions[session_id] = messages
+            else:
+                self._sessions.move_to_end(session_id)
+            messages.append({"role": role, "content": content})
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def get(self, session_id: str, limit: int) -> List[Dict[str, str]]:
+        """Return the last ``limit`` messages of a session, oldest first"""
+        if limit <= 0:
+            return []
+        with self._lock:
+            messages = self._sessions.get(session_id)
+            return list(messages)[-limit:] if messages else []
+
+    def clear(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+# Two messages (question and answer) per turn
+session_history = SessionHistory(
+    max_sessions=config.MAX_HISTORY_SESSIONS,
+    max_messages=2 * config.MAX_HISTORY_MESSAGES,
+)
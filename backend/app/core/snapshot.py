@@ -0,0 +1,164 @@
+"""Columnar (Arrow IPC) snapshots of a knowledge base.
+
+A snapshot is a directory holding a ``manifest.json`` plus uncompressed Arrow
+IPC files, which import reads through a memory map instead of a buffered copy.
+The map is not the live storage: ``SimpleKnowledgeBase`` keeps Python dicts,
+so its columns are decoded once on import, and LanceDB copies the mapped
+table into its own files. What a snapshot saves is re-tokenizing and
+re-embedding, not the decode:
+
+* ``SimpleKnowledgeBase``: ``documents.arrow`` (id, content, metadata, length)
+  and ``postings.arrow`` (term, slot, tf), so the retrieval index is restored
+  without re-tokenizing anything.
+* agno ``AgentKnowledge`` on LanceDB: ``vectors.arrow`` with the LanceDB table
+  (embeddings, payload and chunk metadata), so nothing is re-embedded.
+"""
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from . import config
+from .dependencies import SimpleKnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+_SNAPSHOT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be written or read"""
+
+
+def snapshot_path(name: str) -> Path:
+    """Resolve a snapshot name to its directory under SNAPSHOT_DIR"""
+    if not _SNAPSHOT_NAME_PATTERN.match(name) or name.startswith("."):
+        raise SnapshotError(f"Invalid snapshot name: {name!r}")
+    return config.SNAPSHOT_DIR / name
+
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise SnapshotError("pyarrow is required for knowledge base snapshots")
+
+
+def _write_table(table: "pa.Table", path: Path):
+    with ipc.new_file(str(path), table.schema) as writer:
+        writer.write_table(table)
+
+
+def _map_table(path: Path) -> "pa.Table":
+    """Read an Arrow IPC file through a memory map (callers still decode or copy it)"""
+    return ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def _vector_db(knowledge_base: Any):
+    vector_db = getattr(knowledge_base, "vector_db", None)
+    if vector_db is None or getattr(vector_db, "table", None) is None:
+        raise SnapshotError(f"Snapshots are not supported for {type(knowledge_base).__name__}")
+    return vector_db
+
+
+def export_snapshot(knowledge_base: Any, path: Path) -> Dict[str, Any]:
+    """Write the complete knowledge base to a snapshot directory"""
+    _require_pyarrow()
+    started = time.perf_counter()
+    path.mkdir(parents=True, exist_ok=True)
+
+    if isinstance(knowledge_base, SimpleKnowledgeBase):
+        documents, postings, doc_lengths = knowledge_base.export_state()
+        _write_table(pa.table({
+            "id": pa.array([doc["id"] for doc in documents], pa.string()),
+            "content": pa.array([doc["content"] for doc in documents], pa.large_string()),
+            "metadata": pa.array([json.dumps(doc["metadata"], ensure_ascii=False) for doc in documents], pa.string()),
+            "length": pa.array(doc_lengths, pa.int32()),
+        }), path / "documents.arrow")
+        postings.sort()
+        _write_table(pa.table({
+            "term": pa.array([term for term, _, _ in postings], pa.string()).dictionary_encode(),
+            "slot": pa.array([slot for _, slot, _ in postings], pa.int32()),
+            "tf": pa.array([tf for _, _, tf in postings], pa.int32()),
+        }), path / "postings.arrow")
+        manifest = {"kind": "simple", "documents": len(documents), "postings": len(postings)}
+    else:
+        vector_db = _vector_db(knowledge_base)
+        table = vector_db.table.to_arrow()
+        _write_table(table, path / "vectors.arrow")
+        manifest = {"kind": "lancedb", "documents": table.num_rows, "table_name": vector_db.table_name}
+
+    manifest.update({
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+    })
+    (path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+    manifest["bytes"] = sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+    manifest["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Exported knowledge base snapshot to {path}: {manifest}")
+    return manifest
+
+
+def import_snapshot(knowledge_base: Any, path: Path) -> Dict[str, Any]:
+    """Replace the knowledge base contents with a snapshot directory"""
+    _require_pyarrow()
+    started = time.perf_counter()
+    manifest_path = path / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise SnapshotError(f"No snapshot found at {path}")
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format version: {manifest.get('format_version')}")
+
+    if isinstance(knowledge_base, SimpleKnowledgeBase):
+        if manifest["kind"] != "simple":
+            raise SnapshotError(f"Cannot import a {manifest['kind']} snapshot into SimpleKnowledgeBase")
+        # Decoded into the dicts SimpleKnowledgeBase searches; a full copy, but no tokenizing
+        documents_table = _map_table(path / "documents.arrow")
+        postings_table = _map_table(path / "postings.arrow")
+
+        documents = [
+            {"id": doc_id, "content": content, "metadata": json.loads(metadata)}
+            for doc_id, content, metadata in zip(
+                documents_table.column("id").to_pylist(),
+                documents_table.column("content").to_pylist(),
+                documents_table.column("metadata").to_pylist(),
+            )
+        ]
+        doc_lengths = dict(enumerate(documents_table.column("length").to_pylist()))
+        postings: Dict[str, Dict[int, int]] = {}
+        for term, slot, tf in zip(
+            postings_table.column("term").to_pylist(),
+            postings_table.column("slot").to_pylist(),
+            postings_table.column("tf").to_pylist(),
+        ):
+            postings.setdefault(term, {})[slot] = tf
+        knowledge_base.restore(documents, postings, doc_lengths)
+    else:
+        if manifest["kind"] != "lancedb":
+            raise SnapshotError(f"Cannot import a {manifest['kind']} snapshot into a vector database")
+        vector_db = _vector_db(knowledge_base)
+        table = _map_table(path / "vectors.arrow")
+        vector_db.table = vector_db.connection.create_table(vector_db.table_name, data=table, mode="overwrite")
+        # Full-text index is rebuilt on the next hybrid search
+        vector_db.fts_index_exists = False
+
+    result = {
+        "kind": manifest["kind"],
+        "documents": manifest["documents"],
+        "created_at": manifest["created_at"],
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Imported knowledge base snapshot from {path}: {result}")
+    return result
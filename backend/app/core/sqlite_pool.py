@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSQLitePool:
+    """A small pool of aiosqlite connections to one database file.
+
+    Each aiosqlite connection runs on its own worker thread, so queries never
+    block the event loop and up to ``size`` of them can run at once.
+    Connections are opened lazily and reused.
+    """
+
+    def __init__(self, path: Path, size: int = 4, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.size = max(1, size)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle: List[aiosqlite.Connection] = []
+        self._opened = 0
+        self._available: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._available is None:
+            self._available = asyncio.Condition()
+        return self._available
+
+    async def _open(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(str(self.path))
+        conn.row_factory = aiosqlite.Row
+        await conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        # WAL lets readers proceed while agno writes to the same file
+        await conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        available = self._condition()
+        async with available:
+            while not self._idle and self._opened >= self.size:
+                await available.wait()
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._opened += 1
+                conn = None
+
+        if conn is None:
+            try:
+                conn = await self._open()
+            except Exception:
+                async with available:
+                    self._opened -= 1
+                    available.notify()
+                raise
+
+        try:
+            yield conn
+        finally:
+            async with available:
+                self._idle.append(conn)
+                available.notify()
+
+    async def close(self):
+        """Close all idle connections"""
+        available = self._condition()
+        async with available:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for conn in idle:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.warning(f"Failed to close SQLite connection: {e}")
@@ -0,0 +1,238 @@
+import asyncio
+import errno
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    """Raised when an upload cannot be stored"""
+
+
+class UploadStorage:
+    """Content-addressed upload store with a byte quota.
+
+    Files are named by the SHA-256 of their content, so identical uploads are
+    stored once and same-named uploads no longer overwrite each other. When the
+    quota would be exceeded, the least recently used files (by mtime, which is
+    refreshed on every hit) are evicted down to the low watermark.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        quota_bytes: int,
+        max_age_days: float,
+        low_watermark: float = 0.9,
+    ):
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.max_age_days = max_age_days
+        self.low_watermark = low_watermark
+        self._lock = threading.Lock()
+        self._used_bytes: Optional[int] = None
+        self._file_count = 0
+        self.metrics = {
+            "stored_files": 0,
+            "stored_bytes": 0,
+            "dedup_hits": 0,
+            "evicted_files": 0,
+            "evicted_bytes": 0,
+            "expired_files": 0,
+            "write_failures": 0,
+            "sweeps": 0,
+        }
+        self.last_sweep: Optional[str] = None
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        """Return (path, size, mtime) for every stored file in one scandir pass"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.is_file(follow_symlinks=False) or entry.name.endswith(".tmp"):
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        return entries
+
+    def _ensure_usage(self):
+        if self._used_bytes is None:
+            entries = self._scan()
+            self._used_bytes = sum(size for _, size, _ in entries)
+            self._file_count = len(entries)
+
+    def _evict(self, entries: List[Tuple[str, int, float]], target_bytes: int) -> Tuple[int, int]:
+        """Delete least recently used files until usage is at most ``target_bytes``"""
+        removed = 0
+        freed = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if self._used_bytes <= target_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Failed to evict {path}: {e}")
+                continue
+            self._used_bytes -= size
+            self._file_count -= 1
+            removed += 1
+            freed += size
+        self.metrics["evicted_files"] += removed
+        self.metrics["evicted_bytes"] += freed
+        if removed:
+            logger.info(f"Evicted {removed} uploads ({freed} bytes) to stay under quota")
+        return removed, freed
+
+    def store(self, content: bytes, filename: str) -> Tuple[Path, bool]:
+        """Store upload content and return (path, created)"""
+        if len(content) > self.quota_bytes:
+            raise StorageError(f"File size {len(content)} exceeds the upload storage quota")
+
+        digest = hashlib.sha256(content).hexdigest()
+        suffix = Path(filename).suffix.lower()
+        path = self.directory / f"{digest}{suffix}"
+
+        with self._lock:
+            self._ensure_usage()
+            if path.exists():
+                # Refresh the LRU position of the existing copy
+                os.utime(path)
+                self.metrics["dedup_hits"] += 1
+                return path, False
+
+            if self._used_bytes + len(content) > self.quota_bytes:
+                self._evict(self._scan(), int(self.quota_bytes * self.low_watermark) - len(content))
+
+            tmp_path = path.with_name(path.name + ".tmp")
+            try:
+                self._write(tmp_path, path, content)
+            except OSError as e:
+                if e.errno != errno.ENOSPC:
+                    self.metrics["write_failures"] += 1
+                    raise StorageError(f"Failed to store upload: {e}")
+                # Disk is full regardless of our quota: free space and retry once
+                logger.warning("No space left on device, evicting uploads and retrying")
+                self._evict(self._scan(), self._used_bytes // 2)
+                try:
+                    self._write(tmp_path, path, content)
+                except OSError as retry_error:
+                    self.metrics["write_failures"] += 1
+                    raise StorageError(f"Failed to store upload: {retry_error}")
+
+            self._used_bytes += len(content)
+            self._file_count += 1
+            self.metrics["stored_files"] += 1
+            self.metrics["stored_bytes"] += len(content)
+            return path, True
+
+    @staticmethod
+    def _write(tmp_path: Path, path: Path, content: bytes):
+        try:
+            with open(tmp_path, "wb") as buffer:
+                buffer.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+
+    def remove(self, path: Path):
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                return
+            if self._used_bytes is not None:
+                self._used_bytes -= size
+                self._file_count -= 1
+
+    def sweep(self, max_age_days: Optional[float] = None) -> Dict[str, Any]:
+        """Remove expired uploads, then evict LRU files if over quota"""
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        cutoff_time = time.time() - max_age_days * 24 * 60 * 60
+
+        with self._lock:
+            entries = self._scan()
+            self._used_bytes = sum(size for _, size, _ in entries)
+            self._file_count = len(entries)
+
+            expired = 0
+            remaining = []
+            for path, size, mtime in entries:
+                if mtime >= cutoff_time:
+                    remaining.append((path, size, mtime))
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"Failed to remove file {path}: {e}")
+                    remaining.append((path, size, mtime))
+                    continue
+                self._used_bytes -= size
+                self._file_count -= 1
+                expired += 1
+            self.metrics["expired_files"] += expired
+
+            evicted = 0
+            if self._used_bytes > self.quota_bytes:
+                evicted, _ = self._evict(remaining, int(self.quota_bytes * self.low_watermark))
+
+            self.metrics["sweeps"] += 1
+            self.last_sweep = datetime.now().isoformat()
+
+        return {"expired_files": expired, "evicted_files": evicted, **self.usage()}
+
+    def usage(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_usage()
+            used = self._used_bytes
+            files = self._file_count
+        return {
+            "used_bytes": used,
+            "quota_bytes": self.quota_bytes,
+            "usage_ratio": round(used / self.quota_bytes, 4) if self.quota_bytes else 0.0,
+            "file_count": files,
+            "last_sweep": self.last_sweep,
+            **self.metrics,
+        }
+
+    async def run_sweeper(self, interval_seconds: float):
+        """Periodically sweep the upload directory until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                result = await asyncio.to_thread(self.sweep)
+                logger.info(f"Upload sweep: {result}")
+            except Exception as e:
+                # Never let a storage problem take the backend down
+                logger.error(f"Upload sweep failed: {e}")
+
+
+upload_storage = UploadStorage(
+    directory=config.UPLOAD_DIR,
+    quota_bytes=config.UPLOAD_QUOTA_BYTES,
+    max_age_days=config.UPLOAD_MAX_AGE_DAYS,
+    low_watermark=config.UPLOAD_QUOTA_LOW_WATERMARK,
+)
@@ -0,0 +1,100 @@
+import logging
+from typing import Any, AsyncIterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# agno run events that carry answer text
+_CONTENT_EVENTS = {"RunResponseContent", "TeamRunResponseContent"}
+_ERROR_EVENTS = {"RunError", "TeamRunError"}
+
+
+async def stream_agent_response(agent: Any, message: str, **kwargs) -> AsyncIterator[str]:
+    """Yield answer text deltas from any agent as the provider produces them.
+
+    Our own agents expose ``astream``; agno agents and teams are run with
+    ``stream=True`` and their content events are forwarded.
+    """
+    astream = getattr(agent, "astream", None)
+    if astream is not None:
+        async for delta in astream(message, **kwargs):
+            if delta:
+                yield delta
+        return
+
+    events = await agent.arun(message, stream=True, **kwargs)
+    async for event in events:
+        event_type = getattr(event, "event", None)
+        if event_type in _ERROR_EVENTS:
+            raise RuntimeError(getattr(event, "content", None) or "Agent run failed")
+        if event_type in _CONTENT_EVENTS and isinstance(event.content, str) and event.content:
+            yield event.content
+
+
+class ThinkStreamParser:
+    """Incrementally split a token stream into <think> content and the answer.
+
+    Tags may be split across chunks, so a possible partial tag at the end of a
+    chunk is held back until the next chunk arrives.
+    """
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._answer_started = False
+        self.think = ""
+        self.answer = ""
+
+    @property
+    def think_block(self) -> str:
+        return f"{self.OPEN_TAG}{self.think}{self.CLOSE_TAG}" if self.think else ""
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk and return ("think" | "answer", text) segments"""
+        self._buffer += chunk
+        segments: List[Tuple[str, str]] = []
+        while True:
+            tag = self.CLOSE_TAG if self._in_think else self.OPEN_TAG
+            position = self._buffer.find(tag)
+            if position >= 0:
+                self._emit(self._buffer[:position], segments)
+                self._buffer = self._buffer[position + len(tag):]
+                self._in_think = not self._in_think
+                continue
+
+            keep = self._partial_tag_length(self._buffer, tag)
+            self._emit(self._buffer[:len(self._buffer) - keep], segments)
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            return segments
+
+    def flush(self) -> List[Tuple[str, str]]:
+        """Emit whatever is still buffered at the end of the stream"""
+        segments: List[Tuple[str, str]] = []
+        self._emit(self._buffer, segments)
+        self._buffer = ""
+        return segments
+
+    def _emit(self, text: str, segments: List[Tuple[str, str]]):
+        if not text:
+            return
+        if self._in_think:
+            self.think += text
+            segments.append(("think", text))
+            return
+        if not self._answer_started:
+            # Drop the whitespace between </think> and the answer
+            text = text.lstrip()
+            if not text:
+                return
+            self._answer_started = True
+        self.answer += text
+        segments.append(("answer", text))
+
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        for length in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:length]):
+                return length
+        return 0
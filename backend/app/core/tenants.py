@@ -0,0 +1,122 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class InvalidTenantError(ValueError):
+    """Raised when a tenant ID is not a safe identifier"""
+
+
+def validate_tenant_id(tenant_id: str) -> str:
+    """Tenant IDs end up in table and file names, so only allow [A-Za-z0-9_-]"""
+    if not _TENANT_ID_PATTERN.match(tenant_id):
+        raise InvalidTenantError(f"Invalid tenant ID: {tenant_id!r}")
+    return tenant_id
+
+
+class TenantPartition:
+    """A loaded tenant: its knowledge base plus the agents bound to it"""
+
+    def __init__(self, tenant_id: str, knowledge_base: Any):
+        self.tenant_id = tenant_id
+        self.knowledge_base = knowledge_base
+        self.agents: Dict[str, Any] = {}
+        self.loaded_at = datetime.now()
+        self.last_used = self.loaded_at
+
+
+class TenantRegistry:
+    """Lazily loads tenant partitions and unloads the least recently used ones.
+
+    ``loader(tenant_id)`` builds a tenant's knowledge base the first time it is
+    requested; ``unloader(tenant_id, knowledge_base)`` is called when the tenant
+    is evicted so it can persist its state.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        unloader: Optional[Callable[[str, Any], None]] = None,
+        max_loaded: int = 8,
+    ):
+        self.loader = loader
+        self.unloader = unloader
+        self.max_loaded = max(1, max_loaded)
+        self._partitions: "OrderedDict[str, TenantPartition]" = OrderedDict()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.RLock()
+
+    def get(self, tenant_id: str) -> TenantPartition:
+        validate_tenant_id(tenant_id)
+        with self._lock:
+            counters = self._counters.setdefault(tenant_id, {"requests": 0, "loads": 0, "unloads": 0})
+            counters["requests"] += 1
+
+            partition = self._partitions.get(tenant_id)
+            if partition is None:
+                logger.info(f"Loading knowledge base for tenant {tenant_id}")
+                partition = TenantPartition(tenant_id, self.loader(tenant_id))
+                self._partitions[tenant_id] = partition
+                counters["loads"] += 1
+                self._evict_idle()
+            else:
+                self._partitions.move_to_end(tenant_id)
+
+            partition.last_used = datetime.now()
+            return partition
+
+    def unload(self, tenant_id: str) -> bool:
+        with self._lock:
+            partition = self._partitions.pop(tenant_id, None)
+        if partition is None:
+            return False
+        self._unload_partition(partition)
+        return True
+
+    def unload_all(self):
+        with self._lock:
+            partitions = list(self._partitions.values())
+            self._partitions.clear()
+        for partition in partitions:
+            self._unload_partition(partition)
+
+    def is_loaded(self, tenant_id: str) -> bool:
+        return tenant_id in self._partitions
+
+    def _evict_idle(self):
+        while len(self._partitions) > self.max_loaded:
+            _, partition = self._partitions.popitem(last=False)
+            logger.info(f"Unloading idle tenant {partition.tenant_id}")
+            self._unload_partition(partition)
+
+    def _unload_partition(self, partition: TenantPartition):
+        self._counters.setdefault(partition.tenant_id, {"requests": 0, "loads": 0, "unloads": 0})["unloads"] += 1
+        if self.unloader is None:
+            return
+        try:
+            self.unloader(partition.tenant_id, partition.knowledge_base)
+        except Exception as e:
+            logger.error(f"Failed to unload tenant {partition.tenant_id}: {e}")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-tenant counters, including tenants that are currently unloaded"""
+        with self._lock:
+            result = []
+            for tenant_id, counters in self._counters.items():
+                partition = self._partitions.get(tenant_id)
+                entry = {"tenant_id": tenant_id, "loaded": partition is not None, **counters}
+                if partition is not None:
+                    entry["loaded_at"] = partition.loaded_at.isoformat()
+                    entry["last_used"] = partition.last_used.isoformat()
+                    documents = getattr(partition.knowledge_base, "documents", None)
+                    if isinstance(documents, list):
+                        entry["documents"] = len(documents)
+                result.append(entry)
+            return result
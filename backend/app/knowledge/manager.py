@@ -12,6 +12,7 @@ from agno.knowledge.url import UrlKnowledge
 from agno.vectordb.lancedb import LanceDb, SearchType
 
 from ..core import config
+from ..core.storage import upload_storage, StorageError
 from ..schemas.document import DocumentUploadResponse
 
 # Set up logging
@@ -20,17 +21,16 @@ logger = logging.getLogger(__name__)
 async def process_uploaded_file(file: UploadFile, knowledge_base: AgentKnowledge) -> DocumentUploadResponse:
     """Save, process, and load a document into the knowledge base."""
     file_path = None
+    created = False
     try:
         logger.info(f"Processing uploaded file: {file.filename}")
         
-        # Ensure upload directory exists
-        config.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-        
-        # Save uploaded file
-        file_path = config.UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Save uploaded file under its content hash
+        content = await file.read()
+        try:
+            file_path, created = upload_storage.store(content, file.filename)
+        except StorageError as e:
+            raise HTTPException(status_code=507, detail=str(e))
         
         logger.info(f"File saved to: {file_path}")
         
@@ -91,10 +91,10 @@ async def process_uploaded_file(file: UploadFile, knowledge_base: AgentKnowledge
     except Exception as e:
         logger.error(f"Error processing document {file.filename}: {str(e)}")
         
-        # Clean up file if it was created
-        if file_path and file_path.exists():
+        # Clean up file if this upload created it
+        if file_path and created:
             try:
-                file_path.unlink()
+                upload_storage.remove(file_path)
                 logger.info(f"Cleaned up file: {file_path}")
             except Exception as cleanup_error:
                 logger.error(f"Failed to cleanup file {file_path}: {cleanup_error}")
@@ -179,26 +179,18 @@ def get_knowledge_base_info(knowledge_base: AgentKnowledge) -> Dict[str, Any]:
 
 
 def cleanup_old_files(max_age_days: int = 7) -> Dict[str, Any]:
-    """Clean up old uploaded files."""
+    """Clean up old uploaded files and enforce the upload storage quota."""
     try:
-        if not config.UPLOAD_DIR.exists():
-            return {"message": "Upload directory does not exist", "files_removed": 0}
-        
-        cutoff_time = datetime.now().timestamp() - (max_age_days * 24 * 60 * 60)
-        files_removed = 0
-        
-        for file_path in config.UPLOAD_DIR.iterdir():
-            if file_path.is_file() and file_path.stat().st_mtime < cutoff_time:
-                try:
-                    file_path.unlink()
-                    files_removed += 1
-                    logger.info(f"Removed old file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to remove file {file_path}: {e}")
+        result = upload_storage.sweep(max_age_days=max_age_days)
+        files_removed = result["expired_files"] + result["evicted_files"]
         
         return {
-            "message": f"Cleanup completed. Removed {files_removed} files older than {max_age_days} days.",
+            "message": (
+                f"Cleanup completed. Removed {result['expired_files']} files older than {max_age_days} days "
+                f"and evicted {result['evicted_files']} files over quota."
+            ),
             "files_removed": files_removed,
+            "usage": result,
             "status": "success"
         }
         
@@ -207,4 +199,4 @@ def cleanup_old_files(max_age_days: int = 7) -> Dict[str, Any]:
         return {
             "error": str(e),
             "status": "error"
-        } 
\ No newline at end of file
+        }
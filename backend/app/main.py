@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,7 +6,12 @@ from fastapi.responses import HTMLResponse
 from datetime import datetime
 
 from .api.router import router as api_router
-from .core.dependencies import get_knowledge_base, get_rag_agent
+from .core import config
+from .core.dependencies import ROUTED_PROVIDERS, get_knowledge_base, get_rag_agent, tenant_registry
+from .core.llm_clients import llm_clients
+from .core.memory_manager import session_memory_manager
+from .core.model_router import get_model_router
+from .core.storage import upload_storage
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -13,8 +19,14 @@ async def lifespan(app: FastAPI):
     print("🚀 Initializing Enterprise RAG System...")
     get_knowledge_base()
     get_rag_agent()
+    sweeper = asyncio.create_task(upload_storage.run_sweeper(config.UPLOAD_SWEEP_INTERVAL_SECONDS))
     print("✅ Services initialized successfully!")
     yield
+    sweeper.cancel()
+    # Persist tenant knowledge bases that are still loaded
+    tenant_registry.unload_all()
+    await session_memory_manager.aclose()
+    await llm_clients.aclose()
 
 app = FastAPI(
     title="Enterprise RAG System",
@@ -1272,12 +1284,25 @@ async def get_dashboard():
     </html>
     """
 
+def _llm_circuits():
+    """Circuit state per routed model provider, or None when the router is not in use"""
+    if config.MODEL_PROVIDER not in ROUTED_PROVIDERS:
+        return None
+    try:
+        return {provider.name: provider.breaker.to_dict() for provider in get_model_router().providers}
+    except ValueError:
+        return None
+
 @app.get("/health/")
 async def health_check():
     """Health check endpoint"""
+    circuits = _llm_circuits()
+    # Still serving (retrieval-only answers), but no model is reachable
+    degraded = bool(circuits) and all(circuit["state"] == "open" for circuit in circuits.values())
     return {
-        "status": "healthy",
+        "status": "degraded" if degraded else "healthy",
         "timestamp": datetime.now().isoformat(),
         "knowledge_base_initialized": get_knowledge_base() is not None,
-        "rag_agent_initialized": get_rag_agent() is not None
+        "rag_agent_initialized": get_rag_agent() is not None,
+        "llm_circuits": circuits
     }
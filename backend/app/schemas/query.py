@@ -5,9 +5,12 @@ class QueryRequest(BaseModel):
     question: str = Field(..., description="User's question")
     session_id: Optional[str] = Field(None, description="Session ID for conversation continuity")
     user_id: Optional[str] = Field(None, description="User ID for memory persistence")
-    use_advanced_reasoning: Optional[bool] = Field(False, description="Enable advanced reasoning")
+    use_advanced_reasoning: Optional[bool] = Field(False, description="Hint that the question needs the research team")
+    route: Optional[str] = Field(None, pattern=r"^(auto|rag|research)$", description="Force the RAG agent or the research team; auto (default) lets the query router decide")
     use_memory: Optional[bool] = Field(True, description="Enable session memory for context")
-    max_history_messages: Optional[int] = Field(5, description="Maximum number of history messages to include")
+    max_history_messages: int = Field(5, ge=0, description="Maximum number of history messages to include")
+    tenant_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$", description="Tenant whose knowledge base to query (overrides the X-Tenant-ID header)")
+    filters: Optional[Dict[str, Any]] = Field(None, description="Metadata filter expression applied before retrieval scoring")
 
 class QueryResponse(BaseModel):
     """Response from the query endpoint"""
@@ -19,8 +22,18 @@ class QueryResponse(BaseModel):
     memory_updated: bool = Field(False, description="Whether memory was updated")
     memory_count: int = Field(0, description="Number of memories stored for this user")
     tokens_used: Optional[int] = Field(None, description="Number of tokens used")
+    prompt_tokens: Optional[int] = Field(None, description="Tokens in the prompt sent to the model")
+    completion_tokens: Optional[int] = Field(None, description="Tokens in the generated answer")
+    compression_tokens_saved: Optional[int] = Field(None, description="Context tokens removed by prompt compression")
     model_used: Optional[str] = Field(None, description="Model used for generation")
+    route: Optional[str] = Field(None, description="Agent that answered: rag or research")
+    timings: Optional[Dict[str, float]] = Field(None, description="Per-stage latency in milliseconds")
     
+class BatchQueryRequest(BaseModel):
+    """Many queries answered in one call"""
+    queries: List[QueryRequest] = Field(..., min_length=1, description="Queries to answer")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Queries answered at once (capped by BATCH_QUERY_CONCURRENCY)")
+
 class MemoryInfo(BaseModel):
     """Memory information for responses"""
     memory_id: str = Field(..., description="Memory ID")
@@ -41,4 +41,6 @@ class SessionMemoryRequest(BaseModel):
     action: str = Field(..., description="Action: 'get', 'clear', 'add', 'delete'")
     memory_content: Optional[str] = Field(None, description="Memory content for add action")
     memory_id: Optional[str] = Field(None, description="Memory ID for delete action")
-    topics: Optional[List[str]] = Field(None, description="Topics for new memory") 
\ No newline at end of file
+    topics: Optional[List[str]] = Field(None, description="Topics for new memory")
+    limit: int = Field(20, ge=1, description="Page size for get action")
+    cursor: Optional[str] = Field(None, description="Cursor from the previous page for get action") 
\ No newline at end of file
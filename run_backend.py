@@ -58,6 +58,25 @@ def run_server(host="0.0.0.0", port=8000, reload=True):
         access_log=True
     )
 
+def run_fake_llm(host="0.0.0.0", port=None):
+    """Run the OpenAI-compatible fake LLM server for load tests"""
+    import uvicorn
+    from app.core import config
+
+    port = port or config.FAKE_LLM_PORT
+    print("🧪 Starting fake LLM server...")
+    print(f"📍 OpenAI-compatible API at: http://localhost:{port}/v1")
+    print("=" * 60)
+
+    uvicorn.run(
+        "app.core.fake_server:create_fake_llm_app",
+        factory=True,
+        host=host,
+        port=port,
+        log_level="info",
+        access_log=False
+    )
+
 async def run_cli():
     """Run the CLI interface"""
     from app.cli import run_cli
@@ -129,6 +148,7 @@ Examples:
   python run_backend.py --cli              # Run CLI interface
   python run_backend.py --host 0.0.0.0 --port 8080  # Custom host/port
   python run_backend.py --no-reload        # Disable auto-reload
+  python run_backend.py --fake-llm         # Run the fake LLM server for load tests
         """
     )
     
@@ -142,11 +162,16 @@ Examples:
         default="0.0.0.0", 
         help="Host to bind the server to (default: 0.0.0.0)"
     )
+    parser.add_argument(
+        "--fake-llm",
+        action="store_true",
+        help="Run the OpenAI-compatible fake LLM server instead of the backend"
+    )
     parser.add_argument(
         "--port", 
         type=int, 
-        default=8000, 
-        help="Port to bind the server to (default: 8000)"
+        default=None, 
+        help="Port to bind the server to (default: 8000, or FAKE_LLM_PORT with --fake-llm)"
     )
     parser.add_argument(
         "--no-reload", 
@@ -163,6 +188,10 @@ Examples:
     
     # Load environment variables
     load_environment()
+
+    if args.fake_llm:
+        run_fake_llm(host=args.host, port=args.port)
+        return
     
     # Check requirements
     print("🔍 Checking requirements...")
@@ -197,7 +226,7 @@ Examples:
     else:
         # Run server mode
         reload = not args.no_reload
-        run_server(host=args.host, port=args.port, reload=reload)
+        run_server(host=args.host, port=args.port or 8000, reload=reload)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,18 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(autouse=True, scope="session")
+def completion_cache_in_tmp(tmp_path_factory):
+    """Keep the on-disk completion cache out of the source tree"""
+    path = tmp_path_factory.mktemp("completion_cache") / "completion_cache.db"
+    # Config modules imported during collection are patched; later imports read the env
+    os.environ["COMPLETION_CACHE_PATH"] = str(path)
+    for name in ("app.core.config", "backend.app.core.config"):
+        module = sys.modules.get(name)
+        if module is not None:
+            module.COMPLETION_CACHE_PATH = Path(path)
+    yield path
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import pytest
+import sys
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core import dependencies
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.core.completion_cache import CachedAsyncTransport, CompletionCache, cache_sampled_completions
+from app.core.fake_llm import FakeChatClient
+from app.core.llm_scheduler import SchedulerBusyError
+from app.core.model_router import ChatProvider, ModelRouter, NoProviderAvailableError
+
+MESSAGES = [{"role": "user", "content": "What is the vacation policy?"}]
+
+
+class TestCircuitBreaker:
+    """Test opening, short-circuiting and recovery"""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("p", failure_threshold=3, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.allow() is False
+        assert breaker.to_dict()["short_circuited"] == 1
+
+    def test_trial_call_without_probe(self):
+        breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        assert breaker.allow() is True
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is False
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.allow() is True
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    def test_abandoned_trial_call_is_retried(self):
+        breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=0.05, probe_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.05)
+
+        # The trial call is let through but never reports back (e.g. cancelled)
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+        time.sleep(0.05)
+
+        assert breaker.allow() is True
+        assert breaker.state == HALF_OPEN
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_background_probe_closes_circuit(self):
+        attempts = []
+
+        async def probe():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise ConnectionError("still down")
+
+        breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=0.01, probe=probe)
+        breaker.record_failure()
+        # Requests are refused while the probe owns recovery
+        assert breaker.allow() is False
+
+        for _ in range(100):
+            if breaker.state == CLOSED:
+                break
+            await asyncio.sleep(0.01)
+        assert breaker.state == CLOSED
+        assert len(attempts) == 2
+        assert breaker.allow() is True
+
+
+    @pytest.mark.asyncio
+    async def test_probe_bypasses_completion_cache(self, tmp_path):
+        import httpx
+        from openai import AsyncOpenAI
+
+        up = [True]
+        probes = []
+
+        def provider(request):
+            if json.loads(request.content)["messages"][0]["content"] == "ping":
+                probes.append(up[0])
+            if not up[0]:
+                return httpx.Response(503, json={})
+            return httpx.Response(200, json={
+                "id": "x", "object": "chat.completion", "created": 0, "model": "m",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "pong"}}],
+            })
+
+        cache = CompletionCache(tmp_path / "completions.db", max_bytes=1024 * 1024)
+        http_client = httpx.AsyncClient(transport=CachedAsyncTransport(httpx.MockTransport(provider), cache))
+        client = AsyncOpenAI(api_key="k", base_url="http://provider/v1", http_client=http_client, max_retries=0)
+        chat = ChatProvider("p", client, "m")
+        chat.breaker.failure_threshold = 1
+        chat.breaker.reset_timeout = 0.01
+
+        with cache_sampled_completions():
+            # A ping answered while the provider was up is now in the cache
+            await client.chat.completions.create(model="m", messages=[{"role": "user", "content": "ping"}], max_tokens=1)
+            assert cache.stats()["entries"] == 1
+            up[0] = False
+            # The failure that opens the circuit happens inside the opt-in
+            chat.record(0.1, ok=False)
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+
+        assert len(probes) > 1 and not any(probes[1:])
+        assert chat.breaker.state != CLOSED
+        chat.breaker._probe_task.cancel()
+        await http_client.aclose()
+        cache.close()
+
+
+class TestRouterShortCircuit:
+    @pytest.mark.asyncio
+    async def test_open_provider_is_skipped(self):
+        down = ChatProvider("down", FakeChatClient(error_rate=1.0), "m")
+        up = ChatProvider("up", FakeChatClient(), "m")
+        down.breaker.failure_threshold = 1
+        router = ModelRouter([down, up])
+
+        await router.complete(MESSAGES)
+        calls = down.client.calls
+        await router.complete(MESSAGES)
+
+        assert down.breaker.state == OPEN
+        assert down.client.calls == calls
+        assert router.stats()["providers"]["down"]["circuit"]["state"] == OPEN
+
+    @pytest.mark.asyncio
+    async def test_all_open_fails_fast(self):
+        provider = ChatProvider("down", FakeChatClient(error_rate=1.0), "m")
+        provider.breaker.failure_threshold = 1
+        router = ModelRouter([provider])
+
+        with pytest.raises(NoProviderAvailableError):
+            await router.complete(MESSAGES)
+        with pytest.raises(NoProviderAvailableError, match="circuits are open"):
+            await router.complete(MESSAGES)
+        assert provider.client.calls == 1
+        assert router.metrics["short_circuited"] == 1
+
+    @pytest.mark.asyncio
+    async def test_local_back_pressure_does_not_trip_breaker(self):
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(side_effect=SchedulerBusyError("queue full"))
+        provider = ChatProvider("busy", client, "m")
+        provider.breaker.failure_threshold = 1
+
+        for _ in range(3):
+            with pytest.raises(SchedulerBusyError):
+                await provider.complete(MESSAGES)
+
+        assert provider.breaker.state == CLOSED
+        assert provider.stats.count == 0
+
+    @pytest.mark.asyncio
+    async def test_agent_falls_back_to_prefetched_results(self, monkeypatch):
+        provider = ChatProvider("down", FakeChatClient(error_rate=1.0), "m")
+        provider.breaker.failure_threshold = 1
+        provider.breaker.record_failure()
+        monkeypatch.setattr(dependencies, "get_model_router", lambda: ModelRouter([provider]))
+        knowledge_base = MagicMock()
+        agent = dependencies.LMStudioAgent("agent", knowledge_base)
+
+        answer = await agent.arun("vacation?", search_results=[{"content": "15 days of vacation"}])
+
+        assert "15 days of vacation" in answer
+        assert provider.client.calls == 0
+        knowledge_base.search.assert_not_called()
@@ -0,0 +1,99 @@
+import pytest
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.coalescing import SingleFlight, query_key
+
+
+class TestQueryKey:
+    """Test coalescing keys"""
+
+    def test_normalizes_question(self):
+        assert query_key("What is  the Policy?", "rag", None, 1) == query_key("what is the policy?", "rag", None, 1)
+
+    def test_distinguishes_agent_version_and_filters(self):
+        base = query_key("q", "rag", None, 1)
+        assert base != query_key("q", "research", None, 1)
+        assert base != query_key("q", "rag", None, 2)
+        assert base != query_key("q", "rag", "acme", 1)
+        assert base != query_key("q", "rag", None, 1, {"category": "hr"})
+
+
+class TestSingleFlight:
+    """Test single-flight request coalescing"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_run(self):
+        flights = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do("key", compute) for _ in range(5)))
+
+        assert results == ["answer"] * 5
+        assert calls == 1
+        assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 4}
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self):
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_stream_fans_out_to_late_subscribers(self):
+        flights = SingleFlight()
+        runs = 0
+
+        async def tokens():
+            nonlocal runs
+            runs += 1
+            for token in ["a", "b", "c"]:
+                await asyncio.sleep(0.01)
+                yield token
+
+        async def consume(delay):
+            await asyncio.sleep(delay)
+            return [token async for token in flights.stream("key", tokens)]
+
+        results = await asyncio.gather(consume(0), consume(0.015))
+
+        assert results == [["a", "b", "c"], ["a", "b", "c"]]
+        assert runs == 1
+
+    @pytest.mark.asyncio
+    async def test_caller_after_abandoned_stream_starts_fresh(self):
+        flights = SingleFlight()
+        runs = 0
+
+        async def tokens():
+            nonlocal runs
+            runs += 1
+            for token in ["a", "b", "c"]:
+                await asyncio.sleep(0.01)
+                yield token
+
+        abandoned = flights.stream("key", tokens)
+        assert await abandoned.__anext__() == "a"
+        await abandoned.aclose()
+        # Joins inside the cancellation window, before the producer has unwound
+        result = [token async for token in flights.stream("key", tokens)]
+
+        assert result == ["a", "b", "c"]
+        assert runs == 2
+        assert flights.stats()["in_flight"] == 0
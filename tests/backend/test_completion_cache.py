@@ -0,0 +1,147 @@
+import json
+import pytest
+import sys
+from pathlib import Path
+
+import httpx
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core import config
+from app.core.completion_cache import (
+    CachedAsyncTransport, CachedTransport, CompletionCache, bypass_completion_cache, cache_sampled_completions,
+    completion_cache_key, is_cacheable
+)
+
+URL = "http://llm.test/v1/chat/completions"
+
+
+def payload(**overrides):
+    body = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+    body.update(overrides)
+    return body
+
+
+class Upstream:
+    """Mock provider that counts the requests reaching it"""
+
+    def __init__(self, status_code=200):
+        self.calls = 0
+        self.status_code = status_code
+
+    def __call__(self, request):
+        self.calls += 1
+        return httpx.Response(self.status_code, json={"id": f"cmpl-{self.calls}", "choices": []})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CompletionCache(tmp_path / "completions.db", max_bytes=1024 * 1024)
+    yield cache
+    cache.close()
+
+
+class TestCacheKey:
+    def test_key_is_stable_and_ignores_irrelevant_fields(self):
+        assert completion_cache_key(payload()) == completion_cache_key(payload(user="a", stream=False))
+
+    def test_key_depends_on_model_messages_and_params(self):
+        base = completion_cache_key(payload())
+        assert completion_cache_key(payload(model="other")) != base
+        assert completion_cache_key(payload(messages=[{"role": "user", "content": "bye"}])) != base
+        assert completion_cache_key(payload(max_tokens=10)) != base
+
+    def test_sampled_and_streaming_requests_bypass(self):
+        assert is_cacheable(payload())
+        assert not is_cacheable(payload(temperature=0.7))
+        assert not is_cacheable({"model": "m", "messages": []})
+        assert not is_cacheable(payload(stream=True))
+        assert not is_cacheable(payload(n=2))
+
+    def test_bypass_overrides_opt_in(self):
+        with cache_sampled_completions(), bypass_completion_cache():
+            assert not is_cacheable(payload())
+        assert is_cacheable(payload())
+
+    def test_sampled_requests_cached_when_opted_in(self, monkeypatch):
+        with cache_sampled_completions():
+            assert is_cacheable(payload(temperature=0.7))
+        assert not is_cacheable(payload(temperature=0.7))
+
+        monkeypatch.setattr(config, "COMPLETION_CACHE_SAMPLED", True)
+        assert is_cacheable(payload(temperature=0.7))
+
+
+class TestCompletionCache:
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "completions.db"
+        first = CompletionCache(path, max_bytes=1024)
+        first.put("k", "m", b"body")
+        first.close()
+
+        second = CompletionCache(path, max_bytes=1024)
+        assert second.get("k") == b"body"
+        second.close()
+
+    def test_evicts_least_recently_used_over_budget(self, tmp_path):
+        cache = CompletionCache(tmp_path / "completions.db", max_bytes=250)
+        cache.put("a", "m", b"x" * 100)
+        cache.put("b", "m", b"x" * 100)
+        cache.get("a")
+        cache.put("c", "m", b"x" * 100)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] <= 250
+        cache.close()
+
+
+class TestCachedTransport:
+    @pytest.mark.asyncio
+    async def test_async_hit_skips_provider(self, cache):
+        upstream = Upstream()
+        client = httpx.AsyncClient(transport=CachedAsyncTransport(httpx.MockTransport(upstream), cache))
+
+        first = await client.post(URL, json=payload())
+        second = await client.post(URL, json=payload())
+
+        assert upstream.calls == 1
+        assert first.json() == second.json()
+        assert second.headers["x-completion-cache"] == "hit"
+        assert cache.stats()["hits"] == 1
+        await client.aclose()
+
+    def test_sync_sampled_requests_reach_provider(self, cache):
+        upstream = Upstream()
+        client = httpx.Client(transport=CachedTransport(httpx.MockTransport(upstream), cache))
+
+        client.post(URL, json=payload(temperature=0.9))
+        client.post(URL, json=payload(temperature=0.9))
+
+        assert upstream.calls == 2
+        assert cache.stats()["bypassed"] == 2
+        client.close()
+
+    def test_errors_are_not_cached(self, cache):
+        upstream = Upstream(status_code=500)
+        client = httpx.Client(transport=CachedTransport(httpx.MockTransport(upstream), cache))
+
+        client.post(URL, json=payload())
+        client.post(URL, json=payload())
+
+        assert upstream.calls == 2
+        assert cache.stats()["entries"] == 0
+        client.close()
+
+    def test_other_endpoints_pass_through(self, cache):
+        upstream = Upstream()
+        client = httpx.Client(transport=CachedTransport(httpx.MockTransport(upstream), cache))
+
+        client.post("http://llm.test/v1/embeddings", content=json.dumps({"input": "hi"}))
+        client.post("http://llm.test/v1/embeddings", content=json.dumps({"input": "hi"}))
+
+        assert upstream.calls == 2
+        client.close()
@@ -0,0 +1,63 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core import metrics
+from app.core.context_packer import pack_context, split_passages
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Use the byte-length token estimate so counts do not depend on tiktoken downloads"""
+    monkeypatch.setattr(metrics, "_encoding", lambda model: None)
+
+
+class TestContextPacker:
+    """Test token-budgeted MMR context assembly"""
+
+    def test_split_passages_respects_limit(self):
+        text = "\n\n".join(f"paragraph {i} " + "word " * 10 for i in range(6))
+
+        passages = split_passages(text, max_tokens=30)
+
+        assert len(passages) > 1
+        assert all(metrics.count_tokens(p) <= 30 for p in passages)
+        assert "paragraph 0" in passages[0]
+
+    def test_budget_is_respected(self):
+        results = [
+            {"id": f"doc_{i}", "content": f"vacation policy section {i} " + "detail " * 20, "score": 1.0}
+            for i in range(5)
+        ]
+
+        packed = pack_context("vacation policy", results, token_budget=80, passage_tokens=60)
+
+        assert packed
+        assert sum(p["tokens"] for p in packed) <= 80
+
+    def test_duplicates_are_dropped(self):
+        content = "Employees get fifteen days of annual leave."
+        results = [
+            {"id": "doc_1", "content": content, "score": 2.0},
+            {"id": "doc_2", "content": content + " ", "score": 1.9},
+            {"id": "doc_3", "content": "Remote work requires manager approval.", "score": 1.0},
+        ]
+
+        packed = pack_context("annual leave", results, token_budget=500)
+
+        assert [p["id"] for p in packed] == ["doc_1", "doc_3"]
+
+    def test_mmr_prefers_diverse_passages(self):
+        results = [
+            {"id": "a", "content": "leave policy annual leave days carry over", "score": 3.0},
+            {"id": "b", "content": "leave policy annual leave days carry over rules", "score": 2.9},
+            {"id": "c", "content": "leave requests are approved by the team lead", "score": 2.0},
+        ]
+
+        packed = pack_context("leave policy", results, token_budget=30, mmr_lambda=0.5)
+
+        assert [p["id"] for p in packed][:2] == ["a", "c"]
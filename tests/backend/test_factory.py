@@ -0,0 +1,52 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.agents import factory
+from app.core import config
+
+
+@pytest.fixture(autouse=True)
+def lm_studio(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "MODEL_PROVIDER", "lm-studio")
+    monkeypatch.setattr(config, "CUSTOM_MODEL_NAME", "local-model")
+    monkeypatch.setattr(config, "DB_FILE", tmp_path / "rag.db")
+    factory.clear_instance_cache()
+    yield
+    factory.clear_instance_cache()
+
+
+class TestInstanceCache:
+    """Test that agents share models, embedders and memory databases"""
+
+    def test_model_is_shared(self):
+        assert factory.get_model() is factory.get_model()
+
+    def test_model_rebuilt_when_settings_change(self, monkeypatch):
+        first = factory.get_model()
+        monkeypatch.setattr(config, "CUSTOM_MODEL_NAME", "other-model")
+        second = factory.get_model()
+
+        assert second is not first
+        assert second.id == "other-model"
+
+    def test_embedder_is_shared(self):
+        assert factory.get_embedder() is factory.get_embedder()
+
+    def test_memory_db_is_shared(self):
+        if not factory.AGNO_MEMORY_AVAILABLE:
+            pytest.skip("agno memory is not installed")
+        assert factory.create_memory_db() is factory.create_memory_db()
+
+    def test_configuration_errors_are_not_cached(self, monkeypatch):
+        monkeypatch.setattr(config, "MODEL_PROVIDER", "vllm")
+        monkeypatch.setattr(config, "CUSTOM_API_BASE_URL", None)
+        with pytest.raises(ValueError):
+            factory.get_model()
+
+        monkeypatch.setattr(config, "CUSTOM_API_BASE_URL", "http://localhost:8000/v1")
+        assert factory.get_model().id == "local-model"
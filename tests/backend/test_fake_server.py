@@ -0,0 +1,95 @@
+import pytest
+import sys
+from pathlib import Path
+
+import httpx
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI, RateLimitError
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.document_index import hash_embedding
+from app.core.fake_llm import parse_latency
+from app.core.fake_server import create_fake_llm_app
+
+MESSAGES = [{"role": "user", "content": "What is the vacation policy?"}]
+
+
+def sdk_client(app) -> AsyncOpenAI:
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake")
+    return AsyncOpenAI(api_key="not-needed", base_url="http://fake/v1", http_client=http_client, max_retries=0)
+
+
+class TestFakeHelpers:
+    def test_latency_specs(self):
+        assert parse_latency("0.25")() == 0.25
+        assert 0.1 <= parse_latency("uniform:0.1,0.2")() <= 0.2
+        assert parse_latency("normal:0.1,0.05")() >= 0.0
+        assert parse_latency("lognormal:0.1,0.5")() > 0.0
+        assert parse_latency("exponential:0.1")() >= 0.0
+        with pytest.raises(ValueError):
+            parse_latency("gamma:1,2")
+
+    def test_hash_embeddings_are_deterministic_unit_vectors(self):
+        vector = hash_embedding("vacation policy", 64)
+        assert vector == hash_embedding("vacation policy", 64)
+        assert len(vector) == 64
+        assert sum(v * v for v in vector) == pytest.approx(1.0)
+
+        similar = sum(a * b for a, b in zip(vector, hash_embedding("vacation policy update", 64)))
+        unrelated = sum(a * b for a, b in zip(vector, hash_embedding("server outage report", 64)))
+        assert similar > unrelated
+
+
+class TestFakeServer:
+    @pytest.mark.asyncio
+    async def test_chat_completion_through_sdk(self):
+        client = sdk_client(create_fake_llm_app(latency="0", completion_tokens=12, seed=1))
+
+        response = await client.chat.completions.create(model="m", messages=MESSAGES, max_tokens=5)
+
+        assert len(response.choices[0].message.content.split()) == 5
+        assert response.choices[0].finish_reason == "length"
+        assert response.usage.completion_tokens == 5
+
+    @pytest.mark.asyncio
+    async def test_streaming_through_sdk(self):
+        client = sdk_client(create_fake_llm_app(latency="0", seed=1))
+
+        plain = await client.chat.completions.create(model="m", messages=MESSAGES)
+        stream = await client.chat.completions.create(
+            model="m", messages=MESSAGES, stream=True, stream_options={"include_usage": True}
+        )
+        chunks = [chunk async for chunk in stream]
+
+        text = "".join(chunk.choices[0].delta.content or "" for chunk in chunks if chunk.choices)
+        assert text == plain.choices[0].message.content
+        assert chunks[-1].usage.completion_tokens == len(text.split())
+
+    @pytest.mark.asyncio
+    async def test_embeddings_through_sdk(self):
+        client = sdk_client(create_fake_llm_app(latency="0", embedding_dimensions=32))
+
+        # The SDK asks for base64 unless a format is given
+        response = await client.embeddings.create(model="e", input=["vacation policy", "outage"])
+
+        assert [item.index for item in response.data] == [0, 1]
+        assert response.data[0].embedding == pytest.approx(hash_embedding("vacation policy", 32), abs=1e-6)
+
+    @pytest.mark.asyncio
+    async def test_injected_rate_limits(self):
+        client = sdk_client(create_fake_llm_app(latency="0", rate_limit_rate=1.0))
+
+        with pytest.raises(RateLimitError):
+            await client.chat.completions.create(model="m", messages=MESSAGES)
+
+    def test_injected_errors_are_counted(self):
+        client = TestClient(create_fake_llm_app(latency="0", error_rate=1.0))
+
+        response = client.post("/v1/chat/completions", json={"model": "m", "messages": MESSAGES})
+
+        assert response.status_code == 500
+        assert response.json()["error"]["type"] == "server_error"
+        assert client.get("/health").json()["stats"]["errors"] == 1
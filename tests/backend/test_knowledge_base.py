@@ -0,0 +1,248 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.dependencies import SimpleKnowledgeBase
+
+
+@pytest.fixture
+def knowledge_base():
+    """Knowledge base with a few documents"""
+    kb = SimpleKnowledgeBase()
+    kb.add_document("휴가 정책: 연차는 15일입니다", {"filename": "policy_v1.md", "type": ".md"})
+    kb.add_document("출장 규정: 교통비는 실비 정산합니다", {"filename": "travel.md", "type": ".md"})
+    kb.add_document("Remote work policy for engineers", {"url": "https://example.com", "type": "web_content"})
+    return kb
+
+
+class TestDocumentLifecycle:
+    """Test document IDs, tombstones and compaction"""
+
+    def test_add_returns_stable_unique_ids(self, knowledge_base):
+        """Test that every document gets its own ID"""
+        ids = {doc["id"] for doc in knowledge_base.documents}
+        assert len(ids) == 3
+        for document_id in ids:
+            assert knowledge_base.get_document(document_id)["id"] == document_id
+
+    def test_search_ranks_matching_documents(self, knowledge_base):
+        """Test term-based search"""
+        results = knowledge_base.search("휴가 정책")
+        assert results
+        assert results[0]["metadata"]["filename"] == "policy_v1.md"
+
+    def test_delete_hides_document_from_search(self, knowledge_base):
+        """Test that deleted documents disappear without an index rebuild"""
+        document_id = knowledge_base.search("휴가")[0]["id"]
+
+        assert knowledge_base.delete_document(document_id) is True
+        assert knowledge_base.get_document(document_id) is None
+        assert knowledge_base.search("휴가") == []
+        assert knowledge_base.index.stats()["tombstones"] == 1
+        assert knowledge_base.delete_document(document_id) is False
+
+    def test_replace_keeps_id(self, knowledge_base):
+        """Test replacing a document with a new version"""
+        document_id = knowledge_base.search("휴가")[0]["id"]
+
+        knowledge_base.replace_document(document_id, "휴가 정책: 연차는 20일입니다", {"filename": "policy_v2.md"})
+
+        results = knowledge_base.search("연차")
+        assert len(results) == 1
+        assert results[0]["id"] == document_id
+        assert "20일" in results[0]["content"]
+
+    def test_replace_missing_document(self, knowledge_base):
+        """Test replacing an unknown document"""
+        with pytest.raises(KeyError):
+            knowledge_base.replace_document("doc_missing", "content")
+
+    def test_compact_reclaims_tombstones(self, knowledge_base):
+        """Test that compaction reclaims deleted slots and keeps search working"""
+        for result in knowledge_base.search("정책 규정"):
+            knowledge_base.delete_document(result["id"])
+        assert knowledge_base.needs_compaction()
+
+        result = knowledge_base.compact()
+
+        assert result["live_documents"] == len(knowledge_base.documents)
+        assert knowledge_base.index.stats()["tombstones"] == 0
+        remaining = knowledge_base.documents[0]
+        assert knowledge_base.get_document(remaining["id"]) == remaining
+        assert knowledge_base.search("engineers")[0]["id"] == remaining["id"]
+
+
+    def test_search_during_compact_and_restore(self):
+        """Test that unlocked searches never mix old and new slot numbers"""
+        import threading
+
+        kb = SimpleKnowledgeBase()
+        for i in range(200):
+            kb.add_document(f"policy document {i} marker{i}", {"n": i}, document_id=f"doc{i}")
+        errors = []
+        stop = threading.Event()
+
+        def search():
+            while not stop.is_set():
+                try:
+                    for result in kb.search("policy document", limit=20, filters={"n": {"$gte": 0}}):
+                        assert result["content"].endswith(f"marker{result['id'][3:]}")
+                        assert kb.get_document(result["id"]) in (None, {k: result[k] for k in ("id", "content", "metadata")})
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        readers = [threading.Thread(target=search) for _ in range(4)]
+        # Switch threads often so readers land inside the swap window
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for reader in readers:
+                reader.start()
+            for round_ in range(30):
+                for i in range(round_ % 3, 200, 3):
+                    kb.replace_document(f"doc{i}", f"policy document {i} marker{i}", {"n": i})
+                kb.compact()
+                kb.restore(*_snapshot_state(kb))
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+            sys.setswitchinterval(interval)
+
+        assert errors == []
+        assert len(kb.documents) == 200
+
+
+def _snapshot_state(kb):
+    documents, postings, doc_lengths = kb.export_state()
+    grouped = {}
+    for term, slot, tf in postings:
+        grouped.setdefault(term, {})[slot] = tf
+    return documents, grouped, dict(enumerate(doc_lengths))
+
+
+class TestMetadataFilters:
+    """Test metadata filter pushdown"""
+
+    def test_equality_filter(self, knowledge_base):
+        """Test filtering by a single metadata value"""
+        results = knowledge_base.search("정책 policy", filters={"type": "web_content"})
+        assert [r["metadata"]["type"] for r in results] == ["web_content"]
+
+    def test_in_and_or_filters(self, knowledge_base):
+        """Test list, $in and $or clauses"""
+        assert len(knowledge_base.search("정책 규정", filters={"filename": ["policy_v1.md", "travel.md"]})) == 2
+        assert len(knowledge_base.search("정책 규정", filters={"filename": {"$in": ["travel.md"]}})) == 1
+        results = knowledge_base.search("정책 policy", filters={"$or": [{"filename": "policy_v1.md"}, {"type": "web_content"}]})
+        assert len(results) == 2
+
+    def test_not_and_range_filters(self, knowledge_base):
+        """Test $not, $ne and range operators"""
+        results = knowledge_base.search("정책 policy", filters={"$not": {"type": "web_content"}})
+        assert [r["metadata"]["filename"] for r in results] == ["policy_v1.md"]
+        assert len(knowledge_base.search("정책 policy", filters={"type": {"$ne": ".md"}})) == 1
+        assert len(knowledge_base.search("정책 규정", filters={"filename": {"$gte": "q"}})) == 1
+
+    def test_document_id_filter(self, knowledge_base):
+        """Test restricting retrieval to one document"""
+        target = knowledge_base.search("출장")[0]["id"]
+        results = knowledge_base.search("정책 규정 policy", filters={"document_id": target})
+        assert [r["id"] for r in results] == [target]
+
+    def test_filter_skips_deleted_documents(self, knowledge_base):
+        """Test that filters never resurrect tombstoned documents"""
+        target = knowledge_base.search("출장")[0]["id"]
+        knowledge_base.delete_document(target)
+        assert knowledge_base.search("출장", filters={"document_id": target}) == []
+
+    def test_unknown_operator(self, knowledge_base):
+        """Test that malformed filters are rejected"""
+        from app.core.document_index import FilterExpressionError
+        with pytest.raises(FilterExpressionError):
+            knowledge_base.search("정책", filters={"type": {"$regex": ".*"}})
+
+
+class TestTenantRegistry:
+    """Test tenant partitions with LRU unloading"""
+
+    def test_lazy_load_and_lru_unload(self):
+        """Test that idle tenants are unloaded and reloaded on demand"""
+        from app.core.tenants import TenantRegistry
+
+        saved = {}
+
+        def loader(tenant_id):
+            kb = SimpleKnowledgeBase()
+            for doc in saved.get(tenant_id, []):
+                kb.add_document(doc["content"], doc["metadata"], document_id=doc["id"])
+            return kb
+
+        registry = TenantRegistry(loader, lambda tenant_id, kb: saved.__setitem__(tenant_id, kb.documents), max_loaded=1)
+        registry.get("hr").knowledge_base.add_document("휴가 정책", {"filename": "hr.md"})
+        registry.get("sales").knowledge_base.add_document("영업 목표", {"filename": "sales.md"})
+
+        assert not registry.is_loaded("hr")
+        assert registry.get("hr").knowledge_base.search("휴가")[0]["metadata"]["filename"] == "hr.md"
+        stats = {entry["tenant_id"]: entry for entry in registry.stats()}
+        assert stats["hr"]["loads"] == 2
+        assert stats["sales"]["unloads"] == 1
+
+    def test_unloaded_knowledge_base_refuses_late_writes(self, monkeypatch, tmp_path):
+        """Test that a request holding an evicted tenant's knowledge base cannot lose a write"""
+        from app.core import dependencies
+
+        monkeypatch.setattr(dependencies, "_tenant_data_file", lambda tenant_id: tmp_path / f"{tenant_id}.jsonl")
+        kb = SimpleKnowledgeBase()
+        kb.add_document("휴가 정책", {"filename": "hr.md"})
+
+        dependencies._unload_tenant_knowledge_base("hr", kb)
+
+        with pytest.raises(dependencies.KnowledgeBaseClosedError):
+            kb.add_document("늦은 업로드", {"filename": "late.md"})
+        with pytest.raises(dependencies.KnowledgeBaseClosedError):
+            kb.delete_document(kb.documents[0]["id"])
+        assert kb.search("휴가")[0]["metadata"]["filename"] == "hr.md"
+        reloaded = SimpleKnowledgeBase()
+        reloaded.load(tmp_path / "hr.jsonl")
+        assert [doc["metadata"]["filename"] for doc in reloaded.documents] == ["hr.md"]
+
+    def test_invalid_tenant_id(self):
+        """Test that unsafe tenant IDs are rejected"""
+        from app.core.tenants import TenantRegistry, InvalidTenantError
+
+        registry = TenantRegistry(lambda tenant_id: SimpleKnowledgeBase())
+        with pytest.raises(InvalidTenantError):
+            registry.get("../etc")
+
+
+class TestSnapshots:
+    """Test columnar snapshot export and import"""
+
+    def test_snapshot_round_trip(self, knowledge_base, tmp_path):
+        """Test that an imported snapshot serves the same results"""
+        from app.core.snapshot import export_snapshot, import_snapshot
+
+        knowledge_base.delete_document(knowledge_base.search("출장")[0]["id"])
+        manifest = export_snapshot(knowledge_base, tmp_path / "snap")
+        assert manifest["documents"] == 2
+
+        replica = SimpleKnowledgeBase()
+        result = import_snapshot(replica, tmp_path / "snap")
+
+        assert result["documents"] == 2
+        assert [d["id"] for d in replica.documents] == [d["id"] for d in knowledge_base.documents]
+        assert replica.search("휴가 정책") == knowledge_base.search("휴가 정책")
+        assert replica.search("engineers", filters={"type": "web_content"})
+        assert replica.search("출장") == []
+
+    def test_invalid_snapshot_name(self):
+        """Test that snapshot names cannot escape the snapshot directory"""
+        from app.core.snapshot import SnapshotError, snapshot_path
+
+        with pytest.raises(SnapshotError):
+            snapshot_path("../outside")
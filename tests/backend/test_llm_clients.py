@@ -0,0 +1,69 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core import config
+from app.core.llm_clients import ProviderClientRegistry
+
+
+@pytest.fixture
+def registry():
+    return ProviderClientRegistry()
+
+
+class TestProviderClientRegistry:
+    """Test shared LLM connection pools"""
+
+    @pytest.mark.asyncio
+    async def test_one_pool_per_base_url(self, registry):
+        first = registry.async_http_client("http://localhost:1234/v1")
+        second = registry.async_http_client("http://localhost:1234/v1/")
+        other = registry.async_http_client("http://localhost:8000/v1")
+
+        assert first is second
+        assert first is not other
+        assert registry.stats()["async_pools"] == ["http://localhost:1234/v1", "http://localhost:8000/v1"]
+        await registry.aclose()
+
+    @pytest.mark.asyncio
+    async def test_pool_uses_configured_limits(self, registry, monkeypatch):
+        monkeypatch.setattr(config, "LLM_POOL_MAX_CONNECTIONS", 7)
+        monkeypatch.setattr(config, "LLM_REQUEST_TIMEOUT_SECONDS", 12.0)
+        monkeypatch.setattr(config, "LLM_CONNECT_TIMEOUT_SECONDS", 3.0)
+        monkeypatch.setattr(config, "COMPLETION_CACHE_ENABLED", False)
+
+        client = registry.async_http_client("http://localhost:1234/v1")
+
+        assert client.timeout.read == 12.0
+        assert client.timeout.connect == 3.0
+        assert client._transport._transport._pool._max_connections == 7
+        await registry.aclose()
+
+    @pytest.mark.asyncio
+    async def test_openai_clients_share_the_pool(self, registry):
+        first = registry.openai_client("http://localhost:1234/v1")
+        second = registry.openai_client("http://localhost:1234/v1")
+
+        assert first is second
+        assert first._client is registry.async_http_client("http://localhost:1234/v1")
+        assert str(first.base_url).rstrip("/") == "http://localhost:1234/v1"
+        # 429s are retried by the scheduler, everything else by the SDK
+        assert first.max_retries > 0
+        await registry.aclose()
+
+    @pytest.mark.asyncio
+    async def test_closed_pools_are_recreated(self, registry):
+        client = registry.async_http_client()
+        openai_client = registry.openai_client()
+        sync_client = registry.http_client()
+
+        await registry.aclose()
+
+        assert client.is_closed and sync_client.is_closed
+        assert registry.async_http_client() is not client
+        assert registry.openai_client() is not openai_client
+        await registry.aclose()
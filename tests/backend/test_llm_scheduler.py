@@ -0,0 +1,252 @@
+import asyncio
+import json
+import pytest
+import sys
+import threading
+from pathlib import Path
+
+import httpx
+from agno.exceptions import ModelProviderError
+from openai import AsyncOpenAI, RateLimitError
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core import config
+from app.core.llm_scheduler import (
+    BACKGROUND, INTERACTIVE, LOCAL_RATE_LIMIT_HEADER, ProviderScheduler, ScheduledAsyncTransport,
+    ScheduledTransport, SchedulerBusyError, background_priority, estimate_request_tokens, is_local_rate_limit,
+    is_rate_limit_error, llm_priority, rate_limit_retry_after
+)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(config, "LLM_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(config, "LLM_BACKOFF_MAX_SECONDS", 0.02)
+    monkeypatch.setattr(config, "LLM_RATE_LIMIT_RETRIES", 3)
+
+
+def _chat_body(max_tokens=100):
+    return json.dumps({"model": "m", "messages": [{"role": "user", "content": "x" * 400}], "max_tokens": max_tokens}).encode()
+
+
+class TestProviderScheduler:
+    """Test token-bucket admission and priorities"""
+
+    def test_estimate_counts_prompt_and_max_tokens(self):
+        assert estimate_request_tokens(_chat_body(max_tokens=100)) > 200
+        assert estimate_request_tokens(_chat_body(max_tokens=0)) < estimate_request_tokens(_chat_body(max_tokens=100))
+        assert estimate_request_tokens(b"not json") == 2
+
+    def test_request_bucket_limits_admissions(self):
+        scheduler = ProviderScheduler("test", requests_per_minute=3, queue_timeout=0.05)
+        for _ in range(3):
+            scheduler.acquire(tokens=1)
+            scheduler.release()
+
+        with pytest.raises(SchedulerBusyError):
+            scheduler.acquire(tokens=1)
+        assert scheduler.stats()["queued"] == 0
+
+    def test_token_bucket_limits_admissions(self):
+        scheduler = ProviderScheduler("test", tokens_per_minute=1000, queue_timeout=0.05)
+        scheduler.acquire(tokens=900)
+
+        with pytest.raises(SchedulerBusyError):
+            scheduler.acquire(tokens=200)
+
+    def test_queue_is_bounded(self):
+        scheduler = ProviderScheduler("test", max_concurrency=1, max_queue=1, queue_timeout=1)
+        scheduler.acquire(tokens=1)
+        waiter = threading.Thread(target=scheduler.acquire, args=(1,))
+        waiter.start()
+        while scheduler.stats()["queued"] == 0:
+            pass
+
+        with pytest.raises(SchedulerBusyError):
+            scheduler.acquire(tokens=1)
+        scheduler.release()
+        waiter.join()
+
+    @pytest.mark.asyncio
+    async def test_interactive_calls_go_first(self):
+        scheduler = ProviderScheduler("test", max_concurrency=1)
+        await scheduler.aacquire(tokens=1)
+        order = []
+
+        async def call(name, priority):
+            await scheduler.aacquire(tokens=1, priority=priority)
+            order.append(name)
+            scheduler.release()
+
+        background = asyncio.create_task(call("background", BACKGROUND))
+        await asyncio.sleep(0.02)
+        interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+        await asyncio.sleep(0.02)
+        scheduler.release()
+        await asyncio.gather(background, interactive)
+
+        assert order == ["interactive", "background"]
+
+    @pytest.mark.asyncio
+    async def test_queued_callers_wait_without_polling(self):
+        scheduler = ProviderScheduler("test", max_concurrency=1)
+        await scheduler.aacquire(tokens=1)
+        steps = []
+        step = scheduler._step
+        scheduler._step = lambda *args: steps.append(1) or step(*args)
+
+        async def call():
+            await scheduler.aacquire(tokens=1)
+            scheduler.release()
+
+        waiters = [asyncio.create_task(call()) for _ in range(20)]
+        await asyncio.sleep(0.2)
+        # One admission attempt each, then asleep until woken
+        assert len(steps) == 20
+
+        scheduler.release()
+        await asyncio.wait_for(asyncio.gather(*waiters), 1)
+        assert len(steps) < 20 * 3
+        assert scheduler.in_flight == 0 and scheduler.stats()["queued"] == 0
+
+    def test_release_wakes_a_waiting_thread(self):
+        scheduler = ProviderScheduler("test", max_concurrency=1, queue_timeout=5)
+        scheduler.acquire(tokens=1)
+        admitted = threading.Event()
+
+        def call():
+            scheduler.acquire(tokens=1)
+            admitted.set()
+
+        waiter = threading.Thread(target=call)
+        waiter.start()
+        while scheduler.stats()["queued"] == 0:
+            pass
+        scheduler.release()
+
+        assert admitted.wait(1)
+        waiter.join()
+
+    def test_background_priority_context(self):
+        assert llm_priority.get() == INTERACTIVE
+        with background_priority():
+            assert llm_priority.get() == BACKGROUND
+        assert llm_priority.get() == INTERACTIVE
+
+
+class TestScheduledTransport:
+    """Test 429 handling at the HTTP transport"""
+
+    @pytest.mark.asyncio
+    async def test_retries_rate_limited_requests(self):
+        statuses = iter([429, 429, 200])
+        transport = httpx.MockTransport(lambda request: httpx.Response(next(statuses), headers={"retry-after-ms": "10"}, json={}))
+        scheduler = ProviderScheduler("test")
+
+        async with httpx.AsyncClient(transport=ScheduledAsyncTransport(transport, scheduler)) as client:
+            response = await client.post("http://provider/v1/chat/completions", content=_chat_body())
+
+        assert response.status_code == 200
+        assert scheduler.metrics["retries"] == 2
+        assert scheduler.metrics["rate_limited"] == 2
+        assert scheduler.in_flight == 0
+
+    def test_gives_up_after_configured_retries(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_RATE_LIMIT_RETRIES", 1)
+        calls = []
+        transport = httpx.MockTransport(lambda request: calls.append(request) or httpx.Response(429, json={}))
+        scheduler = ProviderScheduler("test")
+
+        with httpx.Client(transport=ScheduledTransport(transport, scheduler)) as client:
+            response = client.post("http://provider/v1/chat/completions", content=_chat_body())
+
+        assert response.status_code == 429
+        assert response.headers["x-should-retry"] == "false"
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_busy_scheduler_answers_429_locally(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        scheduler = ProviderScheduler("test", requests_per_minute=1, queue_timeout=0.01)
+
+        async with httpx.AsyncClient(transport=ScheduledAsyncTransport(transport, scheduler)) as client:
+            first = await client.post("http://provider/v1/chat/completions", content=_chat_body())
+            second = await client.post("http://provider/v1/chat/completions", content=_chat_body())
+
+        assert first.status_code == 200
+        assert second.status_code == 429
+        assert second.json()["error"]["type"] == "client_rate_limit"
+        assert second.headers[LOCAL_RATE_LIMIT_HEADER] == "true"
+
+    @pytest.mark.asyncio
+    async def test_sdk_does_not_retry_exhausted_rate_limits(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_RATE_LIMIT_RETRIES", 0)
+        calls = []
+        transport = httpx.MockTransport(
+            lambda request: calls.append(request) or httpx.Response(429, headers={"retry-after": "7"}, json={})
+        )
+        http_client = httpx.AsyncClient(transport=ScheduledAsyncTransport(transport, ProviderScheduler("test")))
+        client = AsyncOpenAI(api_key="k", base_url="http://provider/v1", http_client=http_client, max_retries=2)
+
+        with pytest.raises(RateLimitError) as error:
+            await client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}])
+
+        assert len(calls) == 1
+        assert is_rate_limit_error(error.value)
+        assert not is_local_rate_limit(error.value)
+        assert rate_limit_retry_after(error.value) == "7"
+        await http_client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_sdk_still_retries_server_errors(self):
+        statuses = iter([503, 200])
+        transport = httpx.MockTransport(lambda request: httpx.Response(
+            next(statuses), headers={"retry-after-ms": "10"},
+            json={"id": "x", "object": "chat.completion", "created": 0, "model": "m", "choices": []}
+        ))
+        http_client = httpx.AsyncClient(transport=ScheduledAsyncTransport(transport, ProviderScheduler("test")))
+        client = AsyncOpenAI(api_key="k", base_url="http://provider/v1", http_client=http_client, max_retries=2)
+
+        response = await client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}])
+
+        assert response.id == "x"
+        await http_client.aclose()
+
+
+class TestRateLimitErrors:
+    """Test recognising rate limits behind wrapped errors"""
+
+    def test_provider_error_chain(self):
+        provider_error = ModelProviderError("slow down", status_code=429, model_name="m", model_id="m")
+        try:
+            try:
+                raise provider_error
+            except ModelProviderError as e:
+                raise RuntimeError("all providers failed") from e
+        except RuntimeError as e:
+            wrapped = e
+
+        assert is_rate_limit_error(provider_error)
+        assert is_rate_limit_error(wrapped)
+        assert not is_local_rate_limit(wrapped)
+        assert rate_limit_retry_after(wrapped) == "1"
+        assert not is_rate_limit_error(ModelProviderError("boom", status_code=500))
+
+    def test_scheduler_busy_is_local(self):
+        error = SchedulerBusyError("queue full")
+        assert is_rate_limit_error(error)
+        assert is_local_rate_limit(error)
+
+    @pytest.mark.asyncio
+    async def test_streamed_response_holds_slot_until_closed(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=httpx.ByteStream(b"data: chunk\n\n")))
+        scheduler = ProviderScheduler("test", max_concurrency=1)
+
+        async with httpx.AsyncClient(transport=ScheduledAsyncTransport(transport, scheduler)) as client:
+            async with client.stream("POST", "http://provider/v1/chat/completions", content=_chat_body()) as response:
+                assert scheduler.in_flight == 1
+                await response.aread()
+            assert scheduler.in_flight == 0
@@ -2,6 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 import sys
 import os
+import json
 from pathlib import Path
 
 # Add backend to path
@@ -33,4 +34,120 @@ def test_openapi_spec():
     response = client.get("/openapi.json")
     assert response.status_code == 200
     data = response.json()
-    assert data["info"]["title"] == "Enterprise RAG System" 
\ No newline at end of file
+    assert data["info"]["title"] == "Enterprise RAG System" 
+def test_query_batch_streams_ndjson():
+    """Test that batch queries are deduplicated and streamed as NDJSON."""
+    response = client.post("/api/v1/query/batch/", json={
+        "queries": [
+            {"question": "What is the vacation policy?", "session_id": "s1"},
+            {"question": "what is the  vacation policy?", "session_id": "s2"},
+            {"question": "Who approves expenses?"}
+        ],
+        "max_concurrency": 2
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert all(line["status"] == "ok" for line in lines)
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[1]["deduplicated"] is True
+    assert by_index[1]["response"]["answer"] == by_index[0]["response"]["answer"]
+    assert by_index[1]["response"]["session_id"] == "s2"
+    assert "total" in by_index[2]["response"]["timings"]
+
+def test_query_batch_rejects_empty_batch():
+    """Test that an empty batch is rejected."""
+    response = client.post("/api/v1/query/batch/", json={"queries": []})
+    assert response.status_code == 422
+
+def test_query_route_override_and_router_stats():
+    """Test that a forced route is honoured and counted by the query router."""
+    before = client.get("/api/v1/query/router/stats").json()
+    response = client.post("/api/v1/query/batch/", json={
+        "queries": [{"question": "What is the vacation policy?", "route": "research"}]
+    })
+    line = json.loads(response.text.splitlines()[0])
+    assert line["response"]["route"] == "research"
+    after = client.get("/api/v1/query/router/stats").json()
+    assert after["forced"] == before["forced"] + 1
+    assert after["latency"]["research"]["samples"] >= 1
+
+def test_query_stream_history_limit_validation():
+    """Test that a null or negative history limit is rejected before streaming."""
+    for value in (None, -1):
+        response = client.post("/api/v1/query/stream/", json={
+            "question": "What is the vacation policy?", "session_id": "s1", "max_history_messages": value
+        })
+        assert response.status_code == 422
+
+    response = client.post("/api/v1/query/stream/", json={
+        "question": "What is the vacation policy?", "session_id": "s1", "max_history_messages": 0, "use_memory": False
+    })
+    assert response.status_code == 200
+    assert '"status": "completed"' in response.text
+
+def test_query_stream_does_not_share_runs_of_agents_with_user_memories(monkeypatch):
+    """Test that a run whose agent reads the user's memories is never shared with other users."""
+    agent = sys.modules["app.api.router"].get_rag_agent()
+    body = {"question": "Who approves expense reports?", "user_id": "alice", "use_memory": False, "route": "rag"}
+
+    response = client.post("/api/v1/query/stream/", json=body)
+    assert '"coalesced": true' in response.text
+
+    monkeypatch.setattr(agent, "enable_user_memories", True, raising=False)
+    response = client.post("/api/v1/query/stream/", json=body)
+    assert '"coalesced": false' in response.text
+
+def test_analyze_document_scopes_to_the_upload_only_when_supported(monkeypatch):
+    """Test that the document filter is only sent to knowledge bases that can apply it."""
+    from unittest.mock import AsyncMock, MagicMock
+    from app.core.dependencies import SimpleKnowledgeBase
+
+    router_module = sys.modules["app.api.router"]
+    agent = MagicMock()
+    agent.arun = AsyncMock(return_value="analysis")
+    monkeypatch.setattr(router_module, "get_rag_agent", lambda tenant_id=None: agent)
+    upload = {"file": ("policy.txt", "Vacation is 15 days per year.".encode(), "text/plain")}
+
+    knowledge_base = SimpleKnowledgeBase()
+    monkeypatch.setattr(router_module, "get_knowledge_base", lambda tenant_id=None: knowledge_base)
+    body = client.post("/api/v1/analyze-document/", files=upload).json()
+    assert body["scoped_to_document"] is True
+    assert agent.arun.call_args.kwargs["knowledge_filters"] == {"document_id": body["document_id"]}
+
+    # e.g. agno's AgentKnowledge, whose documents carry no document_id
+    unfiltered = MagicMock()
+    unfiltered.add_document.return_value = "doc-1"
+    monkeypatch.setattr(router_module, "get_knowledge_base", lambda tenant_id=None: unfiltered)
+    body = client.post("/api/v1/analyze-document/", files=upload).json()
+    assert body["scoped_to_document"] is False
+    assert agent.arun.call_args.kwargs["knowledge_filters"] is None
+
+def test_query_maps_provider_rate_limit_to_429(monkeypatch):
+    """Test that a provider 429 reaches the client as 429 instead of a fallback answer."""
+    import httpx
+    from openai import AsyncOpenAI
+    from app.core import config, dependencies
+    from app.core.fake_server import create_fake_llm_app
+    from app.core.llm_scheduler import ProviderScheduler, ScheduledAsyncTransport
+    from app.core.model_router import ChatProvider, ModelRouter
+
+    monkeypatch.setattr(config, "LLM_RATE_LIMIT_RETRIES", 0)
+    transport = ScheduledAsyncTransport(
+        httpx.ASGITransport(app=create_fake_llm_app(latency="0", rate_limit_rate=1.0)), ProviderScheduler("fake")
+    )
+    openai_client = AsyncOpenAI(
+        api_key="not-needed", base_url="http://fake/v1",
+        http_client=httpx.AsyncClient(transport=transport, base_url="http://fake")
+    )
+    provider = ChatProvider("fake", openai_client, "m")
+    monkeypatch.setattr(dependencies, "get_model_router", lambda: ModelRouter([provider]))
+    agent = dependencies.LMStudioAgent("agent", dependencies.SimpleKnowledgeBase())
+    monkeypatch.setattr(sys.modules["app.api.router"], "get_rag_agent", lambda tenant_id=None: agent)
+
+    response = client.post("/api/v1/query/", json={"question": "Rate limited question?", "route": "rag"})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert provider.stats.count == 1
@@ -19,6 +19,15 @@ def mock_memory_manager():
     manager.clear_user_memories = MagicMock(return_value=True)
     manager.get_memory_count = MagicMock(return_value=0)
     manager.get_relevant_memories_for_query = MagicMock(return_value=[])
+    manager.aadd_user_memory = AsyncMock(return_value="test_memory_id")
+    manager.aget_user_memories = AsyncMock(return_value=[])
+    manager.aget_memory_page = AsyncMock(return_value=([], None))
+    manager.asearch_user_memories = AsyncMock(return_value=[])
+    manager.acreate_memories_from_conversation = AsyncMock(return_value=["memory_id_1"])
+    manager.adelete_user_memory = AsyncMock(return_value=True)
+    manager.aclear_user_memories = AsyncMock(return_value=True)
+    manager.aget_memory_count = AsyncMock(return_value=0)
+    manager.aget_relevant_memories_for_query = AsyncMock(return_value=[])
     return manager
 
 @pytest.fixture
@@ -104,6 +113,167 @@ class TestMemoryManager:
         assert result is True
         mock_memory_manager.clear_user_memories.assert_called_once_with(user_id)
 
+@pytest.fixture
+def async_memory_manager(tmp_path):
+    """Memory manager reading a throwaway agno memory table through the aiosqlite pool"""
+    import sqlite3
+    from backend.app.core.memory_manager import SessionMemoryManager
+    from backend.app.core.sqlite_pool import AsyncSQLitePool
+
+    db_path = tmp_path / "memories.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE session_memories (id TEXT PRIMARY KEY, user_id TEXT, memory TEXT, "
+        "created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+    )
+    for i in range(3):
+        memory = {"memory_id": f"m{i}", "memory": f"memory {i}", "topics": ["topic"]}
+        conn.execute(
+            "INSERT INTO session_memories (id, user_id, memory, created_at) VALUES (?, ?, ?, ?)",
+            (f"m{i}", "user_a", str(memory), f"2024-01-0{i + 1} 10:00:00")
+        )
+    conn.execute(
+        "INSERT INTO session_memories (id, user_id, memory) VALUES (?, ?, ?)",
+        ("other", "user_b", str({"memory": "other user"}))
+    )
+    conn.commit()
+    conn.close()
+
+    manager = SessionMemoryManager()
+    manager.agno_available = True
+    manager.pool = AsyncSQLitePool(db_path, size=2)
+    return manager
+
+class TestAsyncMemoryManager:
+    """Test the non-blocking memory manager API"""
+    
+    @pytest.mark.asyncio
+    async def test_get_user_memories(self, async_memory_manager):
+        """Test that memories are read newest first and scoped to the user"""
+        memories = await async_memory_manager.aget_user_memories("user_a", limit=2)
+        
+        assert [m.memory_id for m in memories] == ["m2", "m1"]
+        assert memories[0].memory == "memory 2"
+        assert memories[0].topics == ["topic"]
+        assert memories[0].created_at == "2024-01-03T10:00:00"
+        await async_memory_manager.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_reads_share_the_pool(self, async_memory_manager):
+        """Test that more concurrent readers than connections all complete"""
+        results = await asyncio.gather(*(async_memory_manager.aget_user_memories("user_a") for _ in range(6)))
+        
+        assert all(len(memories) == 3 for memories in results)
+        assert async_memory_manager.pool._opened <= 2
+        await async_memory_manager.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_delete_and_clear(self, async_memory_manager):
+        """Test deleting one memory and clearing a user"""
+        assert await async_memory_manager.adelete_user_memory("user_a", "m0") is True
+        assert await async_memory_manager.adelete_user_memory("user_a", "other") is False
+        assert await async_memory_manager.aclear_user_memories("user_a") is True
+        
+        assert await async_memory_manager.aget_user_memories("user_a") == []
+        assert len(await async_memory_manager.aget_user_memories("user_b")) == 1
+        await async_memory_manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_memory_count_is_not_capped_by_page_size(self, async_memory_manager):
+        """Test that counting uses COUNT(*) rather than a page of memories"""
+        async with async_memory_manager.pool.connection() as conn:
+            for i in range(3, 15):
+                await conn.execute(
+                    "INSERT INTO session_memories (id, user_id, memory) VALUES (?, ?, ?)",
+                    (f"m{i}", "user_a", str({"memory": f"memory {i}"}))
+                )
+            await conn.commit()
+        
+        assert await async_memory_manager.aget_memory_count("user_a") == 15
+        assert await async_memory_manager.aget_memory_count("user_b") == 1
+        assert await async_memory_manager.aget_memory_count("nobody") == 0
+        await async_memory_manager.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_memory_count_before_first_write(self, tmp_path):
+        """Test that a missing memory table counts as zero"""
+        from backend.app.core.memory_manager import SessionMemoryManager
+        from backend.app.core.sqlite_pool import AsyncSQLitePool
+        
+        manager = SessionMemoryManager()
+        manager.agno_available = True
+        manager.pool = AsyncSQLitePool(tmp_path / "empty.db", size=1)
+        
+        assert await manager.aget_memory_count("user_a") == 0
+        await manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_cursor_pagination(self, async_memory_manager):
+        """Test walking all memories page by page, newest update first"""
+        async with async_memory_manager.pool.connection() as conn:
+            await conn.execute("UPDATE session_memories SET updated_at = created_at")
+            await conn.execute("UPDATE session_memories SET updated_at = '2024-02-01 00:00:00' WHERE id = 'm0'")
+            await conn.commit()
+        
+        first, cursor = await async_memory_manager.aget_memory_page("user_a", limit=2)
+        second, last_cursor = await async_memory_manager.aget_memory_page("user_a", limit=2, cursor=cursor)
+        
+        assert [m.memory_id for m in first] == ["m0", "m2"]
+        assert [m.memory_id for m in second] == ["m1"]
+        assert last_cursor is None
+        async with async_memory_manager.pool.connection() as conn:
+            async with conn.execute("PRAGMA index_list(session_memories)") as rows:
+                assert "idx_session_memories_user_updated" in [row["name"] for row in await rows.fetchall()]
+        await async_memory_manager.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, async_memory_manager):
+        """Test that a malformed cursor is rejected"""
+        with pytest.raises(ValueError, match="Invalid memory cursor"):
+            await async_memory_manager.aget_memory_page("user_a", cursor="not-a-cursor")
+        await async_memory_manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_local_search_needs_no_model(self, async_memory_manager):
+        """Test that memory search is answered by the local index and follows writes"""
+        async_memory_manager.memory = MagicMock()
+        async_memory_manager.memory.search_user_memories = MagicMock(side_effect=AssertionError("agentic search"))
+        async with async_memory_manager.pool.connection() as conn:
+            await conn.execute(
+                "INSERT INTO session_memories (id, user_id, memory) VALUES (?, ?, ?)",
+                ("py", "user_a", str({"memory": "User is a Python developer", "topics": ["development"]}))
+            )
+            await conn.commit()
+        
+        memories = await async_memory_manager.asearch_user_memories("user_a", "python developer", limit=1)
+        assert [m.memory_id for m in memories] == ["py"]
+        
+        assert await async_memory_manager.adelete_user_memory("user_a", "py") is True
+        assert await async_memory_manager.asearch_user_memories("user_a", "python developer") == []
+        assert async_memory_manager.index.stats()["loads"] == 1
+        await async_memory_manager.aclose()
+
+    @pytest.mark.asyncio
+    async def test_extraction_reloads_index_in_background(self, async_memory_manager):
+        """Test that the index picks up agno's writes without the caller waiting for the reload"""
+        await async_memory_manager.asearch_user_memories("user_a", "memory")
+        async with async_memory_manager.pool.connection() as conn:
+            await conn.execute(
+                "INSERT INTO session_memories (id, user_id, memory) VALUES (?, ?, ?)",
+                ("go", "user_a", str({"memory": "User writes Go services"}))
+            )
+            await conn.commit()
+        async_memory_manager._run_agno = AsyncMock(return_value=["go"])
+        
+        assert await async_memory_manager.acreate_memories_from_conversation("user_a", []) == ["go"]
+        assert not async_memory_manager.index.has("user_a")
+        assert len(async_memory_manager._index_tasks) == 1
+        
+        await asyncio.gather(*async_memory_manager._index_tasks)
+        assert async_memory_manager.index.has("user_a")
+        assert [m.memory_id for m in async_memory_manager.index.search("user_a", "go services")] == ["go"]
+        await async_memory_manager.aclose()
+
 class TestMemoryAPI:
     """Test memory-related API endpoints"""
     
@@ -138,11 +308,13 @@ class TestMemoryAPI:
         
         # Mock the memory manager
         with patch('backend.app.core.memory_manager.session_memory_manager') as mock_manager:
-            mock_manager.get_user_memories.return_value = []
-            mock_manager.add_user_memory.return_value = "new_memory_id"
-            mock_manager.delete_user_memory.return_value = True
-            mock_manager.clear_user_memories.return_value = True
-            mock_manager.search_user_memories.return_value = []
+            mock_manager.aget_user_memories = AsyncMock(return_value=[])
+            mock_manager.aget_memory_page = AsyncMock(return_value=([], None))
+            mock_manager.aget_memory_count = AsyncMock(return_value=0)
+            mock_manager.aadd_user_memory = AsyncMock(return_value="new_memory_id")
+            mock_manager.adelete_user_memory = AsyncMock(return_value=True)
+            mock_manager.aclear_user_memories = AsyncMock(return_value=True)
+            mock_manager.asearch_user_memories = AsyncMock(return_value=[])
             
             from backend.app.main import app
             client = TestClient(app)
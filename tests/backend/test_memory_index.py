@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.memory_index import MemoryIndex
+from app.schemas.session import UserMemory
+
+
+def memory(memory_id: str, text: str, topics=None) -> UserMemory:
+    return UserMemory(
+        memory_id=memory_id,
+        memory=text,
+        topics=topics or [],
+        created_at="2024-01-01T10:00:00",
+        last_updated="2024-01-01T10:00:00",
+        user_id="u",
+    )
+
+
+MEMORIES = [
+    memory("python", "User is a Python developer", ["development"]),
+    memory("vacation", "User plans a vacation to Jeju in July", ["travel"]),
+    memory("korean", "사용자는 연차 규정에 관심이 있습니다", ["인사"]),
+]
+
+
+class TestMemoryIndex:
+    def test_unloaded_user_returns_none(self):
+        assert MemoryIndex().search("u", "python") is None
+
+    def test_search_ranks_relevant_memories(self):
+        index = MemoryIndex()
+        index.load("u", MEMORIES)
+
+        assert [m.memory_id for m in index.search("u", "which python version do I use?")][0] == "python"
+        assert [m.memory_id for m in index.search("u", "travel plans", limit=1)] == ["vacation"]
+        assert [m.memory_id for m in index.search("u", "연차는 며칠인가요")][0] == "korean"
+        assert index.search("u", "quarterly revenue") == []
+
+    def test_unrelated_queries_return_nothing(self):
+        index = MemoryIndex()
+        index.load("u", [memory("coffee", "The user likes coffee"), memory("finance", "User works in finance team")])
+
+        # Sharing only stopwords such as "the" is not a match
+        assert index.search("u", "what is the vacation policy") == []
+        assert index.search("u", "is the printer broken") == []
+        assert index.search("u", "what is it?") == []
+        assert [m.memory_id for m in index.search("u", "which team is the finance contact in?")] == ["finance"]
+
+    def test_writes_update_loaded_users(self):
+        index = MemoryIndex()
+        index.load("u", MEMORIES)
+
+        index.add("u", memory("rust", "User is learning Rust"))
+        index.add("u", memory("python", "User moved from Python to Go"))
+        index.remove("u", "vacation")
+
+        assert [m.memory_id for m in index.search("u", "rust", limit=1)] == ["rust"]
+        assert index.search("u", "golang go")[0].memory == "User moved from Python to Go"
+        assert index.search("u", "vacation jeju") == []
+
+        index.add("other", memory("x", "not loaded"))
+        assert not index.has("other")
+
+    def test_least_recently_searched_users_are_evicted(self):
+        index = MemoryIndex(max_users=2)
+        index.load("a", MEMORIES)
+        index.load("b", MEMORIES)
+        index.search("a", "python")
+        index.load("c", MEMORIES)
+
+        assert index.has("a") and index.has("c")
+        assert not index.has("b")
+        assert index.stats()["evictions"] == 1
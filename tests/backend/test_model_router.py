@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.fake_llm import FakeChatClient, FakeProviderError, fake_answer
+from app.core.model_router import ChatProvider, ModelRouter, NoProviderAvailableError, ProviderStats
+
+MESSAGES = [{"role": "user", "content": "What is the vacation policy?"}]
+
+
+def _provider(name, **kwargs):
+    return ChatProvider(name, FakeChatClient(**kwargs), f"{name}-model")
+
+
+class TestProviderStats:
+    """Test rolling latency and error windows"""
+
+    def test_percentiles_and_error_rate(self):
+        stats = ProviderStats(window=100, max_age=60)
+        for latency in range(1, 101):
+            stats.record(latency / 1000, ok=True)
+
+        assert stats.percentile(0.5) == pytest.approx(0.051)
+        assert stats.percentile(0.95) == pytest.approx(0.096)
+        assert stats.error_rate == 0.0
+
+        stats.record(0.5, ok=False)
+        assert stats.count == 100
+        assert stats.error_rate == pytest.approx(0.01)
+
+    def test_old_samples_expire(self):
+        stats = ProviderStats(window=10, max_age=0)
+        stats.record(0.1, ok=False)
+
+        assert stats.count == 0
+        assert stats.error_rate == 0.0
+
+
+class TestModelRouter:
+    """Test routing, failover and hedging against fake providers"""
+
+    @pytest.mark.asyncio
+    async def test_routes_to_fastest_provider(self):
+        slow = _provider("slow", latency=0.03)
+        fast = _provider("fast", latency=0.001)
+        router = ModelRouter([slow, fast], min_samples=2)
+
+        for _ in range(6):
+            await router.complete(MESSAGES)
+
+        assert router.ranked()[0] is fast
+        # Each provider was sampled, then the fast one took the traffic
+        assert slow.client.calls == 2
+        assert fast.client.calls == 4
+
+    @pytest.mark.asyncio
+    async def test_fails_over_to_next_provider(self):
+        broken = _provider("broken", error_rate=1.0)
+        healthy = _provider("healthy")
+        router = ModelRouter([broken, healthy], min_samples=2)
+
+        response = await router.complete(MESSAGES)
+
+        assert response.choices[0].message.content == fake_answer(MESSAGES)
+        assert router.metrics["failovers"] == 1
+        assert broken.stats.error_rate == 1.0
+
+    @pytest.mark.asyncio
+    async def test_raises_when_every_provider_fails(self):
+        router = ModelRouter([_provider("a", error_rate=1.0), _provider("b", error_rate=1.0)])
+
+        with pytest.raises(NoProviderAvailableError) as exc_info:
+            await router.complete(MESSAGES)
+        assert isinstance(exc_info.value.__cause__, FakeProviderError)
+
+    @pytest.mark.asyncio
+    async def test_hedges_slow_primary(self):
+        latencies = iter([0.01] * 5 + [0.5])
+        primary = _provider("primary", latency=lambda: next(latencies))
+        backup = _provider("backup", latency=0.02)
+        router = ModelRouter([primary, backup], hedge=True, min_samples=5)
+        for _ in range(5):
+            await router.complete(MESSAGES)
+        # Keep the primary ranked first
+        for _ in range(5):
+            backup.stats.record(1.0, ok=True)
+
+        start = asyncio.get_running_loop().time()
+        response = await router.complete(MESSAGES)
+        elapsed = asyncio.get_running_loop().time() - start
+
+        assert response.choices[0].message.content == fake_answer(MESSAGES)
+        assert elapsed < 0.2
+        assert router.metrics["hedges"] == 1
+        assert router.metrics["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_fails_over_before_first_chunk(self):
+        router = ModelRouter([_provider("broken", error_rate=1.0), _provider("healthy")])
+
+        chunks = [chunk.choices[0].delta.content async for chunk in router.stream(MESSAGES)]
+
+        assert "".join(chunks) == fake_answer(MESSAGES)
+        assert router.stats()["providers"]["broken"]["error_rate"] == 1.0
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core import config, metrics
+from app.core.prompt_compression import compress_passage, compress_passages
+from app.core.query_pipeline import gather_query_context
+
+PASSAGE = (
+    "The company was founded in 1998. "
+    "Offices are located in Seoul and Busan. "
+    "Employees receive fifteen days of annual vacation. "
+    "Unused vacation days can be carried over to the next year. "
+    "The cafeteria serves lunch from noon. "
+    "Parking is available in the basement."
+)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Use the byte-length token estimate so counts do not depend on tiktoken downloads"""
+    monkeypatch.setattr(metrics, "_encoding", lambda model: None)
+
+
+class TestPromptCompression:
+    """Test extractive compression of packed passages"""
+
+    def test_keeps_relevant_sentences_in_order(self):
+        compressed = compress_passage("how many vacation days", PASSAGE, ratio=0.5, neighbours=0)
+
+        assert "fifteen days of annual vacation" in compressed
+        assert "cafeteria" not in compressed
+        assert "Parking" not in compressed
+        assert compressed.index("fifteen days") < compressed.index("Unused vacation")
+
+    def test_neighbours_are_kept(self):
+        compressed = compress_passage("founded", PASSAGE, ratio=0.5, neighbours=1)
+
+        assert "founded in 1998" in compressed
+        assert "Seoul and Busan" in compressed
+
+    def test_respects_ratio(self):
+        compressed = compress_passage("vacation", PASSAGE, ratio=0.3, neighbours=1)
+
+        assert metrics.count_tokens(compressed) <= metrics.count_tokens(PASSAGE) * 0.3 + 1
+        assert "vacation" in compressed
+
+    def test_single_sentence_is_unchanged(self):
+        assert compress_passage("vacation", "Only one sentence here", ratio=0.1) == "Only one sentence here"
+
+    def test_reports_tokens_saved(self):
+        passages = [{"id": "doc_1", "content": PASSAGE, "metadata": {}, "score": 1.0, "tokens": metrics.count_tokens(PASSAGE)}]
+
+        compressed, info = compress_passages("vacation days", passages, ratio=0.5, neighbours=0)
+
+        assert compressed[0]["id"] == "doc_1"
+        assert compressed[0]["tokens"] == metrics.count_tokens(compressed[0]["content"])
+        assert info["original_tokens"] == passages[0]["tokens"]
+        assert info["tokens_saved"] == info["original_tokens"] - info["compressed_tokens"] > 0
+
+    def test_pipeline_stage_runs_when_enabled(self, monkeypatch):
+        monkeypatch.setattr(config, "PROMPT_COMPRESSION_ENABLED", True)
+        monkeypatch.setattr(config, "PROMPT_COMPRESSION_RATIO", 0.4)
+        agent = MagicMock()
+        agent.supports_prefetch = True
+        agent.model_id = "mock-model"
+        knowledge_base = MagicMock()
+        knowledge_base.search.return_value = [{"id": "doc_1", "content": PASSAGE, "metadata": {}, "score": 1.0}]
+
+        context = asyncio.run(gather_query_context(agent, knowledge_base, "vacation days", None, None, use_memory=False))
+
+        assert "prompt_compression" in context.stages
+        assert context.tokens_saved > 0
+        assert "cafeteria" not in context.search_results[0]["content"]
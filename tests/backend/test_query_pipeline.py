@@ -0,0 +1,150 @@
+import pytest
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core import config, query_pipeline
+from app.core.query_pipeline import gather_query_context, run_stage
+from app.core.session_history import SessionHistory
+
+
+class _SlowKnowledgeBase:
+    def search(self, query, limit=5, filters=None):
+        time.sleep(0.2)
+        return [{"id": "doc_1", "content": query}]
+
+
+class _PrefetchAgent:
+    supports_prefetch = True
+
+
+class TestQueryPipeline:
+    """Test concurrent context gathering"""
+
+    @pytest.mark.asyncio
+    async def test_stage_deadline_returns_default(self):
+        async def slow():
+            await asyncio.sleep(1)
+            return "late"
+
+        result = await run_stage("slow", slow, 0.01, default=[])
+
+        assert result.value == []
+        assert result.status == "timeout"
+
+    @pytest.mark.asyncio
+    async def test_stages_run_concurrently(self, monkeypatch):
+        async def slow_memories(user_id, query, limit):
+            await asyncio.sleep(0.2)
+            return ["memory"]
+
+        monkeypatch.setattr(query_pipeline.session_memory_manager, "aget_relevant_memories_for_query", slow_memories)
+
+        start = time.perf_counter()
+        context = await gather_query_context(
+            _PrefetchAgent(), _SlowKnowledgeBase(), "question",
+            user_id="user", session_id="session", use_memory=True
+        )
+        elapsed = time.perf_counter() - start
+
+        assert context.memories == ["memory"]
+        assert [(r["id"], r["content"]) for r in context.search_results] == [("doc_1", "question")]
+        assert elapsed < 0.35
+        assert {name: stage.status for name, stage in context.stages.items()} == {
+            "memory_search": "ok", "retrieval": "ok", "history_load": "ok",
+            "rerank": "skipped", "context_assembly": "ok"
+        }
+
+    @pytest.mark.asyncio
+    async def test_slow_retrieval_does_not_block_prompt(self, monkeypatch):
+        monkeypatch.setattr(config, "RETRIEVAL_STAGE_TIMEOUT_SECONDS", 0.05)
+
+        context = await gather_query_context(
+            _PrefetchAgent(), _SlowKnowledgeBase(), "question",
+            user_id=None, session_id=None, use_memory=False
+        )
+
+        assert context.search_results == []
+        assert context.stages["retrieval"].status == "timeout"
+
+    @pytest.mark.asyncio
+    async def test_agents_without_prefetch_retrieve_themselves(self):
+        context = await gather_query_context(
+            object(), _SlowKnowledgeBase(), "question",
+            user_id=None, session_id="session", use_memory=False
+        )
+
+        assert context.search_results is None
+        assert context.history == []
+        assert context.stages == {}
+
+    @pytest.mark.asyncio
+    async def test_retrieval_cache_shares_searches(self):
+        knowledge_base = _SlowKnowledgeBase()
+        calls = []
+        search = knowledge_base.search
+        knowledge_base.search = lambda *args, **kwargs: calls.append(args) or search(*args, **kwargs)
+        cache = {}
+
+        contexts = await asyncio.gather(*[
+            gather_query_context(
+                _PrefetchAgent(), knowledge_base, question,
+                user_id=None, session_id=None, use_memory=False, retrieval_cache=cache
+            )
+            for question in ["question", "Question ", "other"]
+        ])
+
+        assert len(calls) == 2
+        assert contexts[0].search_results == contexts[1].search_results
+
+
+class TestSessionHistory:
+    """Test the in-memory session history"""
+
+    def test_keeps_recent_messages_and_sessions(self):
+        history = SessionHistory(max_sessions=2, max_messages=2)
+        for i in range(3):
+            history.append("a", "user", f"q{i}")
+        history.append("b", "user", "hello")
+        history.append("c", "user", "hi")
+
+        assert history.get("a", 10) == []
+        assert [m["content"] for m in history.get("b", 10)] == ["hello"]
+
+        history.append("c", "assistant", "answer")
+        history.append("c", "user", "again")
+        assert [m["content"] for m in history.get("c", 10)] == ["answer", "again"]
+        assert history.get("c", 1) == [{"role": "user", "content": "again"}]
+
+
+class TestQueryMetrics:
+    """Test per-request timing and token accounting"""
+
+    def test_timer_records_stages(self):
+        from app.core.metrics import QueryTimer
+
+        timer = QueryTimer()
+        with timer.stage("retrieval"):
+            time.sleep(0.01)
+        timer.record("generation", 0.5)
+        timer.mark_first_token()
+        timer.mark_first_token()
+
+        timings = timer.to_dict()
+        assert timings["retrieval"] >= 10
+        assert timings["generation"] == 500.0
+        assert timings["time_to_first_token"] <= timings["total"]
+
+    def test_token_estimate_without_encoding(self, monkeypatch):
+        from app.core import metrics
+
+        monkeypatch.setattr(metrics, "_encoding", lambda model: None)
+
+        assert metrics.count_tokens("") == 0
+        assert metrics.count_tokens("abcdefgh") == 2
+        assert metrics.count_prompt_tokens(["abcd", None, "abcd"]) == 10
@@ -0,0 +1,81 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.query_router import (
+    RAG, RESEARCH, QueryRouter, complexity_features, complexity_score, retrieval_confidence
+)
+
+SIMPLE = "What is the vacation policy?"
+COMPLEX = "Compare the 2023 and 2024 vacation policies and explain why the carry-over rules changed"
+
+
+class TestComplexityFeatures:
+    """Test the cheap local complexity signals"""
+
+    def test_factoid_questions_score_low(self):
+        features = complexity_features(SIMPLE)
+        assert features["factoid"] == 1.0
+        assert complexity_score(features) < 0.5
+
+    def test_analytical_multi_part_questions_score_high(self):
+        features = complexity_features(COMPLEX)
+        assert features["analytical"] == 1.0
+        assert features["multi_part"] == 1.0
+        assert complexity_score(features) >= 0.5
+
+    def test_korean_cues(self):
+        assert complexity_features("연차 정책과 병가 정책의 차이를 비교 분석해 주세요")["analytical"] == 1.0
+        assert complexity_features("연차는 며칠인가요? 언제 신청하나요?")["multi_part"] == 1.0
+
+    def test_retrieval_confidence_is_term_coverage(self):
+        passages = [{"content": "The vacation policy grants 15 days"}, {"content": "Unrelated"}]
+        assert retrieval_confidence("vacation policy", passages) == 1.0
+        assert retrieval_confidence("vacation budget", passages) == 0.5
+        assert retrieval_confidence("vacation policy", []) == 0.0
+        assert retrieval_confidence("vacation policy", None) is None
+
+
+class TestQueryRouter:
+    """Test route selection, overrides and budgets"""
+
+    def test_routes_by_complexity(self):
+        router = QueryRouter()
+        assert router.decide(SIMPLE).route == RAG
+        decision = router.decide(COMPLEX)
+        assert decision.route == RESEARCH
+        assert decision.reason == "complex"
+        assert router.stats()["rag"] == 1 and router.stats()["research"] == 1
+
+    def test_keyword_hint_alone_does_not_escalate(self):
+        assert QueryRouter().decide("Think about the vacation policy", hint=True).route == RAG
+
+    def test_explicit_route_wins(self):
+        router = QueryRouter()
+        assert router.decide(COMPLEX, requested=RAG).route == RAG
+        assert router.decide(SIMPLE, requested=RESEARCH).reason == "requested"
+        assert router.stats()["forced"] == 2
+
+    def test_disabled_router_follows_hint(self):
+        router = QueryRouter(enabled=False)
+        assert router.decide(COMPLEX).route == RAG
+        assert router.decide(SIMPLE, hint=True).route == RESEARCH
+
+    def test_token_budget_downgrades(self):
+        router = QueryRouter(research_cost=4, max_tokens=1000)
+        assert router.decide(COMPLEX, prompt_tokens=200).route == RESEARCH
+        decision = router.decide(COMPLEX, prompt_tokens=300)
+        assert decision.route == RAG
+        assert decision.reason == "over_token_budget"
+
+    def test_latency_budget_downgrades(self):
+        router = QueryRouter(latency_budget=2.0)
+        router.record(RESEARCH, 5.0)
+        decision = router.decide(COMPLEX)
+        assert decision.route == RAG
+        assert decision.reason == "over_latency_budget"
+        assert router.stats()["over_latency_budget"] == 1
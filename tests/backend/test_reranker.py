@@ -0,0 +1,56 @@
+import pytest
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.reranker import HeuristicReranker, rerank
+
+
+class _SlowReranker:
+    name = "slow"
+
+    def score_batch(self, query, batch, max_score):
+        time.sleep(0.02)
+        return np.arange(len(batch), dtype=float)
+
+
+class TestReranker:
+    """Test the CPU rerank stage"""
+
+    def test_exact_phrase_and_proximity_win(self):
+        results = [
+            {"id": "scattered", "content": "annual reports are due. Leave the office by six.", "score": 3.0},
+            {"id": "phrase", "content": "Annual leave is fifteen days per year.", "score": 2.0},
+            {"id": "unrelated", "content": "The cafeteria opens at eight.", "score": 1.0},
+        ]
+
+        reranked, info = rerank("annual leave", results, top_k=2, reranker=HeuristicReranker(), latency_cap_ms=1000)
+
+        assert info["status"] == "ok"
+        assert [r["id"] for r in reranked] == ["phrase", "scattered"]
+        assert reranked[0]["score"] == 1.0
+        assert reranked[0]["retrieval_score"] == 2.0
+
+    def test_field_boost(self):
+        results = [
+            {"id": "body", "content": "security guidelines", "metadata": {}, "score": 1.0},
+            {"id": "titled", "content": "security guidelines", "metadata": {"title": "VPN setup guide"}, "score": 1.0},
+        ]
+
+        reranked, _ = rerank("vpn security", results, reranker=HeuristicReranker(), latency_cap_ms=1000)
+
+        assert reranked[0]["id"] == "titled"
+
+    def test_latency_cap_keeps_first_stage_order(self):
+        results = [{"id": str(i), "content": "text", "score": 10 - i} for i in range(10)]
+
+        reranked, info = rerank("text", results, top_k=3, reranker=_SlowReranker(), latency_cap_ms=1, batch_size=2)
+
+        assert info["status"] == "timeout"
+        assert [r["id"] for r in reranked] == ["0", "1", "2"]
@@ -0,0 +1,72 @@
+import pytest
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.storage import UploadStorage, StorageError
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Upload storage with a 100 byte quota"""
+    return UploadStorage(directory=tmp_path, quota_bytes=100, max_age_days=7, low_watermark=0.5)
+
+
+class TestUploadStorage:
+    """Test content-addressed upload storage"""
+
+    def test_same_name_uploads_do_not_overwrite(self, storage):
+        """Test that different content with the same filename is kept apart"""
+        first, _ = storage.store(b"first version", "policy.txt")
+        second, _ = storage.store(b"second version", "policy.txt")
+
+        assert first != second
+        assert first.read_bytes() == b"first version"
+        assert second.suffix == ".txt"
+
+    def test_identical_content_is_deduplicated(self, storage):
+        """Test that identical uploads are stored once"""
+        path, created = storage.store(b"same", "a.txt")
+        again, created_again = storage.store(b"same", "b.txt")
+
+        assert path == again
+        assert created is True
+        assert created_again is False
+        assert storage.usage()["dedup_hits"] == 1
+
+    def test_quota_evicts_least_recently_used(self, storage):
+        """Test LRU eviction when the quota would be exceeded"""
+        old, _ = storage.store(b"a" * 40, "old.txt")
+        os.utime(old, (time.time() - 100, time.time() - 100))
+        recent, _ = storage.store(b"b" * 40, "recent.txt")
+
+        newest, _ = storage.store(b"c" * 40, "newest.txt")
+
+        assert not old.exists()
+        assert newest.exists()
+        usage = storage.usage()
+        assert usage["used_bytes"] <= usage["quota_bytes"]
+        assert usage["evicted_files"] >= 1
+
+    def test_file_larger_than_quota(self, storage):
+        """Test that oversized files are rejected instead of flushing the store"""
+        with pytest.raises(StorageError):
+            storage.store(b"x" * 101, "huge.txt")
+
+    def test_sweep_removes_expired_files(self, storage):
+        """Test age-based cleanup"""
+        expired, _ = storage.store(b"expired", "expired.txt")
+        os.utime(expired, (time.time() - 10 * 86400, time.time() - 10 * 86400))
+        kept, _ = storage.store(b"kept", "kept.txt")
+
+        result = storage.sweep()
+
+        assert result["expired_files"] == 1
+        assert not expired.exists()
+        assert kept.exists()
+        assert result["file_count"] == 1
@@ -0,0 +1,74 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+
+from app.core.streaming import ThinkStreamParser, stream_agent_response
+
+
+class TestThinkStreamParser:
+    """Test incremental <think> splitting"""
+
+    def test_tags_split_across_chunks(self):
+        """Test that tags spanning chunk boundaries are recognised"""
+        parser = ThinkStreamParser()
+        segments = []
+        for chunk in ["<thi", "nk>plan", " steps</th", "ink>\n\nThe ", "answer"]:
+            segments.extend(parser.feed(chunk))
+        segments.extend(parser.flush())
+
+        assert parser.think == "plan steps"
+        assert parser.answer == "The answer"
+        assert parser.think_block == "<think>plan steps</think>"
+        assert all(kind in ("think", "answer") for kind, _ in segments)
+
+    def test_plain_answer_is_forwarded(self):
+        """Test that text without tags is streamed as answer"""
+        parser = ThinkStreamParser()
+        assert parser.feed("Hello") == [("answer", "Hello")]
+        assert parser.feed(" <th") == [("answer", " ")]
+        assert parser.flush() == [("answer", "<th")]
+        assert parser.think_block == ""
+
+
+class _EventAgent:
+    """Agent that only supports agno-style streaming runs"""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def arun(self, message, stream=False, **kwargs):
+        async def generate():
+            for event in self.events:
+                yield event
+        return generate()
+
+
+class _Event:
+    def __init__(self, event, content):
+        self.event = event
+        self.content = content
+
+
+class TestStreamAgentResponse:
+    """Test streaming from agno-style agents"""
+
+    @pytest.mark.asyncio
+    async def test_forwards_content_events(self):
+        agent = _EventAgent([
+            _Event("RunStarted", None),
+            _Event("RunResponseContent", "Hel"),
+            _Event("RunResponseContent", "lo"),
+            _Event("RunCompleted", "Hello"),
+        ])
+        deltas = [delta async for delta in stream_agent_response(agent, "hi")]
+        assert deltas == ["Hel", "lo"]
+
+    @pytest.mark.asyncio
+    async def test_error_event_raises(self):
+        agent = _EventAgent([_Event("RunError", "boom")])
+        with pytest.raises(RuntimeError):
+            [delta async for delta in stream_agent_response(agent, "hi")]